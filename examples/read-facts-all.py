@@ -1,10 +1,12 @@
-from pynetworking.Device import Device
+from pynetworking import Fleet
 from pprint import pprint
 
 
-for host in ('10.17.39.253', '10.17.39.254'):
-    dev = Device(host)
-    dev.open()
-    print "Host: {0}".format(host)
-    pprint(dev.facts)
-    dev.close()
+fleet = Fleet(['10.17.39.253', '10.17.39.254'])
+for result in fleet.run('facts'):
+    print "Host: {0}".format(result.host)
+    if result.error:
+        print "Error: {0}".format(result.error)
+    else:
+        pprint(result.output)
+fleet.close()
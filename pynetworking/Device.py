@@ -8,12 +8,16 @@ import zmq
 import json
 import inspect
 import traceback
+from hashlib import md5
+from time import time
+from contextlib import contextmanager
 from os import listdir
 from os.path import dirname, isfile, join
 from jinja2 import Template
-from pynetworking.Proxy import SSHProxy
-from multiprocessing import Process
-from time import sleep
+from pynetworking.Proxy import SSHProxy, UNKNOWN_SESSION
+from pynetworking.utils.facts_cache import FactsCache
+from pynetworking.utils.config_tree import ConfigTree
+from multiprocessing import Process, Pipe
 from tempfile import NamedTemporaryFile
 from mock import MagicMock
 from mock import patch
@@ -27,12 +31,20 @@ class Device(object):
     """ test doc
     """
     def __init__(self, host, username='manager', password='friend', protocol='ssh', port='auto', os='auto',
-                 log_level='NOTSET', log_output='console:', connection_timeout=20, mock='n'):
+                 log_level='NOTSET', log_output='console:', connection_timeout=20, mock='n', proxy_url=None,
+                 facts_cache=None, facts_cache_ttl=0):
         if protocol not in ('telnet', 'ssh', 'serial'):
             raise ValueError("Unsupported protocol " + protocol)
         self._proxy = None
+        self._proxy_ctx = None
+        self._proxy_skt = None
+        self._proxy_poller = None
         self._proxy_ipc_file = NamedTemporaryFile().name
         self._proxy_url = "ipc://{0}".format(self._proxy_ipc_file)
+        self._proxy_shared = proxy_url is not None
+        self._proxy_session = False
+        if self._proxy_shared:
+            self._proxy_url = proxy_url
         self._proxy_connection_timeout = connection_timeout * 1000
         self._host = host
         self._username = username
@@ -46,7 +58,7 @@ class Device(object):
         hdl = logging.StreamHandler()
         if log_output.startswith('file://'):
             hdl = logging.FileHandler(log_output.split('://')[1])
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)-6s - %(message)s')
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)-6s - %(filename)-30s [%(lineno)3d] %(message)s')
         hdl.setFormatter(formatter)
         log = logging.getLogger(self._host)
         log.handlers = []
@@ -58,6 +70,14 @@ class Device(object):
         self.log_debug("\nHost: {0}\nusername: {1}\npassword:{2}\nprotocol: {3}:{4}\nos: {5}".format(host, username, password, protocol, port, os))
         self._config = ''
         self._os = os
+        self._facts_cache = None
+        if facts_cache is not None:
+            self._facts_cache = FactsCache(facts_cache, ttl=facts_cache_ttl)
+        self._probe = None
+        self._cached_config = None
+        self._running_config = None
+        self._snapshot = None
+        self._snapshots = []
         self._facts = {}
         if os != 'auto':
             self._facts['os'] = os
@@ -66,6 +86,22 @@ class Device(object):
         else:
             raise ValueError("Protocol {0} is not supported".format(protocol))
 
+    def __getattr__(self, name):
+        # features are imported, created and configured on first access
+        models = self.__dict__.get('_models')
+        if models is None or name.startswith('_') or name not in models['features']:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+        self.log_info("loading feature {0} on first access".format(name))
+        fobj = self._create_feature(name)
+        # registered once configured, a failed load is tried again on the next access
+        if self._running_config is not None:
+            cfg, tree = self._running_config
+            self._load_feature_config(name, fobj, self._get_feature_config(fobj, tree, cfg))
+        else:
+            self._load_features_config([(name, fobj)])
+        self._add_feature(name, fobj)
+        return fobj
+
     @property
     def facts(self):
         return self._facts
@@ -106,21 +142,45 @@ class Device(object):
             self.log_debug("ping down")
             return False
 
-    def open(self):
+    def open(self, features=None):
         self.log_info("open")
         if self._mock_test is False:
-            self._open()
+            self._open(features)
         else:
-            self._mocked_open()  # pragma: no cover
+            self._mocked_open(features)  # pragma: no cover
 
     def close(self):
         self.log_info("close")
-        if isinstance(self._proxy, Process) and (isinstance(self._proxy, Process) and self._proxy.is_alive()):
+        if self._proxy_shared:
+            self.cmd({'cmds': [{'cmd': '_exit', 'prompt': ''}]})
+            self._proxy_session = False
+        elif isinstance(self._proxy, Process) and (isinstance(self._proxy, Process) and self._proxy.is_alive()):
             self.cmd({'cmds': [{'cmd': '_exit', 'prompt': ''}]})
             self._proxy.join(10)
+        self._close_channel()
+        if self._proxy_ctx is not None:
+            self._proxy_ctx.term()
+            self._proxy_ctx = None
+
+    @contextmanager
+    def snapshot(self, max_age=None):
+        # reads use the innermost snapshot, a change invalidates all of them
+        self._snapshot = {'max_age': max_age, 'times': {}}
+        self._snapshots.append(self._snapshot)
+        try:
+            yield self
+        finally:
+            self._snapshots.pop()
+            self._snapshot = self._snapshots[-1] if self._snapshots else None
 
     def cmd(self, cmd, use_cache=True, cache=False, flush_cache=False):
         timeout = 12000
+        if flush_cache and self._snapshots:
+            self.log_debug("snapshot invalidated")
+            for snapshot in self._snapshots:
+                snapshot['times'] = {}
+        if flush_cache:
+            self._running_config = None
         if type(cmd) is str:
             self.log_info("executing command '{0}'".format(cmd))
             cmd = {'cmds': [{'cmd': cmd, 'prompt': self.system.shell_prompt()}]}
@@ -139,33 +199,58 @@ class Device(object):
 
         cmd['cache'] = use_cache
         cmd['flush_cache'] = flush_cache
+        if self._proxy_shared:
+            # the password is sent only to open the session in the shared proxy
+            cmd['session'] = {'host': self._host, 'port': self._port, 'username': self._username,
+                              'connection_timeout': self._proxy_connection_timeout / 1000}
+            if not self._proxy_session:
+                cmd['session']['password'] = self._password
 
         self._start_proxy()
         try:
-            context = zmq.Context()
-            skt = context.socket(zmq.REQ)
-            skt.setsockopt(zmq.LINGER, 1000)
-            skt.connect(self._proxy_url)
-            skt.send_string(json.dumps(cmd), zmq.NOBLOCK)
-
-            poller = zmq.Poller()
-            poller.register(skt, zmq.POLLIN)
-            if len(poller.poll(timeout)) == 0:
-                self.log_warn("timeout on cmd ({0})".format(self._proxy.exitcode))
-                raise DeviceException('proxy exited with error ({0})'.format(self._proxy.exitcode))
-
-            ret = json.loads(skt.recv(zmq.NOBLOCK))
+            ret = self._send(cmd, timeout)
+            if self._proxy_shared:
+                if ret['status'] == 'Error' and ret['output'] == UNKNOWN_SESSION:
+                    self.log_info("session closed by the shared proxy, opening it again")
+                    cmd['session']['password'] = self._password
+                    ret = self._send(cmd, timeout)
+                self._proxy_session = True
             if ret['status'] == 'Success':
                 self.log_debug("command execution success")
-                self.log_debug("command execution output \n{0}".format(ret['output']))
+                self.log_debug("command execution output \n{0}", ret['output'])
                 return ret['output']
             else:
                 self.log_warn("command execution '{0}' 'error {1}".format(cmd, ret))
                 raise DeviceException(ret['output'])
         except zmq.error.ZMQError, e:
             self.log_warn("ZMQError {0}".format(repr(e)))
+            self._close_channel()
             raise DeviceException("ZMQError {0}".format(repr(e)))
 
+    def _send(self, cmd, timeout):
+        self._open_channel()
+        self._proxy_skt.send_string(json.dumps(cmd), zmq.NOBLOCK)
+
+        if len(self._proxy_poller.poll(timeout)) == 0:
+            exitcode = None
+            if isinstance(self._proxy, Process):
+                exitcode = self._proxy.exitcode
+            self.log_warn("timeout on cmd ({0})".format(exitcode))
+            self._close_channel()
+            raise DeviceException('proxy exited with error ({0})'.format(exitcode))
+
+        return json.loads(self._proxy_skt.recv(zmq.NOBLOCK))
+
+    def _is_snapshot_fresh(self, key):
+        if self._snapshot is None or key not in self._snapshot['times']:
+            return False
+        max_age = self._snapshot['max_age']
+        return max_age is None or time() - self._snapshot['times'][key] < max_age
+
+    def _set_snapshot_time(self, key):
+        if self._snapshot is not None:
+            self._snapshot['times'][key] = time()
+
     def _get_mock_opt(self, mock):
         ret = True
         if self._host != '127.0.0.1' or (mock != 'y' and mock != 'yes'):
@@ -196,34 +281,52 @@ class Device(object):
                 self.close()
                 raise DeviceException("device not supported")
 
-    def _load_features(self):
+    def _load_features(self, features=None):
+        # only the given features are created now, the others on first access
         self.log_info("loading features")
+        for fname in self.__dict__.get('_features', {}):
+            delattr(self, fname)
         self._features = {}
+        self._config_digests = {}
+        self._running_config = None
         with open("{0}/Device.yaml".format(dirname(__file__)), 'r') as f:
             self._models = yaml.load(Template(f.read()).render(self._facts))
-            self.log_debug("models {0}".format(self._models))
+            self.log_debug("models {0}", self._models)
         if self._models is None:
             self.log_warn("no features loaded")
             self._models = {'features': {}}
         elif self._models['features'] is None:
             self.log_warn("no features loaded")
             self._models['features'] = {}
-        for fname, fclass in self._models['features'].items():
-            self.log_info("loading feature {0}/{1}".format(fname, fclass))
-            try:
-                m = __import__('pynetworking.features.{0}'.format(fclass))
-                for comp in ('features', fclass, fclass):
-                    m = getattr(m, comp)
-                o = m(self)
-                setattr(self, fname, o)
-                self._features[fname] = o
-            except:
-                self.log_critical("Error loading class {1} for feature {0}".format(fname, fclass))
-                raise
+        for fname in features or []:
+            if fname in self._models['features']:
+                self._add_feature(fname, self._create_feature(fname))
+            else:
+                self.log_warn("feature {0} is not available".format(fname))
+
+    def _create_feature(self, fname):
+        fclass = self._models['features'][fname]
+        self.log_info("loading feature {0}/{1}".format(fname, fclass))
+        try:
+            m = __import__('pynetworking.features.{0}'.format(fclass))
+            for comp in ('features', fclass, fclass):
+                m = getattr(m, comp)
+            return m(self)
+        except:
+            self.log_critical("Error loading class {1} for feature {0}".format(fname, fclass))
+            raise
+
+    def _add_feature(self, fname, fobj):
+        setattr(self, fname, fobj)
+        self._features[fname] = fobj
+
+    def load_system(self, features=None):
+        if features is not None:
+            self._load_features_config([(f, self._features[f]) for f in features if f in self._features])
+            return
 
-    def load_system(self):
         self.log_info("load system")
-        self.log_debug("models {0}".format(self._models))
+        self.log_debug("models {0}", self._models)
         if 'system' in self._models:
             try:
                 self.log_info("loading system module {0}".format(self._models['system']))
@@ -237,51 +340,173 @@ class Device(object):
                 raise
         else:
             self.log_warn("missing system module")
-
-        cfg = self.system.get_config()
-        self.log_debug("device configuration\n{0}".format(cfg))
+            # the one of a previous open does not match the device models any more
+            self.__dict__.pop('system', None)
+
+        # without a system module no configuration can be read, not even on first access
+        system = self.system
+        self._running_config = None
+        if self._cached_config is not None:
+            self.log_info("using cached configuration")
+            cfg = self._cached_config
+            self._cached_config = None
+        elif self._features or (self._facts_cache is not None and self._probe):
+            cfg = system.get_config()
+            if self._facts_cache is not None and self._probe:
+                self._facts_cache.save(self._host, self._facts, self._probe, cfg)
+        else:
+            self.log_info("no feature loaded, configuration read on first access")
+            return
+        self.log_debug("device configuration\n{0}", cfg)
+        tree = ConfigTree(cfg)
+        self._running_config = (cfg, tree)
         for fname, fobj in self._features.items():
-            fobj.load_config(cfg)
-
-    def log_debug(self, msg):
-        self._logger(msg, 'debug')
-
-    def log_info(self, msg):
-        self._logger(msg, 'info')
-
-    def log_warn(self, msg):
-        self._logger(msg, 'warn')
-
-    def log_error(self, msg):
-        self._logger(msg, 'error')
-
-    def log_critical(self, msg):
-        self._logger(msg, 'critical')
-
-    def _logger(self, msg, level):
-        (frame, filename, lineno, function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[2]
-        filename = filename.split('pynetworking/')[1]
-        msg = '{0:30} [{1:3}] {2}'.format(filename, lineno, msg)
+            self._load_feature_config(fname, fobj, self._get_feature_config(fobj, tree, cfg))
+
+    def _load_features_config(self, features):
+        # refresh only the given (name, feature) pairs, each one with the sections
+        # of the running configuration it declares or with the whole configuration
+        self.log_info("load configuration of {0}".format(', '.join([fname for fname, fobj in features])))
+        cfg = None
+        tree = None
+        for fname, fobj in features:
+            sections = fobj.config_sections
+            if sections and all([section in self.system.partial_config for section in sections]):
+                partial = ConfigTree(''.join([self.system.get_config(section) for section in sections]))
+                self._load_feature_config(fname, fobj, partial.get_text(sections))
+            else:
+                if tree is None:
+                    cfg = self.system.get_config()
+                    tree = ConfigTree(cfg)
+                    self._running_config = (cfg, tree)
+                self._load_feature_config(fname, fobj, self._get_feature_config(fobj, tree, cfg))
+
+    def _get_feature_config(self, fobj, tree, cfg):
+        if fobj.config_sections:
+            return tree.get_text(fobj.config_sections)
+        return cfg
+
+    def _load_feature_config(self, fname, fobj, cfg):
+        digest = md5(cfg).hexdigest()
+        if fobj.config_only and self._config_digests.get(fname) == digest:
+            self.log_info("configuration of feature {0} is unchanged".format(fname))
+            return
+        fobj.load_config(cfg)
+        self._config_digests[fname] = digest
+
+    def log_debug(self, msg, *args):
+        self._logger(logging.DEBUG, msg, args)
+
+    def log_info(self, msg, *args):
+        self._logger(logging.INFO, msg, args)
+
+    def log_warn(self, msg, *args):
+        self._logger(logging.WARN, msg, args)
+
+    def log_error(self, msg, *args):
+        self._logger(logging.ERROR, msg, args)
+
+    def log_critical(self, msg, *args):
+        self._logger(logging.CRITICAL, msg, args)
+
+    def _logger(self, level, msg, args):
+        # nothing is formatted and no frame is looked up unless the message is
+        # emitted; LazyArg arguments are only computed at that point
+        if self._log_level == logging.NOTSET or level < self._log_level:
+            return
+        if args:
+            msg = msg.format(*args)
+        frame = sys._getframe(2)
         log = logging.getLogger(self._host)
-        if self._log_level != 0:
-            getattr(log, level)(msg)
+        record = log.makeRecord(log.name, level, frame.f_code.co_filename, frame.f_lineno, msg, (), None, frame.f_code.co_name)
+        # features/ and system/ have modules with the same name
+        record.filename = record.pathname.split('pynetworking/')[-1]
+        log.handle(record)
 
     def _start_proxy(self):
         self.log_debug("_start_proxy")
+        if self._proxy_shared:
+            self._open_channel()
+            return
         if not isinstance(self._proxy, Process) or (isinstance(self._proxy, Process) and not self._proxy.is_alive()):
             self.log_info("creating proxy process {0} with zmq url {1}".format('cq-{0}'.format(self._host), self._proxy_url))
-            self._proxy = Process(name='cq-{0}'.format(self._host), target=self._proxy_target, args=(self,))
+            ready_r, ready_w = Pipe(duplex=False)
+            self._proxy = Process(name='cq-{0}'.format(self._host), target=self._proxy_target, args=(self, ready_w))
+            self._close_channel()
             self._proxy.start()
-            sleep(1)
-            self.log_debug("proxy process started")
-
-    def _open(self):
+            ready_w.close()
+            try:
+                if ready_r.poll(self._proxy_connection_timeout / 1000.0):
+                    self.log_debug("proxy process started ({0})".format(ready_r.recv()))
+                else:
+                    self.log_warn("proxy process not ready after {0} ms".format(self._proxy_connection_timeout))
+            except EOFError:
+                self.log_warn("proxy process exited before being ready ({0})".format(self._proxy.exitcode))
+            ready_r.close()
+        self._open_channel()
+
+    def _open_channel(self):
+        # the REQ socket is kept for the whole life of the proxy and it is
+        # recreated only after an error, when its send/recv state is unknown
+        if self._proxy_skt is None:
+            self.log_debug("opening channel to {0}".format(self._proxy_url))
+            if self._proxy_ctx is None:
+                self._proxy_ctx = zmq.Context()
+            self._proxy_skt = self._proxy_ctx.socket(zmq.REQ)
+            self._proxy_skt.setsockopt(zmq.LINGER, 1000)
+            self._proxy_skt.connect(self._proxy_url)
+            self._proxy_poller = zmq.Poller()
+            self._proxy_poller.register(self._proxy_skt, zmq.POLLIN)
+
+    def _close_channel(self):
+        if self._proxy_skt is not None:
+            self.log_debug("closing channel to {0}".format(self._proxy_url))
+            self._proxy_poller.unregister(self._proxy_skt)
+            self._proxy_skt.close(linger=0)
+            self._proxy_skt = None
+            self._proxy_poller = None
+
+    def _open(self, features=None):
         self.cmd({'cmds': [{'cmd': '_status', 'prompt': ''}]})
-        self._load_core_facts()
-        self._load_features()
+        if not self._load_cached_facts():
+            self._load_core_facts()
+            if self._facts_cache is not None:
+                self._probe = self._get_probe(self._facts['os'])
+        self._load_features(features)
         self.load_system()
 
-    def _mocked_open(self):
+    def _load_cached_facts(self):
+        if self._facts_cache is None:
+            return False
+        snapshot = self._facts_cache.load(self._host)
+        if snapshot is None or 'os' not in snapshot['facts']:
+            self.log_info("no cached facts")
+            return False
+        try:
+            self._probe = self._get_probe(snapshot['facts']['os'])
+        except:
+            self.log_info("error probing the device ({0})".format(sys.exc_info()[0]))
+            self.log_debug(traceback.format_exc())
+            self._probe = None
+            return False
+        if not self._facts_cache.is_valid(snapshot, self._probe):
+            self.log_info("cached facts are stale")
+            return False
+        self.log_info("using cached facts")
+        self._facts = snapshot['facts']
+        if self._facts_cache.is_fresh(snapshot):
+            self._cached_config = snapshot['config']
+        return True
+
+    def _get_probe(self, os):
+        m = __import__('pynetworking.facts.core_{0}'.format(os))
+        for comp in ('facts', 'core_{0}'.format(os), 'probe'):
+            m = getattr(m, comp)
+        probe = m(self)
+        self.log_debug("probe {0}", probe)
+        return probe
+
+    def _mocked_open(self, features=None):
         # use 2 because is a second level nesting (test_...(dut, log_level) - open() - _mocked_open())
         frm = inspect.stack()[2]           # pragma: no cover
         mod = inspect.getmodule(frm[0])    # pragma: no cover
@@ -290,7 +515,7 @@ class Device(object):
         if feat == os:                     # pragma: no cover
             os = 'awp'                     # pragma: no cover
         if os == 'coverage':               # pragma: no cover
-            self._open()                   # pragma: no cover
+            self._open(features)           # pragma: no cover
             return                         # pragma: no cover
 
         yaml_load_mocked = MagicMock()                                                      # pragma: no cover
@@ -301,7 +526,7 @@ class Device(object):
                 load_facts_mocked.side_effect = self._mock_load_facts(os)                   # pragma: no cover
                 self.cmd({'cmds': [{'cmd': '_status', 'prompt': ''}]})                      # pragma: no cover
                 self._load_core_facts()                                                     # pragma: no cover
-                self._load_features()                                                       # pragma: no cover
+                self._load_features(features)                                               # pragma: no cover
                 self.load_system()                                                          # pragma: no cover
 
     def _mock_load_features(self, os, feat):
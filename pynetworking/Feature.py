@@ -1,11 +1,51 @@
 # -*- coding: utf-8 -*-
 #
+from functools import wraps
+from time import sleep, time
 
 
 class Feature(object):
+    # sections of the running configuration (e.g. 'interface') read by
+    # load_config, None when it needs the whole configuration
+    config_sections = None
+    # False when load_config also reads the device, so that it cannot be
+    # skipped when the configuration is unchanged
+    config_only = True
+
     def __init__(self, device, **kvargs):
         self._device = device
         self._opts = kvargs
 
     def load_config(self, config):  # pragma: no cover
         pass
+
+    def _wait_for(self, condition, timeout, interval=0.25, max_interval=2):
+        """
+        Call condition, which re-reads the state from the device, until it returns True or timeout seconds have
+        passed, doubling the interval between the calls. Return True if condition was met, False on timeout.
+        """
+        deadline = time() + timeout
+        while True:
+            if condition():
+                return True
+            left = deadline - time()
+            if left <= 0:
+                self._device.log_warn("state not converged after {0} seconds".format(timeout))
+                return False
+            sleep(min(interval, left))
+            interval = min(interval * 2, max_interval)
+
+
+def snapshot(update):
+    """
+    Decorator for the methods reading the state of a feature from the device. Inside a Device.snapshot() block the
+    state is read once and then reused until the snapshot expires or a change is sent to the device.
+    """
+    @wraps(update)
+    def wrapper(self):
+        key = (id(self), update.__name__)
+        if self._device._is_snapshot_fresh(key):
+            return
+        update(self)
+        self._device._set_snapshot_time(key)
+    return wrapper
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import socket
+import logging
+import threading
+import SocketServer
+from time import time
+from pynetworking.features.awp_file import HTTPHandler
+from pynetworking.utils.digest import file_sha256
+
+
+log = logging.getLogger(__name__)
+
+
+class _FileHandler(HTTPHandler):
+    def _get_path(self):
+        # /<sha256>/<name>
+        parts = self.path.split('/')
+        if len(parts) != 3:
+            return None
+        return self.server.get_path(parts[1])
+
+    def _progress(self, sent, size):
+        self.server.set_progress(self.client_address[0], self.path.split('/')[1], sent, size)
+
+    def log_message(self, format, *args):
+        log.debug("%s %s", self.client_address[0], format % args)
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    request_queue_size = 64
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, files):
+        # the handler logs through _d, the device of the servers started by awp_file
+        self._d = self
+        self._files = files
+        SocketServer.TCPServer.__init__(self, address, _FileHandler)
+
+    def get_path(self, digest):
+        return self._files.get_path(digest)
+
+    def set_progress(self, host, digest, sent, size):
+        self._files.set_progress(host, digest, sent, size)
+
+    def log_info(self, msg):
+        log.info(msg)
+
+    def log_warn(self, msg):
+        log.warn(msg)
+
+    def log_error(self, msg):
+        log.error(msg)
+
+
+class FileServer(object):
+    """
+    Long-lived HTTP server from which many devices copy files at the same time, like the firmware of a fleet.
+    Files are published under the sha256 of their content, so that a changed file never gets a stale URL.
+    """
+    def __init__(self, address='', port=0, host_address=None):
+        self._address = (address, port)
+        self._host_address = host_address
+        self._server = None
+        self._lock = threading.Lock()
+        # sha256 -> path
+        self._paths = {}
+        # path -> (size, mtime, sha256)
+        self._digests = {}
+        # host -> {'file', 'sha256', 'sent', 'size', 'done', 'time'}
+        self._progress = {}
+
+    @property
+    def port(self):
+        self._start()
+        return self._server.server_address[1]
+
+    def publish(self, filename):
+        """
+        URL from which the devices copy filename
+        """
+        path = os.path.abspath(filename)
+        if not os.path.isfile(path):
+            raise KeyError('file {0} not available'.format(filename))
+        digest = self._get_digest(path)
+        with self._lock:
+            self._paths[digest] = path
+        self._start()
+        return 'http://{0}:{1}/{2}/{3}'.format(self._host_address, self.port, digest, os.path.basename(path))
+
+    def progress(self, host=None):
+        """
+        Transfer state of the devices that copied a file, keyed by their address
+        """
+        with self._lock:
+            if host is not None:
+                return dict(self._progress.get(host, {}))
+            return dict([(h, dict(p)) for h, p in self._progress.items()])
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def get_path(self, digest):
+        with self._lock:
+            path = self._paths.get(digest)
+        if path is None:
+            return None
+        # a file changed, removed or renamed after it was published is not served under the old digest
+        try:
+            if self._get_digest(path) != digest:
+                return None
+        except OSError:
+            return None
+        return path
+
+    def set_progress(self, host, digest, sent, size):
+        with self._lock:
+            self._progress[host] = {'file': os.path.basename(self._paths[digest]), 'sha256': digest,
+                                    'sent': sent, 'size': size, 'done': sent == size, 'time': time()}
+
+    def _start(self):
+        with self._lock:
+            if self._server is not None:
+                return
+            if self._host_address is None:
+                self._host_address = socket.gethostbyname(socket.getfqdn())
+            self._server = _Server(self._address, self)
+            server_thread = threading.Thread(target=self._server.serve_forever)
+            server_thread.daemon = True
+            server_thread.start()
+            log.info("file server running on {0}:{1}".format(*self._server.server_address))
+
+    def _get_digest(self, path):
+        # the digest is computed again only when the size or the modification time change
+        st = os.stat(path)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached is not None and cached[0:2] == (st.st_size, st.st_mtime):
+            return cached[2]
+        digest = file_sha256(path)
+        with self._lock:
+            self._digests[path] = (st.st_size, st.st_mtime, digest)
+        return digest
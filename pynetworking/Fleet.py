@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+from Queue import Queue, Empty
+from collections import namedtuple
+from time import time
+from pynetworking.Device import Device, DeviceException
+from pynetworking.FileServer import FileServer
+
+
+FleetResult = namedtuple('FleetResult', ['host', 'output', 'error'])
+
+
+class Fleet(object):
+    """
+    Run the same query against many devices using a bounded pool of worker threads
+    """
+    def __init__(self, inventory, concurrency=10, timeout=None, features=None, **kvargs):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._features = features
+        self._devices = {}
+        self._hosts = []
+        self._opened = set()
+        # hosts whose worker is still running, also after a timeout, and the
+        # worker threads not joined yet
+        self._busy = set()
+        self._workers = []
+        self._lock = threading.Lock()
+        for item in inventory:
+            if isinstance(item, Device):
+                dev = item
+            else:
+                if not isinstance(item, dict):
+                    item = {'host': item}
+                opts = dict(kvargs.items() + item.items())
+                dev = Device(**opts)
+            if dev.host in self._devices:
+                raise ValueError("host {0} is already in the inventory".format(dev.host))
+            self._hosts.append(dev.host)
+            self._devices[dev.host] = dev
+
+    @property
+    def hosts(self):
+        return list(self._hosts)
+
+    def __getitem__(self, host):
+        if host not in self._devices:
+            raise KeyError('host {0} is not in the inventory'.format(host))
+        return self._devices[host]
+
+    def __iter__(self):
+        for host in self._hosts:
+            yield host
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def open(self, timeout=None):
+        return list(self.run(lambda dev: None, timeout=timeout))
+
+    def close(self, timeout=None):
+        if timeout is None:
+            timeout = self._timeout
+        # a host still running a query after timeout is reported busy and left open
+        self.wait(timeout)
+        with self._lock:
+            hosts = [host for host in self._hosts if host in self._opened]
+        return list(self._submit(hosts, self._close_host, timeout))
+
+    def wait(self, timeout=None):
+        deadline = None
+        if timeout is not None:
+            deadline = time() + timeout
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            if deadline is None:
+                worker.join()
+            else:
+                worker.join(max(0, deadline - time()))
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            return len(self._workers) == 0
+
+    def run(self, query, *args, **kwargs):
+        timeout = kwargs.pop('timeout', None)
+        func = self._get_query(query, args, kwargs)
+        return self._submit(self._hosts, lambda host: self._run_host(host, func), timeout)
+
+    def update_firmware(self, filename, concurrency=None, timeout=None, file_server=None, tftp_service=None, **kwargs):
+        """
+        Copy the firmware to all the devices and boot them with it, staging at most concurrency devices at a time.
+        AWP devices copy it over HTTP from a single FileServer, ATS devices over TFTP from tftp_service if given
+        """
+        own_server = file_server is None
+        if own_server:
+            file_server = FileServer()
+        # the protocol depends on the device, it cannot be given for the whole fleet
+        kwargs.pop('protocol', None)
+
+        def func(dev):
+            if dev.facts['os'] == 'awp':
+                return dev.system.update_firmware(filename, file_server=file_server, **kwargs)
+            if tftp_service is not None:
+                return dev.system.update_firmware(filename, protocol='tftp', tftp_service=tftp_service, **kwargs)
+            return dev.system.update_firmware(filename, protocol='tftp', **kwargs)
+
+        try:
+            return list(self._submit(self._hosts, lambda host: self._run_host(host, func), timeout, concurrency))
+        finally:
+            if own_server:
+                # the devices that timed out may still be copying the firmware
+                self.wait()
+                file_server.close()
+
+    def _get_query(self, query, args, kwargs):
+        if callable(query):
+            return lambda dev: query(dev, *args, **kwargs)
+
+        path = query
+        if path.endswith('()'):
+            path = path[:-2]
+
+        def func(dev):
+            obj = dev
+            for attr in path.split('.'):
+                obj = getattr(obj, attr)
+            if callable(obj):
+                obj = obj(*args, **kwargs)
+            return obj
+        return func
+
+    def _run_host(self, host, func):
+        dev = self._devices[host]
+        with self._lock:
+            opened = host in self._opened
+        if not opened:
+            try:
+                dev.open(features=self._features)
+            except:
+                exc_info = sys.exc_info()
+                try:
+                    dev.close()
+                except:
+                    dev.log_warn("error closing device after a failed open ({0})".format(sys.exc_info()[1]))
+                raise exc_info[0], exc_info[1], exc_info[2]
+            with self._lock:
+                self._opened.add(host)
+        return func(dev)
+
+    def _close_host(self, host):
+        with self._lock:
+            self._opened.discard(host)
+        self._devices[host].close()
+
+    def _submit(self, hosts, func, timeout, concurrency=None):
+        if timeout is None:
+            timeout = self._timeout
+        if concurrency is None:
+            concurrency = self._concurrency
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        jobs = Queue()
+        results = Queue()
+        for host in hosts:
+            jobs.put(host)
+
+        for i in range(min(concurrency, len(hosts))):
+            worker = threading.Thread(target=self._worker, args=(func, jobs, results))
+            worker.daemon = True
+            with self._lock:
+                self._workers = [w for w in self._workers if w.is_alive()] + [worker]
+            worker.start()
+
+        return self._collect(hosts, results, timeout)
+
+    def _worker(self, func, jobs, results):
+        while True:
+            try:
+                host = jobs.get_nowait()
+            except Empty:
+                return
+            results.put((host, time(), None, None, False))
+            # a device, and its proxy channel, is used by one thread at a time
+            with self._lock:
+                busy = host in self._busy
+                self._busy.add(host)
+            if busy:
+                error = DeviceException('host {0} is still running a previous query'.format(host))
+                results.put((host, time(), None, error, True))
+                continue
+            try:
+                results.put((host, time(), func(host), None, True))
+            except:
+                results.put((host, time(), None, sys.exc_info()[1], True))
+            finally:
+                with self._lock:
+                    self._busy.discard(host)
+
+    def _collect(self, hosts, results, timeout):
+        # results are yielded as they come, a host taking longer than timeout
+        # is reported as failed but its worker keeps running until it returns;
+        # the host is refused by other queries until then (see wait)
+        pending = set(hosts)
+        started = {}
+        while pending:
+            try:
+                host, when, output, error, done = results.get(timeout=0.1)
+            except Empty:
+                host = None
+            if host in pending:
+                if done:
+                    pending.discard(host)
+                    yield FleetResult(host, output, error)
+                else:
+                    started[host] = when
+            if timeout is not None:
+                for host in [h for h in pending if h in started and time() - started[h] > timeout]:
+                    pending.discard(host)
+                    yield FleetResult(host, None, DeviceException('timeout after {0} seconds'.format(timeout)))
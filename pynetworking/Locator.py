@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import re
+import sqlite3
+from collections import namedtuple
+from time import time
+from pynetworking.utils.mac_table import parse_mac, int_to_mac
+
+
+MacLocation = namedtuple('MacLocation', ['mac', 'host', 'interface', 'vlan', 'type', 'first_seen', 'last_seen'])
+
+
+class MacLocator(object):
+    """
+    Index of the mac addresses learned by the devices of a fleet, giving the host and the interface where each of
+    them is seen. Every poll only touches the entries that changed since the previous one.
+    """
+    def __init__(self, fleet, database=None):
+        self._fleet = fleet
+        # mac -> {host: [interface, vlan, type, first_seen, last_seen]}
+        self._macs = {}
+        self._hosts = {}
+        self._ouis = {}
+        self._vlans = {}
+        # number of macs learned on each (host, interface), edge ports have few
+        self._ports = {}
+        self._db = None
+        if database is not None:
+            self._db = sqlite3.connect(database)
+            self._db.execute('CREATE TABLE IF NOT EXISTS mac_location (mac INTEGER, host TEXT, interface TEXT, vlan INTEGER, '
+                             'type TEXT, first_seen REAL, last_seen REAL, PRIMARY KEY (mac, host))')
+            for row in self._db.execute('SELECT mac, host, interface, vlan, type, first_seen, last_seen FROM mac_location'):
+                self._add(*row)
+
+    def poll(self, timeout=None, use_cache=True):
+        results = []
+        for result in self._fleet.run(lambda dev: dev.mac.table(use_cache=use_cache), timeout=timeout):
+            if result.error is None:
+                self._update(result.host, result.output, time())
+            results.append(result)
+        return results
+
+    def locate(self, mac):
+        mac = parse_mac(mac)
+        return self._get_locations([(mac, host) for host in self._macs.get(mac, {})])
+
+    def by_oui(self, oui):
+        digits = re.sub('[\.:\-]', '', str(oui))
+        if not re.match('^[0-9a-fA-F]{6}$', digits):
+            raise ValueError('{0} is not a valid OUI'.format(oui))
+        return self._get_locations([(mac, host) for mac in self._ouis.get(int(digits, 16), ()) for host in self._macs[mac]])
+
+    def by_vlan(self, vlan):
+        return self._get_locations(self._vlans.get(int(vlan), ()))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __contains__(self, mac):
+        try:
+            return parse_mac(mac) in self._macs
+        except ValueError:
+            return False
+
+    def __len__(self):
+        return len(self._macs)
+
+    def _get_locations(self, keys):
+        ret = []
+        for mac, host in keys:
+            interface, vlan, type, first_seen, last_seen = self._macs[mac][host]
+            ret.append(MacLocation(int_to_mac(mac), host, interface, vlan, type, first_seen, last_seen))
+        # the port with the fewest macs first, it is the closest to the station
+        ret.sort(key=lambda l: (self._ports[(l.host, l.interface)], l.host, l.mac))
+        return ret
+
+    def _update(self, host, table, now):
+        old = self._hosts.get(host, set())
+        new = set()
+        # the new and moved entries are written whole, the others only get a new last seen time
+        changed = []
+        seen = []
+        for mac, vlan, interface, action, type in table.rows():
+            new.add(mac)
+            loc = self._macs.get(mac, {}).get(host)
+            if loc is not None and loc[0:3] == [interface, vlan, type]:
+                loc[4] = now
+                seen.append((now, mac, host))
+            else:
+                if loc is not None:
+                    self._remove(mac, host)
+                self._add(mac, host, interface, vlan, type, now, now)
+                changed.append((mac, host, interface, vlan, type, now, now))
+        removed = old - new
+        for mac in removed:
+            self._remove(mac, host)
+        self._hosts[host] = new
+
+        if self._db is not None:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO mac_location VALUES (?, ?, ?, ?, ?, ?, ?)', changed)
+                self._db.executemany('UPDATE mac_location SET last_seen = ? WHERE mac = ? AND host = ?', seen)
+                self._db.executemany('DELETE FROM mac_location WHERE mac = ? AND host = ?', [(mac, host) for mac in removed])
+
+    def _add(self, mac, host, interface, vlan, type, first_seen, last_seen):
+        self._macs.setdefault(mac, {})[host] = [interface, vlan, type, first_seen, last_seen]
+        self._hosts.setdefault(host, set()).add(mac)
+        self._ouis.setdefault(mac >> 24, set()).add(mac)
+        self._vlans.setdefault(vlan, set()).add((mac, host))
+        self._ports[(host, interface)] = self._ports.get((host, interface), 0) + 1
+
+    def _remove(self, mac, host):
+        interface, vlan, type, first_seen, last_seen = self._macs[mac].pop(host)
+        if not self._macs[mac]:
+            del self._macs[mac]
+            self._discard(self._ouis, mac >> 24, mac)
+        self._discard(self._vlans, vlan, (mac, host))
+        self._ports[(host, interface)] -= 1
+        if not self._ports[(host, interface)]:
+            del self._ports[(host, interface)]
+
+    def _discard(self, index, key, value):
+        # empty sets are dropped, macs come and go and the index must not grow with them
+        index[key].discard(value)
+        if not index[key]:
+            del index[key]
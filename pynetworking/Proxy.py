@@ -6,6 +6,7 @@ import socket
 from time import sleep, time
 import zmq
 import json
+import threading
 from pynetworking.utils.cache import Cache, CacheMissException
 
 
@@ -14,11 +15,22 @@ import logging
 log = logging.getLogger('paramiko').setLevel(logging.CRITICAL)
 
 
+# size of each read from the ssh channel and how far back the prompt is
+# searched when a new chunk of the reply arrives
+RECV_SIZE = 65536
+PROMPT_WINDOW = 256
+_prompts = {}
+
+# reply of SharedProxy to a message without password for a session it does
+# not have, the message has to be sent again with the password
+UNKNOWN_SESSION = 'unknown session'
+
+
 class ProxyException(Exception):
     pass
 
 
-def SSHProxy(device):
+def SSHProxy(device, ready=None):
     device.log_info("starting SSHProxy on {0} for device {1}:{2}".format(device._proxy_url, device._host, device._port))
     context = zmq.Context()
     zmq_s = context.socket(zmq.REP)
@@ -26,6 +38,160 @@ def SSHProxy(device):
     zmq_p = zmq.Poller()
     zmq_p.register(zmq_s, zmq.POLLIN)
     cache = Cache()
+    chan, status = _open_session(device)
+
+    device.log_info("ready to accept commands")
+    if ready is not None:
+        ready.send(status['status'])
+        ready.close()
+    while True:
+        # getting command to execute
+        if len(zmq_p.poll(device._proxy_connection_timeout)) == 0:
+            device.log_info("shutting down proxy")
+            if chan is not None:
+                chan.close()
+            sys.exit(0)
+
+        cmd = json.loads(zmq_s.recv(zmq.NOBLOCK))
+        ret, exitcode = _execute(device, chan, cache, status, cmd)
+        zmq_s.send_string(json.dumps(ret))
+        if exitcode is not None:
+            if exitcode != 0:
+                sleep(0.5)
+            sys.exit(exitcode)
+
+
+def SharedProxy(url, log_level='NOTSET', log_output='console:'):
+    """
+    Serve many devices from a single process. Every session (host, port and
+    username) is handled by its own thread, so commands to different devices run
+    in parallel, while the ROUTER socket bound on url is owned by this thread only.
+    """
+    log = logging.getLogger('SharedProxy')
+    hdl = logging.StreamHandler()
+    if log_output.startswith('file://'):
+        hdl = logging.FileHandler(log_output.split('://')[1])
+    hdl.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)-6s - %(message)s'))
+    log.handlers = [hdl]
+    log.setLevel(getattr(logging, log_level.upper()))
+    log.disabled = log.level == logging.NOTSET
+    log.propagate = False
+    log.info("starting SharedProxy on {0}".format(url))
+    context = zmq.Context()
+    zmq_s = context.socket(zmq.ROUTER)
+    zmq_s.bind(url)
+    zmq_p = zmq.Poller()
+    zmq_p.register(zmq_s, zmq.POLLIN)
+    sessions = {}
+    pipes = {}
+    while True:
+        for skt, event in zmq_p.poll(1000):
+            if skt is zmq_s:
+                frames = zmq_s.recv_multipart()
+                identity, msg = frames[0], frames[-1]
+                try:
+                    cmd = json.loads(msg)
+                    key = (cmd['session']['host'], cmd['session']['port'], cmd['session']['username'])
+                except (ValueError, KeyError, TypeError):
+                    log.warn("session missing in zmq message")
+                    zmq_s.send_multipart([identity, '', json.dumps({'status': 'Error', 'output': 'missing session'})])
+                    continue
+                pcmd = cmd.get('cmds', [{}])[0].get('cmd', '')
+                if key not in sessions and pcmd == '_exit':
+                    zmq_s.send_multipart([identity, '', json.dumps({'status': 'Success', 'output': 'shutting down proxy'})])
+                    continue
+                if key not in sessions and 'password' not in cmd['session']:
+                    log.info("unknown session {0}".format(key))
+                    zmq_s.send_multipart([identity, '', json.dumps({'status': 'Error', 'output': UNKNOWN_SESSION})])
+                    continue
+                if key not in sessions:
+                    log.info("opening session {0}".format(key))
+                    session = _SharedSession(context, cmd['session'], log_level, log_output)
+                    zmq_p.register(session.pipe, zmq.POLLIN)
+                    pipes[session.pipe] = session
+                    sessions[key] = session
+                    session.start()
+                session = sessions[key]
+                session.running += 1
+                session.pipe.send_multipart(['cmd', identity, msg])
+                if pcmd == '_exit':
+                    _close_shared_session(log, sessions, key)
+            else:
+                session = pipes[skt]
+                state, identity, reply = skt.recv_multipart()
+                zmq_s.send_multipart([identity, '', reply])
+                session.running -= 1
+                session.last_seen = time()
+                if state == 'failed' and sessions.get(session.key) is session:
+                    _close_shared_session(log, sessions, session.key)
+
+        for key, session in sessions.items():
+            if session.running == 0 and time() - session.last_seen > session.timeout:
+                _close_shared_session(log, sessions, key)
+
+        for pipe, session in pipes.items():
+            if session.closed and not session.is_alive():
+                zmq_p.unregister(pipe)
+                pipe.close()
+                del pipes[pipe]
+
+
+def _close_shared_session(log, sessions, key):
+    # no more messages are routed to a closed session, a new message for the
+    # same key opens a new one
+    log.info("closing session {0}".format(key))
+    session = sessions.pop(key)
+    session.closed = True
+    session.pipe.send_multipart(['close', '', ''])
+
+
+class _SharedSession(threading.Thread):
+    _count = 0
+
+    def __init__(self, context, opts, log_level, log_output):
+        from pynetworking.Device import Device
+        threading.Thread.__init__(self, name='cq-{0}'.format(opts['host']))
+        self.daemon = True
+        self.key = (opts['host'], opts['port'], opts['username'])
+        self.timeout = opts.get('connection_timeout', 20)
+        # commands sent to the session and not replied yet, it is idle since
+        # last_seen only when there are none
+        self.running = 0
+        self.last_seen = time()
+        self.closed = False
+        self._device = Device(opts['host'], username=opts['username'], password=opts['password'], port=opts['port'],
+                              log_level=log_level, log_output=log_output, connection_timeout=self.timeout)
+        _SharedSession._count += 1
+        url = 'inproc://shared-session-{0}'.format(_SharedSession._count)
+        self.pipe = context.socket(zmq.PAIR)
+        self.pipe.bind(url)
+        self._pipe = context.socket(zmq.PAIR)
+        self._pipe.connect(url)
+
+    def run(self):
+        device = self._device
+        cache = Cache()
+        chan, status = _open_session(device)
+        state = 'ready'
+        while True:
+            kind, identity, msg = self._pipe.recv_multipart()
+            if kind == 'close':
+                break
+            try:
+                ret, exitcode = _execute(device, chan, cache, status, json.loads(msg))
+                if exitcode:
+                    state = 'failed'
+            except:
+                device.log_warn("exception executing commands ({0})".format(sys.exc_info()[0]))
+                ret = {'status': 'Error', 'output': 'ProxyException'}
+                state = 'failed'
+            self._pipe.send_multipart([state, identity, json.dumps(ret)])
+        if chan is not None:
+            chan.close()
+        self._pipe.close()
+
+
+def _open_session(device):
     if device._port == 'auto':
         port = 22
     else:
@@ -69,6 +235,7 @@ def SSHProxy(device):
                 ret = {'status': 'Error', 'output': "authentication failed"}
 
     # getting shell to device
+    chan = None
     if ret['status'] == 'Success':
         try:
             device.log_debug("getting a shell to the device")
@@ -76,11 +243,9 @@ def SSHProxy(device):
             chan.get_pty()
             chan.invoke_shell()
             chan.settimeout(5)
-            sleep(1)
-            if 'User Name:' in chan.recv(999):
+            if 'User Name:' in _get_banner(device, chan, r'(User Name:|[\>\#]\s*$)'):
                 chan.send(device.username + '\n')
-                sleep(1)
-                if 'Password:' in chan.recv(999):
+                if 'Password:' in _get_banner(device, chan, r'Password:'):
                     chan.send(device.password + '\n')
                 _get_reply(device, chan, r'\n[\w\_]+\#')
         except SSHException:
@@ -90,114 +255,140 @@ def SSHProxy(device):
             device.log_warn("ProxyException ({0})", sys.exc_info()[0])
             ret = {'status': 'Error', 'output': "ProxyException ({0})".format(sys.exc_info()[0])}
 
-    device.log_info("ready to accept commands")
-    while True:
-        # getting command to execute
-        if len(zmq_p.poll(device._proxy_connection_timeout)) == 0:
-            device.log_info("shutting down proxy")
-            chan.close()
-            sys.exit(0)
+    return chan, ret
 
-        cmd = json.loads(zmq_s.recv(zmq.NOBLOCK))
-        device.log_debug("execute commands {0}".format(cmd))
-
-        if 'cmds' not in cmd and 'cmd' not in cmd['cmds'][0]:
-            device.log_warn("commands missing in zmq message")
-            ret = {'status': 'Error', 'output': 'missing cmd'}
-            zmq_s.send_string(json.dumps(ret))
-            continue
-
-        if 'cmd' in cmd['cmds'][0] and cmd['cmds'][0]['cmd'].startswith('_'):
-            pcmd = cmd['cmds'][0]['cmd']
-            device.log_debug("executing internal command {0}".format(pcmd))
-            if pcmd == '_exit':
-                device.log_info("shutting down proxy")
+
+def _execute(device, chan, cache, status, cmd):
+    # return the reply to a zmq message and, when the session has to be
+    # closed after the reply, the exit code
+    device.log_debug("execute commands {0}".format(cmd))
+
+    if 'cmds' not in cmd and 'cmd' not in cmd['cmds'][0]:
+        device.log_warn("commands missing in zmq message")
+        return {'status': 'Error', 'output': 'missing cmd'}, None
+
+    if 'cmd' in cmd['cmds'][0] and cmd['cmds'][0]['cmd'].startswith('_'):
+        pcmd = cmd['cmds'][0]['cmd']
+        device.log_debug("executing internal command {0}".format(pcmd))
+        if pcmd == '_exit':
+            device.log_info("shutting down proxy")
+            if chan is not None:
                 chan.close()
-                ret = {'status': 'Success', 'output': 'shutting down proxy'}
-                zmq_s.send_string(json.dumps(ret))
-                exit(0)
-            elif pcmd == '_ping':
-                device.log_info("ping proxy")
-                ret = {'status': 'Success', 'output': 'pong'}
-            elif pcmd == '_status':
-                device.log_info("proxy status")
-                if ret['status'] == 'Error':
-                    zmq_s.send_string(json.dumps(ret))
-                    sleep(0.5)
-                    exit(1)
-                ret = {'status': 'Success', 'output': ''}
-            elif pcmd == '__flush_cache':
-                device.log_info("flush cache")
-                cache.flush()
-                ret = {'status': 'Success', 'output': ''}
-            else:
-                device.log_warn("unknown internal command {0}".format(pcmd))
-                ret = {'status': 'Error', 'output': 'unknown command {0}'.format(pcmd)}
+            return {'status': 'Success', 'output': 'shutting down proxy'}, 0
+        elif pcmd == '_ping':
+            device.log_info("ping proxy")
+            return {'status': 'Success', 'output': 'pong'}, None
+        elif pcmd == '_status':
+            device.log_info("proxy status")
+            if status['status'] == 'Error':
+                return status, 1
+            return {'status': 'Success', 'output': ''}, None
+        elif pcmd == '__flush_cache':
+            device.log_info("flush cache")
+            cache.flush()
+            return {'status': 'Success', 'output': ''}, None
+        elif pcmd == '__cache_stats':
+            device.log_info("cache stats")
+            return {'status': 'Success', 'output': cache.stats()}, None
         else:
-            try:
-                out = ''
-                ret = {'status': 'Error', 'output': 'Unknown Error'}
-                try:
-                    if cmd['cache']:
-                        out = cache.get(cmd['cmds'])
-                    else:
-                        device.log_info("cache disabled")
-                        raise CacheMissException
-                except CacheMissException:
-                    for c in cmd['cmds']:
-                        if ('timeout' in c.keys()):
-                            ttimeout = c['timeout'] / 1000
-                            chan.settimeout(ttimeout)
-                        else:
-                            chan.settimeout(5)
-                        device.log_info("sending command '{0}' to device".format(c['cmd']))
-                        if c['cmd'] == chr(26):
-                            chan.send(c['cmd'])
-                        else:
-                            chan.send(c['cmd'] + '\n')
-                        if (('dontwait' in c.keys()) and (c['dontwait'] is True)):
-                            break
-                        out += _get_reply(device, chan, c['prompt'])
-                if cmd['flush_cache']:
-                    device.log_info("flush cache")
-                    cache.flush()
-                if cmd['cache']:
-                    cache.set(cmd['cmds'], out)
-                ret = {'status': 'Success', 'output': out}
-            except ProxyException:
-                device.log_warn("ProxyException")
-                ret = {'status': 'Error', 'output': 'ProxyException'}
-        zmq_s.send_string(json.dumps(ret))
+            device.log_warn("unknown internal command {0}".format(pcmd))
+            return {'status': 'Error', 'output': 'unknown command {0}'.format(pcmd)}, None
 
+    if status['status'] == 'Error':
+        return status, None
 
-def _get_reply(device, chan, prompt):
-    prompt = '[\n\r]\w*' + prompt
     try:
-        device.log_debug("waiting for {0}".format(repr(prompt)))
-        buff = ''
+        out = ''
+        try:
+            if cmd['cache']:
+                out = cache.get(cmd['cmds'])
+            else:
+                device.log_info("cache disabled")
+                raise CacheMissException
+        except CacheMissException:
+            for c in cmd['cmds']:
+                if ('timeout' in c.keys()):
+                    ttimeout = c['timeout'] / 1000
+                    chan.settimeout(ttimeout)
+                else:
+                    chan.settimeout(5)
+                device.log_info("sending command '{0}' to device".format(c['cmd']))
+                if c['cmd'] == chr(26):
+                    chan.send(c['cmd'])
+                else:
+                    chan.send(c['cmd'] + '\n')
+                if (('dontwait' in c.keys()) and (c['dontwait'] is True)):
+                    break
+                out += _get_reply(device, chan, c['prompt'])
+        if cmd['flush_cache'] is True:
+            device.log_info("flush cache")
+            cache.flush()
+        elif cmd['flush_cache']:
+            device.log_info("invalidate cache for {0}".format(', '.join(cmd['flush_cache'])))
+            cache.invalidate(cmd['flush_cache'])
+        if cmd['cache']:
+            cache.set(cmd['cmds'], out)
+        return {'status': 'Success', 'output': out}, None
+    except ProxyException:
+        device.log_warn("ProxyException")
+        return {'status': 'Error', 'output': 'ProxyException'}, None
+
+
+def _get_banner(device, chan, expect, timeout=5):
+    # read what the device sends right after the shell is opened, returning as
+    # soon as the expected text shows up instead of waiting a fixed time
+    device.log_debug("waiting for {0}".format(repr(expect)))
+    buff = ''
+    deadline = time() + timeout
+    while deadline > time():
+        try:
+            data = chan.recv(999)
+        except socket.timeout:
+            break
+        if data == '':
+            device.log_debug("channel closed while waiting for {0}".format(repr(expect)))
+            break
+        buff += data
+        if re.search(expect, buff):
+            device.log_debug("got {0}".format(repr(expect)))
+            break
+    return buff
+
+
+def _get_prompt_re(prompt):
+    if prompt not in _prompts:
+        _prompts[prompt] = re.compile('[\n\r]\w*' + prompt)
+    return _prompts[prompt]
+
+
+def _get_reply(device, chan, prompt, recv_size=None):
+    prompt_re = _get_prompt_re(prompt)
+    if recv_size is None:
+        recv_size = RECV_SIZE
+    chunks = []
+    tail = ''
+    found = False
+    try:
+        device.log_debug("waiting for {0}".format(repr(prompt_re.pattern)))
         deadline = time() + 5
-        while True:
-            ret = chan.recv(999)
+        while not found:
+            ret = chan.recv(recv_size)
             if ret == '' and deadline < time():
                 raise socket.timeout
             elif ret != '':
-                buff += ret
+                chunks.append(ret)
                 deadline = time() + 5
-            if re.search(prompt, buff):
-                device.log_debug("got prompt")
-                break
+                # a prompt not seen yet can only be in the new data or across its boundary
+                tail = tail[-PROMPT_WINDOW:] + ret
+                found = prompt_re.search(tail) is not None
+        device.log_debug("got prompt")
     except socket.timeout:
-        device.log_debug("received >{0}<".format(buff))
+        device.log_debug("received >{0}<".format(''.join(chunks)))
         device.log_warn("timeout waiting a reply or a prompt")
         raise ProxyException("Timeout")
     except:
-        device.log_debug("received >{0}<".format(buff))
+        device.log_debug("received >{0}<".format(''.join(chunks)))
         device.log_warn("exception waiting a reply or a prompt")
         raise ProxyException("")
 
-    if re.search(prompt, buff):
-        return '\n'.join(buff.split('\n')[1:-1])
-    else:
-        device.log_debug("received >{0}<".format(buff))
-        device.log_warn("Not seen any prompt")
-        raise ProxyException("Not seen any prompt")
+    return '\n'.join(''.join(chunks).split('\n')[1:-1])
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import socket
+import logging
+import tempfile
+import threading
+import tftpy
+from time import sleep, time
+from pynetworking.utils.digest import file_sha256
+
+
+log = logging.getLogger(__name__)
+
+
+class TftpService(object):
+    """
+    Long-lived TFTP server shared by the devices that copy files from and to the host, like the firmware of a fleet.
+    Published files are placed in its root directory under the sha256 of their content, so that the devices read
+    them from there instead of the host uploading them to a TFTP server first.
+    """
+    def __init__(self, root=None, address='', port=69, host_address=None):
+        self._own_root = root is None
+        if root is None:
+            root = tempfile.mkdtemp(prefix='pynetworking-tftp-')
+        self.root = os.path.abspath(root)
+        self._address = address
+        self._port = port
+        self._host_address = host_address
+        self._server = None
+        self._error = None
+        self._lock = threading.Lock()
+        # path -> (size, mtime, name)
+        self._names = {}
+        # files opened for the uploads of the devices, closed by the server after the last block
+        self._receiving = []
+
+    @property
+    def host_address(self):
+        if self._host_address is None:
+            self._host_address = socket.gethostbyname(socket.getfqdn())
+        return self._host_address
+
+    @property
+    def port(self):
+        self._start()
+        return self._server.listenport
+
+    @property
+    def server(self):
+        """
+        Server given to the devices in the tftp URLs, with the port when it is not the default one
+        """
+        port = self.port
+        if port == 69:
+            return self.host_address
+        return '{0}:{1}'.format(self.host_address, port)
+
+    def publish(self, filename):
+        """
+        Name under which the devices read filename from the server
+        """
+        path = os.path.abspath(filename)
+        if not os.path.isfile(path):
+            raise KeyError('file {0} not available'.format(filename))
+        st = os.stat(path)
+        with self._lock:
+            cached = self._names.get(path)
+        if cached is not None and cached[0:2] == (st.st_size, st.st_mtime) and os.path.exists(self.path(cached[2])):
+            name = cached[2]
+        else:
+            name = '{0}-{1}'.format(file_sha256(path)[0:16], os.path.basename(path))
+            if not os.path.exists(self.path(name)):
+                # copied under a temporary name, a device never reads a partial file
+                fd, temp = tempfile.mkstemp(dir=self.root)
+                os.close(fd)
+                shutil.copyfile(path, temp)
+                os.chmod(temp, 0644)
+                os.rename(temp, self.path(name))
+            with self._lock:
+                self._names[path] = (st.st_size, st.st_mtime, name)
+        self._start()
+        return name
+
+    def path(self, name):
+        """
+        Local path of a file of the server, like the ones copied by the devices
+        """
+        path = os.path.abspath(os.path.join(self.root, name))
+        if os.path.dirname(path) != self.root:
+            raise KeyError('file {0} is outside the server root'.format(name))
+        return path
+
+    def open(self, name, timeout=10):
+        """
+        File object of a file copied to the server, once the server has written it entirely
+        """
+        path = self.path(name)
+        deadline = time() + timeout
+        while self._is_receiving(path) and time() < deadline:
+            sleep(0.05)
+        if not os.path.exists(path):
+            raise KeyError('file {0} does not exist'.format(name))
+        return open(path, 'rb')
+
+    def url(self, name):
+        return 'tftp://{0}/{1}'.format(self.server, name)
+
+    def close(self):
+        if self._server is not None:
+            self._server.stop(now=True)
+            self._thread.join()
+            self._server = None
+        if self._own_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def _start(self):
+        with self._lock:
+            if self._server is not None:
+                return
+            self._error = None
+            self._server = tftpy.TftpServer(self.root, upload_open=self._upload_open)
+            self._thread = threading.Thread(target=self._listen, args=(self._server,))
+            self._thread.daemon = True
+            self._thread.start()
+            deadline = time() + 5
+            while not self._server.is_running.wait(0.05):
+                if not self._thread.is_alive() or time() > deadline:
+                    self._server.stop(now=True)
+                    self._server = None
+                    if self._error is not None:
+                        raise self._error
+                    raise socket.error('tftp server not started on {0}:{1}'.format(self._address, self._port))
+            log.info("tftp server running on {0}:{1} with root {2}".format(self._address, self._server.listenport,
+                                                                           self.root))
+
+    def _listen(self, server):
+        try:
+            server.listen(self._address, self._port)
+        except Exception, e:
+            # like a port already in use, raised by _start
+            self._error = e
+
+    def _upload_open(self, path, context):
+        # files in the subdirectories of the root are refused, like by path
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.root:
+            return None
+        fileobj = open(path, 'wb')
+        with self._lock:
+            self._receiving = [f for f in self._receiving if not f.closed] + [fileobj]
+        return fileobj
+
+    def _is_receiving(self, path):
+        # the server closes a received file after acknowledging its last block
+        with self._lock:
+            return any([f.name == path and not f.closed for f in self._receiving])
@@ -17,6 +17,10 @@ warnings.filterwarnings(
 )
 
 from pynetworking.Device import Device
+from pynetworking.Fleet import Fleet
+from pynetworking.FileServer import FileServer
+from pynetworking.TftpService import TftpService
+from pynetworking.Locator import MacLocator
 __username__ = Device.username
 
 import inspect
@@ -1,4 +1,5 @@
 import re
+from time import time
 
 
 def core_ats(dev):
@@ -7,7 +8,7 @@ def core_ats(dev):
 
     out = dev.cmd({'cmds': [{'cmd': 'show version', 'prompt': '\#'}]})
 
-    dev.log_debug("show version\n{0}".format(out))
+    dev.log_debug("show version\n{0}", out)
 
     #
     #        Unit             SW version         Boot version         HW version
@@ -29,7 +30,7 @@ def core_ats(dev):
     dev.boot_version = ret['boot version']
 
     out = dev.cmd({'cmds': [{'cmd': 'show system', 'prompt': '\#'}]})
-    dev.log_debug("show system\n{0}".format(out))
+    dev.log_debug("show system\n{0}", out)
 
     #
     # Unit        Type
@@ -67,3 +68,21 @@ def core_ats(dev):
         dev.log_warn("cannot capture serial number")
 
     return ret
+
+
+def probe(dev):
+    # boot time, it changes only with a reboot
+    ret = {}
+    # the uptime is read from the device, not from the proxy cache
+    out = dev.cmd({'cmds': [{'cmd': 'show system', 'prompt': '\#'}]}, use_cache=False)
+
+    #
+    # Unit     Up time
+    # ---- ---------------
+    #  1     00,04:56:34
+    m = re.search("\nUnit\s+Up\stime\s*\n[^\n]+\n\s+\d\s+(\d+),(\d+):(\d+):(\d+)\s*\n", out)
+    if m:
+        days, hours, minutes, seconds = [int(g) for g in m.groups()]
+        ret['boot_time'] = int(time()) - (((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+
+    return ret
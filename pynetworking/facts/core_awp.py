@@ -1,4 +1,5 @@
 import re
+from time import time
 
 
 def core_awp(dev):
@@ -59,3 +60,26 @@ def core_awp(dev):
                 ret['licensed'] = False
 
     return ret
+
+
+def probe(dev):
+    # boot time and running software, they change only with a reboot
+    ret = {}
+    cmds = {'cmds': [{'cmd': 'terminal length 0', 'prompt': '\>'},
+                     {'cmd': 'show system', 'prompt': '\>'},
+                     ]}
+    # the uptime is read from the device, not from the proxy cache
+    out = dev.cmd(cmds, use_cache=False)
+
+    # Uptime             : 0 days 00:07:29
+    m = re.search('Uptime\s+:\s+(\d+)\s+days\s+(\d+):(\d+):(\d+)', out)
+    if m:
+        days, hours, minutes, seconds = [int(g) for g in m.groups()]
+        ret['boot_time'] = int(time()) - (((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+
+    # Current software   : x600-5.4.2-3.14.rel
+    m = re.search('Current\s+software\s+:\s+([^\r\n\s]+)', out)
+    if m:
+        ret['software'] = m.group(1)
+
+    return ret
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from pynetworking.Feature import Feature
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -45,7 +46,7 @@ class ats_clock(Feature):
             set_cmd = "clock set {0}:{1}:{2} {3} {4} {5}".format(hh, mm, ss, day, month, year)
             cmds = {'cmds': [{'cmd': set_cmd, 'prompt': '\#'}]}
 
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['clock'])
 
         if (timezone is not None):
             # set the timezone
@@ -121,7 +122,7 @@ class ats_clock(Feature):
                 cmds['cmds'].append({'cmd': st_cmd, 'prompt': '\(config\)\#'})
 
             cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['clock'])
 
         self._update_clock()
 
@@ -239,7 +240,7 @@ class ats_clock(Feature):
                        'summertime_end': summertime_end,
                        'summertime_offset': summertime_offset
                        }
-        self._device.log_debug("File {0}".format(pformat(json.dumps(self._clock))))
+        self._device.log_debug("File {0}", LazyArg(lambda: pformat(json.dumps(self._clock))))
 
     def _get_begin_dst(self, tz, dt):
         tt = tz._utc_transition_times
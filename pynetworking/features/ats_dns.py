@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -45,7 +46,7 @@ class ats_dns(Feature):
             cmds['cmds'].append({'cmd': set_cmd, 'prompt': '\(config\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['dns'])
         self._update_dns()
 
     def read(self, hostname, wait_time=20000):
@@ -57,9 +58,9 @@ class ats_dns(Feature):
         regex = '(\r|'')Pinging\s{0}\.\s\((?P<ip>(\d+\.+\d+\.+\d+\.+\d+))\)'.format(hostname)
         ifre = re.compile(regex)
         cmds = {'cmds': [{'cmd': ping_cmd, 'prompt': '\#', 'timeout': wait_time}]}
-        output = self._device.cmd(cmds, cache=False, flush_cache=True)
+        output = self._device.cmd(cmds, cache=False, flush_cache=['dns'])
         for line in output.split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre.match(line)
             if m:
                 ret = m.group('ip')
@@ -92,7 +93,7 @@ class ats_dns(Feature):
             cmds['cmds'].append({'cmd': set_cmd, 'prompt': '\(config\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['dns'])
         self._update_dns()
 
     def items(self):
@@ -109,6 +110,7 @@ class ats_dns(Feature):
             raise KeyError('entry {0} does not exist'.format(address))
         return self._dns[address]
 
+    @snapshot
     def _update_dns(self):
         self._device.log_info("_update_dns")
         self._dns = {}
@@ -120,7 +122,7 @@ class ats_dns(Feature):
         ifreDomain = re.compile('ip\s+domain-name\s+(?P<dom>\w+)')
         ifreList = re.compile('ip\s+name-server\s(?P<servers>(\s\d+\.+\d+\.+\d+\.+\d+){1,8})')
         for line in self._device.cmd("show running-config").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifreDomain.match(line)
             if m:
                 def_dom = m.group('dom')
@@ -135,4 +137,4 @@ class ats_dns(Feature):
 
         self._dns = {'name_servers': nam_srv, 'default_domain': def_dom}
 
-        self._device.log_debug("dns {0}".format(pformat(json.dumps(self._dns))))
+        self._device.log_debug("dns {0}", LazyArg(lambda: pformat(json.dumps(self._dns))))
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.digest import file_sha256, text_sha256
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -7,7 +9,8 @@ import os
 import getpass
 import socket
 import tftpy
-from tempfile import mkstemp
+from tempfile import TemporaryFile
+from uuid import uuid4
 
 
 try:
@@ -20,16 +23,21 @@ class ats_file(Feature):
     """
     File feature implementation for ATS
     """
+    # files up to this size are read back from the device to be compared by sync
+    compare_size = 1048576
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._file = {}
         self._tftp_port = 69
+        # name -> (size, mdate, mtime, sha256) of the files copied by sync
+        self._digests = {}
         self._device.log_debug("loading feature")
 
     def load_config(self, config):
         self._device.log_info("loading config")
 
-    def create(self, name, protocol='http', text='', filename='', server='', port=69):
+    def create(self, name, protocol='http', text='', filename='', server='', port=69, tftp_service=None, options=None):
         self._device.log_debug("User: {0}".format(getpass.getuser()))
         self._device.log_debug("Local IP address: {0}".format(socket.gethostbyname(socket.getfqdn())))
         self._device.log_debug("TFTP server: {0} (local IP address if missing)".format(server))
@@ -56,21 +64,17 @@ class ats_file(Feature):
                 myfile.write(text)
             myfile.close()
 
-        # upload on TFTP server
-        if (server == ''):
-            server = socket.gethostbyname(socket.getfqdn())
-        tftp_client = tftpy.TftpClient(server, port)
-        tftp_client.upload(filename.split('/')[-1], filename)
-        self._tftp_port = port
+        server, remote_name = self._upload(filename, server, port, tftp_service, options)
 
         # device commands (timeout of 60 seconds for each MB)
         timeout = (os.path.getsize(filename) / 1048576 + 1) * 60000
-        create_cmd = 'copy {0}://{1}/{2} {3}'.format(protocol, server, filename.split('/')[-1], name)
+        create_cmd = 'copy {0}://{1}/{2} {3}'.format(protocol, server, remote_name, name)
         cmds = {'cmds': [{'cmd': create_cmd, 'prompt': '\#', 'timeout': timeout}]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
         self._update_file()
 
-    def update(self, name, protocol='http', filename='', text='', new_name='', server='', port=69):
+    def update(self, name, protocol='http', filename='', text='', new_name='', server='', port=69, tftp_service=None,
+               options=None):
         self._device.log_info("copying {0} from host to device".format(name))
         self._update_file()
 
@@ -97,33 +101,97 @@ class ats_file(Feature):
             myfile.write(text)
             myfile.close()
 
-        # upload on TFTP server
-        if (server == ''):
-            server = socket.gethostbyname(socket.getfqdn())
-        tftp_client = tftpy.TftpClient(server, port)
-        tftp_client.upload(file_2_copy_from, file_2_copy_from)
-        self._tftp_port = port
+        server, remote_name = self._upload(file_2_copy_from, server, port, tftp_service, options)
 
         # device commands (timeout of 30 seconds for each MB)
         timeout = (os.path.getsize(file_2_copy_from) / 1048576 + 1) * 30000
         if (new_name == ''):
-            update_cmd = 'copy {0}://{1}/{2} {3}'.format(protocol, server, file_2_copy_from, name)
+            update_cmd = 'copy {0}://{1}/{2} {3}'.format(protocol, server, remote_name, name)
             cmds = {'cmds': [{'cmd': update_cmd, 'prompt': ''},
                              {'cmd': 'y', 'prompt': '\#', 'timeout': timeout}
                              ]}
         else:
-            update_cmd = 'copy tftp://{0}/{1} {2}'.format(server, file_2_copy_from, new_name)
+            update_cmd = 'copy tftp://{0}/{1} {2}'.format(server, remote_name, new_name)
             delete_cmd = 'delete {0}'.format(name)
             cmds = {'cmds': [{'cmd': update_cmd, 'prompt': '\#', 'timeout': timeout},
                              {'cmd': delete_cmd, 'prompt': ''},
                              {'cmd': 'y', 'prompt': '\#', 'timeout': timeout}
                              ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
         self._update_file()
 
         if (text != ''):
             os.remove(file_2_copy_from)
 
+    def sync(self, name, text='', filename='', server='', port=69, tftp_service=None, options=None):
+        """
+        Create or update the file unless the device already has the same content, return True when it is copied
+        """
+        self._device.log_info("sync file {0}".format(name))
+        if (filename != '' and text != ''):
+            raise KeyError('cannot have both host file name and host string not empty')
+
+        if (filename != ''):
+            size = os.path.getsize(filename)
+            digest = file_sha256(filename)
+        else:
+            # TFTP doesn't allow empty file creation
+            if (text == ''):
+                text = '\n'
+            size = len(text)
+            digest = text_sha256(text)
+
+        self._update_file()
+        if name in self._file:
+            self._tftp_port = port
+            if self._is_identical(name, size, digest, tftp_service, options):
+                self._device.log_info("file {0} is unchanged".format(name))
+                return False
+            self.update(name, protocol='tftp', filename=filename, text=text, server=server, port=port,
+                        tftp_service=tftp_service, options=options)
+        else:
+            self.create(name, protocol='tftp', filename=filename, text=text, server=server, port=port,
+                        tftp_service=tftp_service, options=options)
+
+        if name not in self._file or int(self._file[name]['size']) != size:
+            raise KeyError('file {0} has not been copied entirely'.format(name))
+        entry = self._file[name]
+        self._digests[name] = (entry['size'], entry['mdate'], entry['mtime'], digest)
+        return True
+
+    def read(self, name, tftp_service=None, options=None):
+        """
+        File object with the content of the file, read in chunks instead of being held in memory
+        """
+        self._update_file()
+        if name not in self._file:
+            raise KeyError('file {0} does not exist'.format(name))
+        self._device.log_info("Read file {0} content".format(name))
+
+        if tftp_service is not None:
+            # the device copies the file straight to the service, under a name not used by the other devices
+            remote_name = '{0}-{1}'.format(name, uuid4().hex[0:12])
+            read_cmd = 'copy {0} {1}'.format(name, tftp_service.url(remote_name))
+            cmds = {'cmds': [{'cmd': read_cmd, 'prompt': '\#'}]}
+            self._device.cmd(cmds, cache=False, flush_cache=['file'])
+            try:
+                content = tftp_service.open(remote_name)
+            except KeyError:
+                raise KeyError('file {0} has not been copied to the TFTP service'.format(name))
+            # the open file stays readable
+            os.remove(tftp_service.path(remote_name))
+            return content
+
+        read_cmd = 'copy {0} tftp://{1}/{0}'.format(name, socket.gethostbyname(socket.getfqdn()))
+        cmds = {'cmds': [{'cmd': read_cmd, 'prompt': '\#'}]}
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
+
+        content = TemporaryFile()
+        client = tftpy.TftpClient(socket.gethostbyname(socket.getfqdn()), self._tftp_port, options or {})
+        client.download(name, content)
+        content.seek(0)
+        return content
+
     def delete(self, file_name):
         self._device.log_info("remove {0}".format(file_name))
         self._update_file()
@@ -136,7 +204,7 @@ class ats_file(Feature):
                          {'cmd': 'y', 'prompt': '\#', 'timeout': 10000}
                          ]}
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
         self._update_file()
 
     def items(self):
@@ -154,23 +222,41 @@ class ats_file(Feature):
             return self._file[filename]
         raise KeyError('file {0} does not exist'.format(filename))
 
-    def _update_file_content(self, filename):
-        self._device.log_info("Read file {0} content".format(filename))
-        read_cmd = 'copy {0} tftp://{1}/{0}'.format(filename, socket.gethostbyname(socket.getfqdn()))
-        cmds = {'cmds': [{'cmd': read_cmd, 'prompt': '\#'}]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+    def _is_identical(self, name, size, digest, tftp_service=None, options=None):
+        entry = self._file[name]
+        if int(entry['size']) != size:
+            return False
+        if self._digests.get(name) == (entry['size'], entry['mdate'], entry['mtime'], digest):
+            return True
+        if size > self.compare_size:
+            return False
+        identical = text_sha256(self._update_file_content(name, tftp_service, options)) == digest
+        if identical:
+            self._digests[name] = (entry['size'], entry['mdate'], entry['mtime'], digest)
+        return identical
 
-        temp, temp_file_name = mkstemp()
-        client = tftpy.TftpClient(socket.gethostbyname(socket.getfqdn()), self._tftp_port)
-        client.download(filename, temp_file_name)
+    def _update_file_content(self, filename, tftp_service=None, options=None):
+        content = self.read(filename, tftp_service=tftp_service, options=options)
+        try:
+            return content.read()
+        finally:
+            content.close()
 
-        read_output = ''
-        myfile = open(temp_file_name, 'r')
-        read_output = myfile.read()
-        myfile.close()
-        os.remove(temp_file_name)
-        return read_output
+    def _upload(self, filename, server, port, tftp_service, options):
+        # name of the file on the TFTP server
+        self._tftp_port = port
+        if tftp_service is not None:
+            if (server != ''):
+                raise KeyError('cannot have both TFTP server and TFTP service')
+            name = tftp_service.publish(filename)
+            return tftp_service.server, name
+        if (server == ''):
+            server = socket.gethostbyname(socket.getfqdn())
+        tftp_client = tftpy.TftpClient(server, port, options or {})
+        tftp_client.upload(filename.split('/')[-1], filename)
+        return server, filename.split('/')[-1]
 
+    @snapshot
     def _update_file(self):
         self._device.log_info("_update_file")
         self._file = OrderedDict()
@@ -192,4 +278,4 @@ class ats_file(Feature):
                                    'mdate': m.group('date'),
                                    'mtime': m.group('time')
                                    }
-        self._device.log_debug("File {0}".format(pformat(json.dumps(self._file))))
+        self._device.log_debug("File {0}", LazyArg(lambda: pformat(json.dumps(self._file))))
@@ -2,7 +2,8 @@
 import re
 import json
 from pprint import pformat
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 try:
     from collections import OrderedDict
 except ImportError:  # pragma: no cover
@@ -13,6 +14,8 @@ class ats_interface(Feature):
     """
     Interface feature implementation for ATS
     """
+    config_only = False
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._interface_config = {}
@@ -20,7 +23,7 @@ class ats_interface(Feature):
 
     def load_config(self, config):
         self._device.log_info("load_config")
-        self._device.log_debug("Loading config for ats_interface {0}".format(config))
+        self._device.log_debug("Loading config for ats_interface {0}", config)
         self._interface_config = OrderedDict()
         # 1/e1     100M-Copper  Full    100    Enabled  Off      Up      Disabled Auto
         ifre = re.compile('(?P<stack_no>\d)/(?P<ifp>[eg])(?P<ifn>\d+)\s+'
@@ -69,7 +72,7 @@ class ats_interface(Feature):
                 ifn = '{0}.0.{1}'.format(m.group('stack_no'), ifn)
                 if ifn in self._interface_config:
                     self._interface_config[ifn]['description'] = m.group('description')
-        self._device.log_debug("Configuration {0}".format(pformat(json.dumps(self._interface_config))))
+        self._device.log_debug("Configuration {0}", LazyArg(lambda: pformat(json.dumps(self._interface_config))))
 
     def update(self, ifn, **kwargs):
         self._device.log_info("update {0} {1}".format(ifn, pformat(kwargs)))
@@ -93,8 +96,8 @@ class ats_interface(Feature):
 
         if run_cmd:
             cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-            self._device.cmd(cmds, cache=False, flush_cache=True)
-            self._device.load_system()
+            self._device.cmd(cmds, cache=False, flush_cache=['interface'])
+            self._device.load_system(['interface'])
 
     def items(self):
         self._update_interface()
@@ -124,6 +127,7 @@ class ats_interface(Feature):
         for interface in self._interface:
             yield interface
 
+    @snapshot
     def _update_interface(self):
         self._device.log_info("_update_interface")
         self._interface = OrderedDict()
@@ -165,7 +169,7 @@ class ats_interface(Feature):
                     self._interface[ifn] = {'link': False}
                 self._interface[ifn] = dict(self._interface[ifn].items() + self._interface_config[ifn].items())
 
-        self._device.log_debug("Status {0}".format(pformat(json.dumps(self._interface))))
+        self._device.log_debug("Status {0}", LazyArg(lambda: pformat(json.dumps(self._interface))))
 
     def _to_ifn_native(self, ifn):
         self._device.log_info("_to_ifn_native " + ifn)
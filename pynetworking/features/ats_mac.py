@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.mac_table import MacTable, parse_mac, int_to_mac
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -9,10 +11,18 @@ except ImportError:  # pragma: no cover
     from ordereddict import OrderedDict
 
 
+MAC_RE = re.compile('^[ \t]+(?P<vlan>\d+)[ \t]+'
+                    '(?P<mac>[^\s]+)[ \t]+'
+                    '(?P<interface>[^\s]+)[ \t]+'
+                    '(?P<type>[^\s]+)', re.M)
+
+
 class ats_mac(Feature):
     """
     mac feature implementation for ATS
     """
+    config_sections = ('interface vlan',)
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._mac = {}
@@ -30,7 +40,7 @@ class ats_mac(Feature):
                            'ethernet\s+(?P<interface>[^\s]+)')
 
         for line in config.split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre1.match(line)
             if m:
                 vlan = m.group('vlan')
@@ -49,7 +59,7 @@ class ats_mac(Feature):
         self._update_mac()
 
         mac = self._get_dotted_mac(mac)
-        if mac in self._mac.keys():
+        if mac in self._mac:
             raise KeyError('MAC address {0} is already existing'.format(mac))
         if forward is False:
             raise KeyError('Discard option not supported')
@@ -61,7 +71,7 @@ class ats_mac(Feature):
                          {'cmd': set_cmd, 'prompt': '\(config-if\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'},
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
         self._update_mac()
 
     def update(self, mac, interface, forward=True, vlan=1):
@@ -69,7 +79,7 @@ class ats_mac(Feature):
         self._update_mac()
 
         mac = self._get_dotted_mac(mac)
-        if mac not in self._mac.keys():
+        if mac not in self._mac:
             raise KeyError('MAC address {0} does not exist'.format(mac))
         if forward is False:
             raise KeyError('Discard option not supported')
@@ -81,7 +91,7 @@ class ats_mac(Feature):
                          {'cmd': set_cmd, 'prompt': '\(config-if\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'},
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
         self._update_mac()
 
     def delete(self, mac=''):
@@ -93,25 +103,22 @@ class ats_mac(Feature):
             self._device.log_info("remove all the dynamic entries")
             del_cmd = 'clear bridge'
             cmds = {'cmds': [{'cmd': del_cmd, 'prompt': '\#'}]}
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['mac'])
 
             # The static entries have to be removed one by one, given that there is no global command.
             self._device.log_info("remove all the static entries")
             cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'}]}
-            keys = self._mac.keys()
-            for key in keys:
-                mac_item = self._mac[key]
-                if mac_item['type'] == 'static':
-                    vlan_cmd = 'interface vlan {0}'.format(mac_item['vlan'])
-                    del_cmd = 'no bridge address {0}'.format(key)
-                    cmds['cmds'].append({'cmd': vlan_cmd, 'prompt': '\(config-if\)\#'})
-                    cmds['cmds'].append({'cmd': del_cmd, 'prompt': '\(config-if\)\#'})
+            for key, mac_item in self._mac.filter(type='static').items():
+                vlan_cmd = 'interface vlan {0}'.format(mac_item['vlan'])
+                del_cmd = 'no bridge address {0}'.format(key)
+                cmds['cmds'].append({'cmd': vlan_cmd, 'prompt': '\(config-if\)\#'})
+                cmds['cmds'].append({'cmd': del_cmd, 'prompt': '\(config-if\)\#'})
             cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['mac'])
         else:
             self._device.log_info("remove {0}".format(mac))
             mac = self._get_dotted_mac(mac)
-            if mac not in self._mac.keys():
+            if mac not in self._mac:
                 raise KeyError('MAC address {0} does not exist'.format(mac))
             if self._mac[mac]['type'] == 'dynamic':
                 raise KeyError('cannot remove a dynamic entry')
@@ -123,10 +130,68 @@ class ats_mac(Feature):
                              {'cmd': del_cmd, 'prompt': '\(config-if\)\#'},
                              {'cmd': chr(26), 'prompt': '\#'},
                              ]}
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+
+        self._update_mac()
+
+    def create_many(self, entries, sleep_time=5):
+        """
+        Create the static entries listed in entries, given as (mac, interface[, forward[, vlan]]) tuples or as
+        dictionaries of the create arguments, in a single configuration session
+        """
+        self._device.log_info("create {0} MAC address entries".format(len(entries)))
+        self._update_mac()
+
+        entries = self._get_entries(entries)
+        for mac in entries:
+            if mac in self._mac:
+                raise KeyError('MAC address {0} is already existing'.format(mac))
+
+        cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'}]}
+        for vlan, vlan_entries in self._group_by_vlan(entries.items(), lambda e: e[1][1]):
+            cmds['cmds'].append({'cmd': 'interface vlan {0}'.format(vlan), 'prompt': '\(config-if\)\#'})
+            for mac, (interface, vlan) in vlan_entries:
+                set_cmd = 'bridge address {0} ethernet {1} permanent'.format(mac, interface)
+                cmds['cmds'].append({'cmd': set_cmd, 'prompt': '\(config-if\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
 
+        def created():
+            table = self._read_mac(use_cache=False)
+            return all([self._is_static(table, mac) for mac in entries])
+        return self._wait_for(created, sleep_time)
+
+    def delete_many(self, macs, sleep_time=5):
+        """
+        Remove the static entries of the listed mac addresses in a single configuration session
+        """
+        self._device.log_info("remove {0} MAC address entries".format(len(macs)))
         self._update_mac()
 
+        entries = OrderedDict()
+        for mac in macs:
+            mac = self._get_dotted_mac(mac)
+            if mac not in self._mac:
+                raise KeyError('MAC address {0} does not exist'.format(mac))
+            if self._mac[mac]['type'] == 'dynamic':
+                raise KeyError('cannot remove a dynamic entry')
+            if mac in entries:
+                raise KeyError('MAC address {0} is listed more than once'.format(mac))
+            entries[mac] = self._mac[mac]['vlan']
+
+        cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'}]}
+        for vlan, vlan_entries in self._group_by_vlan(entries.items(), lambda e: e[1]):
+            cmds['cmds'].append({'cmd': 'interface vlan {0}'.format(vlan), 'prompt': '\(config-if\)\#'})
+            for mac, vlan in vlan_entries:
+                cmds['cmds'].append({'cmd': 'no bridge address {0}'.format(mac), 'prompt': '\(config-if\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+
+        def deleted():
+            table = self._read_mac(use_cache=False)
+            return not any([self._is_static(table, mac) for mac in entries])
+        return self._wait_for(deleted, sleep_time)
+
     def items(self):
         self._update_mac()
         return self._mac.items()
@@ -138,7 +203,7 @@ class ats_mac(Feature):
     def __getitem__(self, mac):
         self._update_mac()
         dotted_mac = self._get_dotted_mac(mac)
-        if dotted_mac not in self._mac.keys():
+        if dotted_mac not in self._mac:
             raise KeyError('MAC address {0} does not exist'.format(mac))
         return self._mac[dotted_mac]
 
@@ -154,34 +219,74 @@ class ats_mac(Feature):
             raise KeyError('MAC address {0} is not valid'.format(mac))
         return mac
 
-    def _update_mac(self):
-        self._device.log_info("_update_mac")
-        self._mac = OrderedDict()
+    def _get_entries(self, entries):
+        # mac -> (interface, vlan) of the entries given to create_many
+        def entry(mac, interface, forward=True, vlan=1):
+            if forward is False:
+                raise KeyError('Discard option not supported')
+            return self._get_dotted_mac(mac), (interface, str(vlan))
+
+        ret = OrderedDict()
+        for e in entries:
+            mac, values = entry(**e) if isinstance(e, dict) else entry(*e)
+            if mac in ret:
+                raise KeyError('MAC address {0} is listed more than once'.format(mac))
+            ret[mac] = values
+        return ret
+
+    def _group_by_vlan(self, entries, vlan):
+        # entries of the same vlan are added under a single interface vlan command
+        groups = OrderedDict()
+        for e in entries:
+            groups.setdefault(vlan(e), []).append(e)
+        return groups.items()
+
+    def iter_entries(self):
+        """
+        Yield the entries of the mac address table one at a time without building the whole table.
+        The output of the command is still read whole from the device before being parsed.
+        """
+        self._device.log_info("iter_entries")
+        for mac, vlan, interface, action, type in self._parse_mac(self._device.cmd("show bridge address-table")):
+            yield int_to_mac(mac), {'vlan': vlan, 'interface': interface, 'action': action, 'type': type}
 
+    def table(self, use_cache=True):
+        if use_cache:
+            self._update_mac()
+        else:
+            self._read_mac(use_cache=False)
+        return self._mac
+
+    def _parse_mac(self, output):
         #   1       00:00:cd:24:04:8b    1/e1   dynamic
-        ifre = re.compile('\s+(?P<vlan>\d+)\s+'
-                          '(?P<mac>[^\s]+)\s+'
-                          '(?P<interface>[^\s]+)\s+'
-                          '(?P<type>[^\s]+)')
-        for line in self._device.cmd("show bridge address-table").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
-            m = ifre.match(line)
-            if m:
-                key = self._get_dotted_mac(m.group('mac'))
-                self._mac[key] = {'vlan': m.group('vlan'),
-                                  'interface': m.group('interface'),
-                                  'action': 'forward',
-                                  'type': m.group('type')
-                                  }
-        self._device.log_debug("mac {0}".format(pformat(json.dumps(self._mac))))
+        for m in MAC_RE.finditer(output):
+            mac = self._parse_entry_mac(m)
+            if mac is not None:
+                yield mac, m.group('vlan'), m.group('interface'), 'forward', m.group('type')
+
+    def _parse_entry_mac(self, m):
+        try:
+            return parse_mac(m.group('mac'))
+        except ValueError:
+            # the table stores the macs as integers, the entry cannot be kept
+            self._device.log_warn("skipping mac address table entry '{0}'", m.group(0).strip())
+            return None
+
+    @snapshot
+    def _update_mac(self):
+        self._read_mac()
+
+    def _read_mac(self, use_cache=True):
+        self._device.log_info("_update_mac")
+        self._mac = MacTable(self._parse_mac(self._device.cmd("show bridge address-table", use_cache=use_cache)))
+        self._device.log_debug("mac {0}", LazyArg(lambda: pformat(json.dumps(self._mac.items()))))
+        return self._mac
 
     def _check_static_entry_presence(self):
         self._device.log_info("_check_static_entry_presence")
         self._update_mac()
 
-        keys = self._mac.keys()
-        for key in keys:
-            if self._mac[key]['type'] == 'static':
-                return True
+        return len(self._mac.filter(type='static')) > 0
 
-        return False
+    def _is_static(self, table, mac):
+        return mac in table and table[mac]['type'] == 'static'
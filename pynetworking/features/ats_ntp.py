@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -13,6 +14,8 @@ class ats_ntp(Feature):
     """
     ntp feature implementation for ATS (note that ATS uses SNTP protocol)
     """
+    config_sections = ('sntp',)
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._sntp = {}
@@ -28,7 +31,7 @@ class ats_ntp(Feature):
         ifre = re.compile('sntp\s+server\s+(?P<address>[^\n]+)')
 
         for line in config.split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre.match(line)
             if m:
                 key = m.group('address')
@@ -55,7 +58,7 @@ class ats_ntp(Feature):
                          {'cmd': enable_cmd, 'prompt': '\(config\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'}
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['ntp'])
         self._update_sntp()
 
     def update(self, address, poll=60):
@@ -70,7 +73,7 @@ class ats_ntp(Feature):
                          {'cmd': poll_cmd, 'prompt': '\(config\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'}
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['ntp'])
         self._update_sntp()
 
     def delete(self, address=''):
@@ -92,7 +95,7 @@ class ats_ntp(Feature):
             cmds['cmds'].append({'cmd': del_cmd, 'prompt': '\(config\)\#'})
 
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['ntp'])
         self._update_sntp()
 
         if self._sntp.keys() == []:
@@ -100,7 +103,7 @@ class ats_ntp(Feature):
                              {'cmd': 'no c so', 'prompt': '\(config\)\#'},
                              {'cmd': chr(26), 'prompt': '\#'}
                              ]}
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['ntp'])
 
     def items(self):
         self._update_sntp()
@@ -116,6 +119,7 @@ class ats_ntp(Feature):
             raise KeyError('SNTP server {0} is not present'.format(address))
         return self._sntp[address]
 
+    @snapshot
     def _update_sntp(self):
         self._device.log_info("_update_sntp")
         self._sntp = OrderedDict()
@@ -138,7 +142,7 @@ class ats_ntp(Feature):
         polltime = 60
         ifre1 = re.compile('(\r|'')Polling\s+interval:\s+(?P<polltime>\d+)\s+seconds.')
         for line in self._device.cmd("show sntp config").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre1.match(line)
             if m:
                 polltime = m.group('polltime')
@@ -159,7 +163,7 @@ class ats_ntp(Feature):
         # ........
         ifre2 = re.compile('(\s+|'')(?P<address>[^\s]+)\s+(?P<status>[^\s]+)\s+')
         for line in self._device.cmd("show sntp status").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre2.match(line)
             if m and '.' in m.group('address'):
                 key = m.group('address')
@@ -167,4 +171,4 @@ class ats_ntp(Feature):
                                    'status': m.group('status')
                                    }
 
-        self._device.log_debug("ntp {0}".format(pformat(json.dumps(self._sntp))))
+        self._device.log_debug("ntp {0}", LazyArg(lambda: pformat(json.dumps(self._sntp))))
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
 from pynetworking.features.ats_vlan_config_lexer import VlanConfigLexer
 from pynetworking.features.ats_vlan_config_interface_lexer import VlanInterfaceConfigLexer
+from pynetworking.utils.vlan_batch import VlanBatch
+from pynetworking.utils.vlan_set import VlanSet
+from pynetworking.utils.lazy import LazyArg
+from contextlib import contextmanager
 from pprint import pformat
 import re
 import json
@@ -11,27 +15,43 @@ class ats_vlan(Feature):
     """
     Vlan feature implementation for ATS
     """
+    config_sections = ('vlan database', 'interface')
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._vlan_config = {}
         self._vlan = {}
+        self._trunk_allowed = {}
+        self._batch = None
         self._device.log_debug("loading feature")
 
     def load_config(self, config):
         self._device.log_info("loading config")
         l = VlanConfigLexer()
         self._vlan_config = l.run(config)
-        self._device.log_debug("vlan configuration {0}".format(self._vlan_config))
+        self._device.log_debug("vlan configuration {0}", self._vlan_config)
         l = VlanInterfaceConfigLexer()
         self._interface_config = {}
         for ifr, ifc in l.run(config).items():
             for ifn in self._expand_interface_list(ifr):
                 self._interface_config[ifn] = ifc
+        self._trunk_allowed = {}
+        for ifn, ifc in self._interface_config.items():
+            if 'switchport trunk allowed' in ifc:
+                self._trunk_allowed[ifn] = VlanSet(ifc['switchport trunk allowed'])
         self._device.log_info("vlan interface configuration {0}".format(self._interface_config))
 
     def create(self, vlan_id, **kwargs):
         self._device.log_info("create {0} {1}".format(vlan_id, pformat(kwargs)))
         self._update_vlan()
+        vlan_ids = VlanSet(vlan_id)
+
+        if self._batch is not None:
+            if len(vlan_ids) != 1:
+                kwargs.pop('name', None)
+            self._batch.create([i for i in vlan_ids if kwargs or str(i) not in self._vlan or i in self._batch.deleted], **kwargs)
+            return
+
         cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'},
                          {'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'},
                          ]}
@@ -39,118 +59,165 @@ class ats_vlan(Feature):
 
         cmds['cmds'].append({'cmd': vlan_cmd, 'prompt': '\(config-vlan\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
 
-        if len(self._get_vlan_ids(vlan_id)) == 1:
+        if len(vlan_ids) == 1:
             if 'name' in kwargs:
                 self.update(vlan_id, **kwargs)
 
     def delete(self, vlan_id):
         self._device.log_info("delete {0}".format(vlan_id))
         self._update_vlan()
-        self._get_vlan_ids(vlan_id)
+        vlan_ids = VlanSet(vlan_id)
+
+        if self._batch is not None:
+            self._batch.delete(vlan_ids, VlanSet(self._vlan.keys()))
+            return
+
         cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'},
                          {'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'},
                          {'cmd': 'no vlan {0}'.format(vlan_id), 'prompt': '\(config-vlan\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'},
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
 
     def update(self, vlan_id, **kwargs):
         self._device.log_info("update {0} {1}".format(vlan_id, pformat(kwargs)))
         self._update_vlan()
-        vlan_ids = self._get_vlan_ids(vlan_id)
-        existing_vlan_ids = []
-        for i in self._vlan_config.keys():
-            existing_vlan_ids += self._get_vlan_ids(i)
-
-        non_existing_ids = [i for i in vlan_ids if i not in existing_vlan_ids]
+        vlan_ids = VlanSet(vlan_id)
+        non_existing_ids = [i for i in vlan_ids - VlanSet(self._vlan_config.keys()) if not (self._batch is not None and self._batch.exists(i))]
 
         if len(non_existing_ids) == 0:
             if 'name' in kwargs:
+                if self._batch is not None:
+                    self._batch.create(vlan_ids, name=kwargs['name'])
+                    return
                 cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'},
                                  {'cmd': 'interface vlan {0}'.format(vlan_id), 'prompt': '\(config-if\)\#'},
                                  ]}
-                if ' ' in kwargs['name']:
-                    vlan_cmd = 'name "{0}"'.format(kwargs['name'])
-                else:
-                    vlan_cmd = "name {0}".format(kwargs['name'])
-                cmds['cmds'].append({'cmd': vlan_cmd, 'prompt': '\(config-if\)\#'})
+                cmds['cmds'].append({'cmd': self._get_name_cmd(kwargs['name']), 'prompt': '\(config-if\)\#'})
                 cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-                self._device.cmd(cmds, cache=False, flush_cache=True)
-                self._device.load_system()
+                self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+                self._device.load_system(['vlan'])
         else:
             raise KeyError('{0} vlans do not exist'.format(non_existing_ids))
 
+    @contextmanager
+    def batch(self):
+        """
+        Accumulate the changes made inside the block and send them in a single configuration session
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = VlanBatch()
+        try:
+            # the state of the vlans is read once for the whole block
+            with self._device.snapshot():
+                self._update_vlan()
+                yield self._batch
+            batch = self._batch
+        finally:
+            self._batch = None
+        if len(batch) == 0:
+            return
+
+        self._device.log_info("batch {0} vlans created, {1} vlans deleted, {2} interfaces changed".format(
+                              len(batch.created), len(batch.deleted), len(batch.interfaces)))
+        cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'}]}
+        new_vlan_ids = [vid for vid in batch.created if str(vid) not in self._vlan]
+        if new_vlan_ids:
+            cmds['cmds'].append({'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'})
+            cmds['cmds'].append({'cmd': 'vlan {0}'.format(VlanSet(new_vlan_ids)), 'prompt': '\(config-vlan\)\#'})
+            cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        for vid, opts in batch.created.items():
+            if 'name' in opts:
+                cmds['cmds'].append({'cmd': 'interface vlan {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+                cmds['cmds'].append({'cmd': self._get_name_cmd(opts['name']), 'prompt': '\(config-if\)\#'})
+                cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        for ifn in batch.interfaces:
+            cmds['cmds'].append({'cmd': 'interface ethernet {0}'.format(self._device.interface._to_ifn_native(ifn)), 'prompt': '\(config-if\)\#'})
+            for c in batch.interface_cmds(ifn):
+                cmds['cmds'].append({'cmd': c, 'prompt': '\(config-if\)\#'})
+            cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        if batch.deleted:
+            cmds['cmds'].append({'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'})
+            cmds['cmds'].append({'cmd': 'no vlan {0}'.format(VlanSet(batch.deleted)), 'prompt': '\(config-vlan\)\#'})
+            cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
+
     def add_interface(self, vid, ifn, tagged=False):
         self._device.log_info("add_interface {0} ifn={1} tagged={2}".format(vid, ifn, tagged))
         self._update_vlan()
         vid = str(vid)
-        if vid not in self._vlan:
+        if vid not in self._vlan and not (self._batch is not None and self._batch.exists(vid)):
             raise ValueError('{0} is not a valid vlan id'.format(vid))
 
         if ifn in self._interface_config:
             mode = self._interface_config[ifn].get('switchport mode', 'access')
         else:
             mode = 'access'
-
-        cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'},
-                         {'cmd': 'interface ethernet {0}'.format(self._device.interface._to_ifn_native(ifn)), 'prompt': '\(config-if\)\#'},
-                         ]}
+        if self._batch is not None:
+            mode = self._batch.modes.get(ifn, mode)
 
         if mode == 'access' and tagged is False:
-            cmds['cmds'].append({'cmd': 'switchport access vlan {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('switchport access vlan {0}', vid)]
         elif mode == 'access' and tagged is True:
             # should copy access vlan to native
-            cmds['cmds'].append({'cmd': 'switchport mode trunk', 'prompt': '\(config-if\)\#'})
-            cmds['cmds'].append({'cmd': 'switchport trunk allowed vlan add {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('switchport mode trunk', None), ('switchport trunk allowed vlan add {0}', vid)]
         elif mode == 'trunk' and tagged is False:
-            cmds['cmds'].append({'cmd': 'switchport trunk native vlan {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('switchport trunk native vlan {0}', vid)]
         elif mode == 'trunk' and tagged is True:
-            cmds['cmds'].append({'cmd': 'switchport trunk allowed vlan add {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('switchport trunk allowed vlan add {0}', vid)]
+        else:
+            raise ValueError('interface {0} cannot be added to vlan {1}'.format(ifn, vid))
 
-        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        if self._batch is not None:
+            if tagged is True:
+                self._batch.modes[ifn] = 'trunk'
+            self._batch.add_member(vid, ifn, tagged)
+        self._interface_cmds(ifn, if_cmds)
 
     def delete_interface(self, vid, ifn):
         self._device.log_info("delete_interface {0} ifn={1}".format(vid, ifn))
         self._update_vlan()
         vid = str(vid)
-        if vid not in self._vlan:
+        if vid not in self._vlan and not (self._batch is not None and self._batch.exists(vid)):
             raise ValueError('{0} is not a valid vlan id'.format(vid))
 
-        if 'tagged' in self._vlan[vid] and ifn in self._vlan[vid]['tagged']:
+        vli = self._vlan.get(vid, {})
+        tagged = None
+        if 'tagged' in vli and ifn in vli['tagged']:
             tagged = True
-        elif 'untagged' in self._vlan[vid] and ifn in self._vlan[vid]['untagged']:
+        elif 'untagged' in vli and ifn in vli['untagged']:
             tagged = False
-        else:
+        if self._batch is not None:
+            tagged = self._batch.remove_member(vid, ifn, tagged)
+        if tagged is None:
             raise ValueError('interface {0} does not belong to vlan {1}'.format(ifn, vid))
 
         if ifn in self._interface_config:
             mode = self._interface_config[ifn].get('switchport mode', 'access')
         else:
             mode = 'access'
-
-        cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'},
-                         {'cmd': 'interface ethernet {0}'.format(self._device.interface._to_ifn_native(ifn)), 'prompt': '\(config-if\)\#'},
-                         ]}
+        if self._batch is not None:
+            mode = self._batch.modes.get(ifn, mode)
 
         if mode == 'access' and vid != '1':
             # this actually move port back to vlan 1
-            cmds['cmds'].append({'cmd': 'no switchport access vlan', 'prompt': '\(config-if\)\#'})
+            if_cmds = [('no switchport access vlan', None)]
         elif mode == 'trunk' and tagged is False:
-            cmds['cmds'].append({'cmd': 'no switchport trunk native vlan', 'prompt': '\(config-if\)\#'})
+            if_cmds = [('no switchport trunk native vlan', None)]
         elif mode == 'trunk' and tagged is True:
-            cmds['cmds'].append({'cmd': 'switchport trunk allowed vlan remove {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('switchport trunk allowed vlan remove {0}', vid)]
         else:
             raise ValueError('interface {0} cannot be delete from vlan {1}'.format(ifn, vid))
 
-        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        self._interface_cmds(ifn, if_cmds)
 
     def items(self):
         self._update_vlan()
@@ -182,20 +249,9 @@ class ats_vlan(Feature):
             yield vlan
 
     def _get_vlan_ids(self, vlan_id):
-        vlan_id = str(vlan_id)
-        vlan_ids = []
-        for r in vlan_id.split(','):
-            m = re.search('^(?P<start>\d+)\-(?P<end>\d+)$', r)
-            if m:
-                vlan_ids.extend(range(int(m.group('start')), int(m.group('end')) + 1))
-                continue
-            m = re.match('\s*(?P<id>\d+)\s*', r)
-            if m:
-                vlan_ids.append(int(m.group('id')))
-                continue
-            raise ValueError('{0} is not a valid vlan id, range or list'.format(vlan_id))
-        return vlan_ids
+        return list(VlanSet(vlan_id))
 
+    @snapshot
     def _update_vlan(self):
         self._device.log_info("_update_vlan")
 
@@ -225,17 +281,37 @@ class ats_vlan(Feature):
                         if mode == 'trunk':
                             if 'switchport trunk native' in self._interface_config[ifn] and self._interface_config[ifn]['switchport trunk native'] == vln:
                                 vlan[vln]['untagged'].append(ifn)
-                            elif 'switchport trunk allowed' in self._interface_config[ifn] and vln in self._interface_config[ifn]['switchport trunk allowed']:
+                            elif ifn in self._trunk_allowed and vln in self._trunk_allowed[ifn]:
                                 vlan[vln]['tagged'].append(ifn)
                         elif 'switchport access' in self._interface_config[ifn] and self._interface_config[ifn]['switchport access'] == vln:
                             vlan[vln]['untagged'].append(ifn)
                     else:
                         vlan[vln]['untagged'].append(ifn)
             del vlan[vln]['ports']
-            for vlr, vlc in self._vlan_config.items():
+            if vln in self._vlan_config:
                 vlan[vln] = dict(vlan[vln].items() + self._vlan_config[vln].items())
         self._vlan = vlan
-        self._device.log_debug(pformat(json.dumps(self._vlan)))
+        self._device.log_debug("{0}", LazyArg(lambda: pformat(json.dumps(self._vlan))))
+
+    def _get_name_cmd(self, name):
+        if ' ' in name:
+            return 'name "{0}"'.format(name)
+        return "name {0}".format(name)
+
+    def _interface_cmds(self, ifn, if_cmds):
+        if self._batch is not None:
+            for template, vid in if_cmds:
+                self._batch.add_interface_cmd(ifn, template, vid)
+            return
+
+        cmds = {'cmds': [{'cmd': 'conf', 'prompt': '\(config\)\#'},
+                         {'cmd': 'interface ethernet {0}'.format(self._device.interface._to_ifn_native(ifn)), 'prompt': '\(config-if\)\#'},
+                         ]}
+        for template, vid in if_cmds:
+            cmds['cmds'].append({'cmd': template.format(vid), 'prompt': '\(config-if\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
 
     def _expand_interface_list(self, ifranges):
         ret = []
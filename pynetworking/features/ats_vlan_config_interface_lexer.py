@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import re
-import ply.lex as lex
+from pynetworking.utils.lexer import Lexer
 
 
-class VlanInterfaceConfigLexer(object):
+class VlanInterfaceConfigLexer(Lexer):
     states = (
         ('ifport', 'exclusive'),
         ('ifportrange', 'exclusive'),
@@ -55,7 +55,7 @@ class VlanInterfaceConfigLexer(object):
         return t
 
     def t_ifport_ifportrange_switchport_trunk_allowed(self, t):
-        r'switchport\s+trunk\s+allowed\s+vlan\s+add\s+\d+'
+        r'switchport\s+trunk\s+allowed\s+vlan\s+add\s+\d+(\-\d+)?(,\d+(\-\d+)?)*'
         v = re.split('\s+', t.value)
         t.value = (t.lexer.id, v[5])
         return t
@@ -82,15 +82,12 @@ class VlanInterfaceConfigLexer(object):
         print "Illegal character '%s'" % t.value[0]
         t.lexer.skip(1)
 
-    def __init__(self):
-        self.lexer = lex.lex(object=self, debug=0)
-
     def run(self, data):
-        self.lexer.input(data)
+        self.reset(data)
         result = {}
         for tok in self.lexer:
             t = tok.type.replace('_', ' ')
-            if tok.value[0] in result.keys():
+            if tok.value[0] in result:
                 if t in result[tok.value[0]]:
                     if isinstance(result[tok.value[0]][t], unicode):
                         result[tok.value[0]][t] = [result[tok.value[0]][t], tok.value[1]]
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import re
-import ply.lex as lex
+from pynetworking.utils.lexer import Lexer
 
 
-class VlanConfigLexer(object):
+class VlanConfigLexer(Lexer):
     states = (
         ('vlandb', 'exclusive'),
         ('vlaninterface', 'exclusive'),
@@ -55,12 +55,8 @@ class VlanConfigLexer(object):
     def t_ANY_error(self, t):  # pragma: no cover
         t.lexer.skip(1)
 
-    def __init__(self, debug=0):
-        self._debug = debug
-        self.lexer = lex.lex(object=self, debug=debug)
-
     def run(self, data):
-        self.lexer.input(data)
+        self.reset(data)
         result = {'1': {'name': '1'}}
         for tok in self.lexer:
             if tok.type == 'VLANLIST':
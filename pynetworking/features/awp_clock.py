@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from pynetworking.Feature import Feature
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -47,7 +48,7 @@ class awp_clock(Feature):
                              {'cmd': chr(26), 'prompt': '\#'}
                              ]}
 
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['clock'])
 
         if (timezone is not None):
             # set the timezone
@@ -124,7 +125,7 @@ class awp_clock(Feature):
                              {'cmd': chr(26), 'prompt': '\#'},
                              ]}
 
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['clock'])
 
         self._update_clock()
 
@@ -203,7 +204,7 @@ class awp_clock(Feature):
                                'summertime_end': '',
                                'summertime_offset': ''
                                }
-        self._device.log_debug("File {0}".format(pformat(json.dumps(self._clock))))
+        self._device.log_debug("File {0}", LazyArg(lambda: pformat(json.dumps(self._clock))))
 
     def _get_begin_dst(self, tz, dt):
         tt = tz._utc_transition_times
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -47,7 +48,7 @@ class awp_dns(Feature):
             cmds['cmds'].append({'cmd': set_cmd, 'prompt': '\(config\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['dns'])
         self._update_dns()
 
     def read(self, hostname, wait_time=20000):
@@ -61,9 +62,9 @@ class awp_dns(Feature):
         cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                          {'cmd': ping_cmd, 'prompt': '\#', 'timeout': wait_time}
                          ]}
-        output = self._device.cmd(cmds, cache=False, flush_cache=True)
+        output = self._device.cmd(cmds, cache=False, flush_cache=['dns'])
         for line in output.split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre.match(line)
             if m:
                 ret = m.group('ip')
@@ -98,7 +99,7 @@ class awp_dns(Feature):
             cmds['cmds'].append({'cmd': set_cmd, 'prompt': '\(config\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['dns'])
         self._update_dns()
 
     def items(self):
@@ -115,6 +116,7 @@ class awp_dns(Feature):
             raise KeyError('entry {0} does not exist'.format(id))
         return self._dns[id]
 
+    @snapshot
     def _update_dns(self):
         self._device.log_info("_update_dns")
         def_dom = ''
@@ -125,7 +127,7 @@ class awp_dns(Feature):
         ifreList = re.compile('ip\s+domain-list\s(?P<domains>(\w+))')
         ifreServ = re.compile('ip\s+name-server\s(?P<names>(\d+\.+\d+\.+\d+\.+\d+))')
         for line in self._device.cmd("show running-config").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifreList.match(line)
             if m:
                 if def_dom == '':
@@ -141,4 +143,4 @@ class awp_dns(Feature):
 
         self._dns = {'name_servers': nam_srv, 'default_domain': def_dom}
 
-        self._device.log_debug("dns {0}".format(pformat(json.dumps(self._dns))))
+        self._device.log_debug("dns {0}", LazyArg(lambda: pformat(json.dumps(self._dns))))
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.digest import file_sha256, text_sha256
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -15,26 +17,106 @@ except ImportError:  # pragma: no cover
 
 
 class HTTPHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # the file is sent in chunks of this size, not read whole into memory
+    chunk_size = 262144
+
     def do_GET(self):
-        if self.server.filename == self.path[1:]:
-            try:
-                with open(os.path.abspath(self.server.filename), 'rb') as f:
-                    self.server._d.log_info('sending file {0}'.format(os.path.abspath(self.server.filename)))
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/octet-string')
-                    self.end_headers()
-                    self.wfile.write(f.read())
-            except:                                                                 # pragma: no cover
-                self.server._d.log_error('cannot open file {0}'.format(self.path))  # pragma: no cover
-                self.send_response(404)                                             # pragma: no cover
-                self.end_headers()                                                  # pragma: no cover
-        else:                                                                       # pragma: no cover
+        self._send_file(True)
+
+    def do_HEAD(self):
+        self._send_file(False)
+
+    def _send_file(self, body):
+        path = self._get_path()
+        if path is None:                                                            # pragma: no cover
             self.server._d.log_error('wrong file requested {0}'.format(self.path))  # pragma: no cover
             self.send_response(404)                                                 # pragma: no cover
             self.end_headers()                                                      # pragma: no cover
+            return                                                                  # pragma: no cover
+        try:
+            f = open(path, 'rb')
+        except IOError:                                                             # pragma: no cover
+            self.server._d.log_error('cannot open file {0}'.format(self.path))      # pragma: no cover
+            self.send_response(404)                                                 # pragma: no cover
+            self.end_headers()                                                      # pragma: no cover
+            return                                                                  # pragma: no cover
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            byte_range = self._get_range(size)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{0}'.format(size))
+                self.end_headers()
+                return
+            if byte_range is None:
+                start, end = 0, size - 1
+                self.send_response(200)
+            else:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(start, end, size))
+            self.send_header('Content-type', 'application/octet-string')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+            if not body:
+                return
+            self.server._d.log_info('sending file {0} bytes {1}-{2}'.format(path, start, end))
+            f.seek(start)
+            left = end - start + 1
+            try:
+                while left > 0:
+                    chunk = f.read(min(self.chunk_size, left))
+                    if not chunk:                                                   # pragma: no cover
+                        break                                                       # pragma: no cover
+                    self.wfile.write(chunk)
+                    left -= len(chunk)
+                    self._progress(end + 1 - left, size)
+            except socket.error, e:                                                 # pragma: no cover
+                # the device closed the connection, it can resume with a range request
+                self.server._d.log_warn('transfer of {0} interrupted ({1})'.format(self.path, e))  # pragma: no cover
+
+    def _get_path(self):
+        if self.server.filename != self.path[1:]:
+            return None
+        return os.path.abspath(self.server.filename)
+
+    def _progress(self, sent, size):
+        # called after every chunk with the offset reached in the file
+        pass
+
+    def _get_range(self, size):
+        """
+        (start, end) of the single byte range requested, None for the whole file and False when it cannot be served
+        """
+        header = self.headers.getheader('Range')
+        if header is None:
+            return None
+        m = re.match('^\s*bytes\s*=\s*(?P<start>\d*)\s*-\s*(?P<end>\d*)\s*$', header)
+        if not m or (m.group('start') == '' and m.group('end') == ''):
+            # multiple or malformed ranges, the whole file is sent
+            return None
+        if m.group('start') == '':
+            # last bytes of the file
+            length = int(m.group('end'))
+            if length == 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(m.group('start'))
+        end = size - 1
+        if m.group('end') != '':
+            if int(m.group('end')) < start:
+                return None
+            end = min(int(m.group('end')), size - 1)
+        if start >= size:
+            return False
+        return start, end
 
 
 class Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    # several devices may connect at once, the default backlog of 5 makes the others retry after a second
+    request_queue_size = 64
+
     def __init__(self, address, handler, device, filename):
         self.filename = filename
         self._d = device
@@ -45,15 +127,20 @@ class awp_file(Feature):
     """
     File feature implementation for AWP
     """
+    # files up to this size are read back from the device to be compared by sync
+    compare_size = 1048576
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._file = {}
+        # name -> (size, mdate, mtime, sha256) of the files copied by sync
+        self._digests = {}
         self._device.log_debug("loading feature")
 
     def load_config(self, config):
         self._device.log_info("loading config")
 
-    def create(self, name, protocol='http', text='', filename=''):
+    def create(self, name, protocol='http', text='', filename='', file_server=None):
         self._device.log_info("create file {0}".format(name))
         self._update_file()
 
@@ -70,30 +157,22 @@ class awp_file(Feature):
             myfile.write(text)
             myfile.close()
 
-        # host HTTP server thread
-        server = Server(("", 0), HTTPHandler, self._device, filename)
-        ip, port = server.server_address
-
-        server_thread = threading.Thread(target=server.serve_forever)
-        server_thread.daemon = True
-        server_thread.start()
-        self._device.log_info("server running on {0}:{1}".format(ip, port))
+        url, stop = self._serve(filename, file_server)
 
         # device commands (timeout of 10 seconds for each MB)
-        host_ip_address = socket.gethostbyname(socket.getfqdn())
         timeout = (os.path.getsize(filename) / 1048576 + 1) * 10000
-        create_cmd = 'copy {0}://{1}:{2}/{3} {4}'.format(protocol, host_ip_address, port, filename, name)
+        create_cmd = 'copy {0} {1}'.format(url, name)
         cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                          {'cmd': create_cmd, 'prompt': '\#', 'timeout': timeout}
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
         self._update_file()
 
-        server.shutdown()
+        stop()
         if (text != ''):
             os.remove(filename)
 
-    def update(self, name, protocol='http', filename='', text='', new_name=''):
+    def update(self, name, protocol='http', filename='', text='', new_name='', file_server=None):
         self._device.log_info("copying {0} from host to device".format(name))
         self._update_file()
 
@@ -118,20 +197,11 @@ class awp_file(Feature):
             myfile.write(text)
             myfile.close()
 
-        # host HTTP server thread
-        server = Server(("", 0), HTTPHandler, self._device, file_2_copy_from)
-        ip, port = server.server_address
-
-        server_thread = threading.Thread(target=server.serve_forever)
-        server_thread.daemon = True
-        server_thread.start()
-        self._device.log_info("server running on {0}:{1}".format(ip, port))
+        url, stop = self._serve(file_2_copy_from, file_server)
 
         # device commands
-        host_ip_address = socket.gethostbyname(socket.getfqdn())
-
         if (new_name == ''):
-            update_cmd = 'copy {0}://{1}:{2}/{3} {4}'.format(protocol, host_ip_address, port, file_2_copy_from, name)
+            update_cmd = 'copy {0} {1}'.format(url, name)
             delete_cmd = 'delete {0}'.format(name)
             cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                              {'cmd': delete_cmd, 'prompt': '', 'timeout': 10000},
@@ -139,21 +209,51 @@ class awp_file(Feature):
                              {'cmd': update_cmd, 'prompt': '\#'}
                              ]}
         else:
-            update_cmd = 'copy http://{0}:{1}/{2} {3}'.format(host_ip_address, port, file_2_copy_from, new_name)
+            update_cmd = 'copy {0} {1}'.format(url, new_name)
             delete_cmd = 'delete {0}'.format(name)
             cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                              {'cmd': update_cmd, 'prompt': '\#'},
                              {'cmd': delete_cmd, 'prompt': '', 'timeout': 10000},
                              {'cmd': 'y', 'prompt': '\#'}
                              ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
         self._update_file()
 
-        server.shutdown()
+        stop()
 
         if (text != ''):
             os.remove(file_2_copy_from)
 
+    def sync(self, name, text='', filename='', file_server=None):
+        """
+        Create or update the file unless the device already has the same content, return True when it is copied
+        """
+        self._device.log_info("sync file {0}".format(name))
+        if (filename != '' and text != ''):
+            raise KeyError('cannot have both host file name and host string not empty')
+
+        if (filename != ''):
+            size = os.path.getsize(filename)
+            digest = file_sha256(filename)
+        else:
+            size = len(text)
+            digest = text_sha256(text)
+
+        self._update_file()
+        if name in self._file:
+            if self._is_identical(name, size, digest, text, filename):
+                self._device.log_info("file {0} is unchanged".format(name))
+                return False
+            self.update(name, filename=filename, text=text, file_server=file_server)
+        else:
+            self.create(name, filename=filename, text=text, file_server=file_server)
+
+        if name not in self._file or int(self._file[name]['size']) != size:
+            raise KeyError('file {0} has not been copied entirely'.format(name))
+        entry = self._file[name]
+        self._digests[name] = (entry['size'], entry['mdate'], entry['mtime'], digest)
+        return True
+
     def delete(self, file_name):
         self._device.log_info("remove {0}".format(file_name))
         self._update_file()
@@ -167,7 +267,7 @@ class awp_file(Feature):
                          {'cmd': 'y', 'prompt': '\#', 'timeout': 10000}
                          ]}
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['file'])
         self._update_file()
 
     def items(self):
@@ -185,14 +285,52 @@ class awp_file(Feature):
             return self._file[filename]
         raise KeyError('file {0} does not exist'.format(filename))
 
+    def _serve(self, filename, file_server):
+        """
+        URL from which the device copies filename and the function to call when the copy is over. Without a shared
+        FileServer a server is started for this copy only
+        """
+        if file_server is not None:
+            return file_server.publish(filename), lambda: None
+
+        # host HTTP server thread
+        server = Server(("", 0), HTTPHandler, self._device, filename)
+        ip, port = server.server_address
+
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        self._device.log_info("server running on {0}:{1}".format(ip, port))
+
+        host_ip_address = socket.gethostbyname(socket.getfqdn())
+        return 'http://{0}:{1}/{2}'.format(host_ip_address, port, filename), server.shutdown
+
+    def _is_identical(self, name, size, digest, text, filename):
+        entry = self._file[name]
+        if int(entry['size']) != size:
+            return False
+        if self._digests.get(name) == (entry['size'], entry['mdate'], entry['mtime'], digest):
+            return True
+        if size > self.compare_size:
+            return False
+        if (filename != ''):
+            with open(filename, 'rb') as f:
+                text = f.read()
+        # compared as show file prints them, without carriage returns and empty lines
+        identical = self._normalize(text) == self._update_file_content(name)
+        if identical:
+            self._digests[name] = (entry['size'], entry['mdate'], entry['mtime'], digest)
+        return identical
+
+    def _normalize(self, text):
+        return text.replace('\r', '').replace('\n\n', '\n')
+
     def _update_file_content(self, filename):
         self._device.log_info("Read file {0} content".format(filename))
         read_cmd = 'show file {0}'.format(filename)
-        read_output = self._device.cmd(read_cmd)
-        read_output = read_output.replace('\r', '')
-        read_output = read_output.replace('\n\n', '\n')
-        return read_output
+        return self._normalize(self._device.cmd(read_cmd))
 
+    @snapshot
     def _update_file(self):
         self._device.log_info("_update_file")
         self._file = OrderedDict()
@@ -214,4 +352,4 @@ class awp_file(Feature):
                                    'mdate': m.group('day') + '-' + m.group('month') + '-' + m.group('year'),
                                    'mtime': m.group('hhmmss')
                                    }
-        self._device.log_debug("File {0}".format(pformat(json.dumps(self._file))))
+        self._device.log_debug("File {0}", LazyArg(lambda: pformat(json.dumps(self._file))))
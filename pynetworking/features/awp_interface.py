@@ -1,26 +1,32 @@
 # -*- coding: utf-8 -*-
-import re
 import json
 from pprint import pformat
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
 from pynetworking.features.awp_interface_config_lexer import InterfaceConfigLexer
 from pynetworking.features.awp_interface_status_lexer import InterfaceStatusLexer
+from pynetworking.utils.interface_index import index_interface_config
+from pynetworking.utils.lazy import LazyArg
 
 
 class awp_interface(Feature):
     """
     Interface feature implementation for AWP
     """
+    config_sections = ('interface',)
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._interface_config = {}
+        self._interface_index = {}
         self._interface = {}
+        self._status_lexer = InterfaceStatusLexer()
 
     def load_config(self, config):
         self._device.log_info("load_config")
-        self._device.log_debug("Loading config for awp_interface {0}".format(config))
+        self._device.log_debug("Loading config for awp_interface {0}", config)
         l = InterfaceConfigLexer()
         self._interface_config = l.run(config)
+        self._interface_index = index_interface_config(self._interface_config)
 
     def update(self, ifn, **kwargs):
         self._device.log_info("update {0} {1}".format(ifn, pformat(kwargs)))
@@ -52,8 +58,8 @@ class awp_interface(Feature):
 
         if run_cmd:
             cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-            self._device.cmd(cmds, cache=False, flush_cache=True)
-            self._device.load_system()
+            self._device.cmd(cmds, cache=False, flush_cache=['interface'])
+            self._device.load_system(['interface'])
 
     def items(self):
         self._update_interface()
@@ -79,22 +85,12 @@ class awp_interface(Feature):
         for interface in self._interface:
             yield interface
 
-    def _get_interface_ns(self, ifn):
-        ifn = str(ifn)
-        m = re.match('^(?P<prefix>\d+\.\d+\.)(?P<start_no>\d+)\-\d+\.\d+\.(?P<end_no>\d+)$', ifn)
-        if m:
-            ret = ['{0}{1}'.format(m.group('prefix'), n) for n in range(int(m.group('start_no')), 1 + int(m.group('end_no')))]
-            return ret
-        else:
-            return [ifn]
-
+    @snapshot
     def _update_interface(self):
         self._device.log_info("_update_interface")
-        l = InterfaceStatusLexer()
-        self._interface = l.run(self._device.cmd("show interface"))
+        self._interface = self._status_lexer.run(self._device.cmd("show interface"))
         for ifn, ifi in self._interface.items():
-            for ifr, ifc in self._interface_config.items():
-                if ifn in self._get_interface_ns(ifr):
-                    self._device.log_debug("Updating {0} with {1}".format(ifn, ifc))
-                    self._interface[ifn] = dict(self._interface[ifn].items() + ifc.items())
-        self._device.log_debug("Loaded awp_interface {0}".format(pformat(json.dumps(self._interface))))
+            if ifn in self._interface_index:
+                self._device.log_debug("Updating {0} with {1}", ifn, self._interface_index[ifn])
+                self._interface[ifn] = dict(ifi.items() + self._interface_index[ifn].items())
+        self._device.log_debug("Loaded awp_interface {0}", LazyArg(lambda: pformat(json.dumps(self._interface))))
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import re
-import ply.lex as lex
+from pynetworking.utils.lexer import Lexer
 
 
 try:
@@ -9,7 +9,7 @@ except ImportError:  # pragma: no cover
     from ordereddict import OrderedDict
 
 
-class InterfaceStatusLexer(object):
+class InterfaceStatusLexer(Lexer):
     states = (
         ('if', 'exclusive'),
         ('lo', 'exclusive'),
@@ -99,18 +99,24 @@ class InterfaceStatusLexer(object):
         t.lexer.pop_state()
         t.lexer.lineno += len(t.value)
 
+    # runs of characters that cannot begin a token, skipped in one step instead
+    # of one character at a time by the error rule
+    def t_INITIAL_SKIP(self, t):
+        r'[^\sI]+'
+        pass
+
+    def t_if_lo_vlan_SKIP(self, t):
+        r'[^\sacT]+'
+        pass
+
     def t_ANY_error(self, t):  # pragma: no cover
         t.lexer.skip(1)
 
-    def __init__(self, debug=0):
-        self._debug = debug
-        self.lexer = lex.lex(object=self, debug=debug)
-
     def run(self, data):
-        self.lexer.input(data)
+        self.reset(data)
         result = OrderedDict()
         for tok in self.lexer:
-            if tok.value[0] in result.keys():
+            if tok.value[0] in result:
                 result[tok.value[0]][tok.type.replace('_', ' ')] = tok.value[1]
             else:
                 result[tok.value[0]] = {tok.type.replace('_', ' '): tok.value[1]}
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -61,7 +62,7 @@ class awp_license(Feature):
                                  {'cmd': 'y', 'prompt': '\#'}
                                  ]}
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['license'])
         self._update_license()
 
     def delete(self, label):
@@ -77,7 +78,7 @@ class awp_license(Feature):
                          {'cmd': 'y', 'prompt': '\#'}
                          ]}
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['license'])
         self._update_license()
 
     def items(self):
@@ -94,6 +95,7 @@ class awp_license(Feature):
             return self._license[label]
         raise KeyError('license {0} does not exist'.format(label))
 
+    @snapshot
     def _update_license(self):
         self._device.log_info("_update_license")
         self._license = OrderedDict()
@@ -168,4 +170,4 @@ class awp_license(Feature):
                                       'features': '',
                                       'releases': m.group('version')
                                       }
-        self._device.log_debug("License {0}".format(pformat(json.dumps(self._license))))
+        self._device.log_debug("License {0}", LazyArg(lambda: pformat(json.dumps(self._license))))
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.mac_table import MacTable, parse_mac, int_to_mac
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
-from time import sleep
 import re
 import json
 
@@ -12,10 +13,19 @@ except ImportError:  # pragma: no cover
     from ordereddict import OrderedDict
 
 
+MAC_RE = re.compile('^(?P<vlan>\d+)[ \t]+'
+                    '(?P<interface>[^\s]+)[ \t]+'
+                    '(?P<mac>[^\s]+)[ \t]+'
+                    '(?P<action>[^\s]+)[ \t]+'
+                    '(?P<type>[^\s]+)', re.M)
+
+
 class awp_mac(Feature):
     """
     mac feature implementation for AWP
     """
+    config_sections = ('mac address-table',)
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._mac = {}
@@ -32,7 +42,7 @@ class awp_mac(Feature):
                           'vlan\s+(?P<vlan>\d+)')
 
         for line in config.split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre.match(line)
             if m:
                 key = m.group('mac')
@@ -48,7 +58,7 @@ class awp_mac(Feature):
         self._update_mac()
 
         mac = self._get_dotted_mac(mac)
-        if mac in self._mac.keys():
+        if mac in self._mac:
             raise KeyError('MAC address {0} is already existing'.format(mac))
 
         fwd = 'forward'
@@ -60,16 +70,15 @@ class awp_mac(Feature):
                          {'cmd': set_cmd, 'prompt': '\(config\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'}
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        sleep(sleep_time)
-        self._update_mac()
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+        return self._wait_for(lambda: self._is_static(self._read_mac(use_cache=False), mac), sleep_time)
 
     def update(self, mac, interface, forward=True, vlan=1, sleep_time=5):
         self._device.log_info("update MAC address {0} entry".format(mac))
         self._update_mac()
 
         mac = self._get_dotted_mac(mac)
-        if mac not in self._mac.keys():
+        if mac not in self._mac:
             raise KeyError('MAC address {0} does not exist'.format(mac))
 
         fwd = 'forward'
@@ -81,9 +90,13 @@ class awp_mac(Feature):
                          {'cmd': set_cmd, 'prompt': '\(config\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'}
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        sleep(sleep_time)
-        self._update_mac()
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+        entry = {'vlan': str(vlan), 'interface': interface, 'action': fwd, 'type': 'static'}
+
+        def updated():
+            table = self._read_mac(use_cache=False)
+            return mac in table and table[mac] == entry
+        return self._wait_for(updated, sleep_time)
 
     def delete(self, mac='', sleep_time=5):
         self._update_mac()
@@ -97,11 +110,12 @@ class awp_mac(Feature):
                              {'cmd': del_cmd_2, 'prompt': '\#'},
                              {'cmd': chr(26), 'prompt': '\#'}
                              ]}
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+            return self._wait_for(lambda: not self._has_static_entries(self._read_mac(use_cache=False)), sleep_time)
         else:
             self._device.log_info("remove {0}".format(mac))
             mac = self._get_dotted_mac(mac)
-            if mac not in self._mac.keys():
+            if mac not in self._mac:
                 raise KeyError('MAC address {0} does not exist'.format(mac))
             entry = self._mac[mac]
             if entry['type'] == 'dynamic':
@@ -116,11 +130,70 @@ class awp_mac(Feature):
                              {'cmd': del_cmd, 'prompt': '\(config\)\#'},
                              {'cmd': chr(26), 'prompt': '\#'}
                              ]}
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+            # the device may learn the mac address again as a dynamic entry
+            return self._wait_for(lambda: not self._is_static(self._read_mac(use_cache=False), mac), sleep_time)
+
+    def create_many(self, entries, sleep_time=5):
+        """
+        Create the static entries listed in entries, given as (mac, interface[, forward[, vlan]]) tuples or as
+        dictionaries of the create arguments, in a single configuration session
+        """
+        self._device.log_info("create {0} MAC address entries".format(len(entries)))
+        self._update_mac()
+
+        entries = self._get_entries(entries)
+        for mac in entries:
+            if mac in self._mac:
+                raise KeyError('MAC address {0} is already existing'.format(mac))
+
+        cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
+                         {'cmd': 'conf t', 'prompt': '\(config\)\#'}
+                         ]}
+        for mac, (interface, fwd, vlan) in entries.items():
+            set_cmd = 'mac address-table static {0} {1} interface {2} vlan {3}'.format(mac, fwd, interface, vlan)
+            cmds['cmds'].append({'cmd': set_cmd, 'prompt': '\(config\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+
+        def created():
+            table = self._read_mac(use_cache=False)
+            return all([self._is_static(table, mac) for mac in entries])
+        return self._wait_for(created, sleep_time)
 
-        sleep(sleep_time)
+    def delete_many(self, macs, sleep_time=5):
+        """
+        Remove the static entries of the listed mac addresses in a single configuration session
+        """
+        self._device.log_info("remove {0} MAC address entries".format(len(macs)))
         self._update_mac()
 
+        cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
+                         {'cmd': 'conf t', 'prompt': '\(config\)\#'}
+                         ]}
+        dotted_macs = OrderedDict()
+        for mac in macs:
+            mac = self._get_dotted_mac(mac)
+            if mac not in self._mac:
+                raise KeyError('MAC address {0} does not exist'.format(mac))
+            entry = self._mac[mac]
+            if entry['type'] == 'dynamic':
+                raise KeyError('cannot remove a dynamic entry')
+            if mac in dotted_macs:
+                raise KeyError('MAC address {0} is listed more than once'.format(mac))
+            dotted_macs[mac] = True
+            del_cmd = 'no mac address-table static {0} {1} interface {2} vlan {3}'.format(mac, entry['action'],
+                                                                                         entry['interface'],
+                                                                                         entry['vlan'])
+            cmds['cmds'].append({'cmd': del_cmd, 'prompt': '\(config\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['mac'])
+
+        def deleted():
+            table = self._read_mac(use_cache=False)
+            return not any([self._is_static(table, mac) for mac in dotted_macs])
+        return self._wait_for(deleted, sleep_time)
+
     def items(self):
         self._update_mac()
         return self._mac.items()
@@ -132,7 +205,7 @@ class awp_mac(Feature):
     def __getitem__(self, mac):
         self._update_mac()
         dotted_mac = self._get_dotted_mac(mac)
-        if dotted_mac not in self._mac.keys():
+        if dotted_mac not in self._mac:
             raise KeyError('MAC address {0} does not exist'.format(mac))
         return self._mac[dotted_mac]
 
@@ -148,36 +221,70 @@ class awp_mac(Feature):
             raise KeyError('MAC address {0} is not valid'.format(mac))
         return mac
 
-    def _update_mac(self):
-        self._device.log_info("_update_mac")
-        self._mac = OrderedDict()
+    def _get_entries(self, entries):
+        # mac -> (interface, action, vlan) of the entries given to create_many
+        def entry(mac, interface, forward=True, vlan=1):
+            return self._get_dotted_mac(mac), (interface, 'forward' if forward is not False else 'discard', vlan)
+
+        ret = OrderedDict()
+        for e in entries:
+            mac, values = entry(**e) if isinstance(e, dict) else entry(*e)
+            if mac in ret:
+                raise KeyError('MAC address {0} is listed more than once'.format(mac))
+            ret[mac] = values
+        return ret
+
+    def iter_entries(self):
+        """
+        Yield the entries of the mac address table one at a time without building the whole table.
+        The output of the command is still read whole from the device before being parsed.
+        """
+        self._device.log_info("iter_entries")
+        self._device.cmd("terminal length 0")
+        for mac, vlan, interface, action, type in self._parse_mac(self._device.cmd("show mac address-table")):
+            yield int_to_mac(mac), {'vlan': vlan, 'interface': interface, 'action': action, 'type': type}
 
+    def table(self, use_cache=True):
+        if use_cache:
+            self._update_mac()
+        else:
+            self._read_mac(use_cache=False)
+        return self._mac
+
+    def _parse_mac(self, output):
         # 1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
-        ifre = re.compile('(?P<vlan>\d+)\s+'
-                          '(?P<interface>[^\s]+)\s+'
-                          '(?P<mac>[^\s]+)\s+'
-                          '(?P<action>[^\s]+)\s+'
-                          '(?P<type>[^\s]+)')
+        for m in MAC_RE.finditer(output):
+            mac = self._parse_entry_mac(m)
+            if mac is not None:
+                yield mac, m.group('vlan'), m.group('interface'), m.group('action'), m.group('type')
+
+    def _parse_entry_mac(self, m):
+        try:
+            return parse_mac(m.group('mac'))
+        except ValueError:
+            # the table stores the macs as integers, the entry cannot be kept
+            self._device.log_warn("skipping mac address table entry '{0}'", m.group(0).strip())
+            return None
+
+    @snapshot
+    def _update_mac(self):
+        self._read_mac()
+
+    def _read_mac(self, use_cache=True):
+        self._device.log_info("_update_mac")
         self._device.cmd("terminal length 0")
-        for line in self._device.cmd("show mac address-table").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
-            m = ifre.match(line)
-            if m:
-                key = m.group('mac')
-                self._mac[key] = {'vlan': m.group('vlan'),
-                                  'interface': m.group('interface'),
-                                  'action': m.group('action'),
-                                  'type': m.group('type')
-                                  }
-        self._device.log_debug("mac {0}".format(pformat(json.dumps(self._mac))))
+        self._mac = MacTable(self._parse_mac(self._device.cmd("show mac address-table", use_cache=use_cache)))
+        self._device.log_debug("mac {0}", LazyArg(lambda: pformat(json.dumps(self._mac.items()))))
+        return self._mac
 
     def _check_static_entry_presence(self):
         self._device.log_info("_check_static_entry_presence")
         self._update_mac()
+        return self._has_static_entries(self._mac)
 
-        keys = self._mac.keys()
-        for key in keys:
-            if self._mac[key]['type'] == 'static' and self._mac[key]['interface'] != 'CPU':
-                return True
+    def _is_static(self, table, mac):
+        return mac in table and table[mac]['type'] == 'static'
 
-        return False
+    def _has_static_entries(self, table):
+        static = table.filter(type='static')
+        return len(static) > len(static.filter(interface='CPU'))
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
-from time import sleep
 import re
 import json
 try:
@@ -14,6 +14,8 @@ class awp_ntp(Feature):
     """
     ntp feature implementation for AWP
     """
+    config_sections = ('ntp',)
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._ntp = {}
@@ -27,7 +29,7 @@ class awp_ntp(Feature):
         ifre = re.compile('ntp\s+peer\s+(?P<address>[^\s]+)')
 
         for line in config.split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+            self._device.log_debug("line is {0}", line)
             m = ifre.match(line)
             if m:
                 key = m.group('address')
@@ -49,9 +51,10 @@ class awp_ntp(Feature):
                          {'cmd': set_cmd, 'prompt': '\(config\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'}
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        sleep(sleep_time)
-        self._update_ntp()
+        before = set(self._ntp.keys())
+        self._device.cmd(cmds, cache=False, flush_cache=['ntp'])
+        # a server given by name is listed with its address
+        return self._wait_for(lambda: address in self._read_ntp(use_cache=False) or set(self._ntp.keys()) - before, sleep_time)
 
     def delete(self, address='', sleep_time=3):
         self._device.log_info("remove NTP server {0}".format(address))
@@ -74,9 +77,11 @@ class awp_ntp(Feature):
             cmds['cmds'].append({'cmd': del_cmd, 'prompt': '\(config\)\#'})
 
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        sleep(sleep_time)
-        self._update_ntp()
+        self._device.cmd(cmds, cache=False, flush_cache=['ntp'])
+        if address == '':
+            return self._wait_for(lambda: not self._read_ntp(use_cache=False), sleep_time)
+        else:
+            return self._wait_for(lambda: address not in self._read_ntp(use_cache=False), sleep_time)
 
     def items(self):
         self._update_ntp()
@@ -92,7 +97,11 @@ class awp_ntp(Feature):
             raise KeyError('NTP server {0} is not present'.format(address))
         return self._ntp[address]
 
+    @snapshot
     def _update_ntp(self):
+        self._read_ntp()
+
+    def _read_ntp(self, use_cache=True):
         self._device.log_info("_update_ntp")
         self._ntp = OrderedDict()
 
@@ -114,8 +123,8 @@ class awp_ntp(Feature):
                           '\s+(?P<st>\d+)\s+'
                           '\s+(?P<when>[^\s]+)\s+'
                           '\s+(?P<polltime>\d+)')
-        for line in self._device.cmd("show ntp associations").split('\n'):
-            self._device.log_debug("line is {0}".format(line))
+        for line in self._device.cmd("show ntp associations", use_cache=use_cache).split('\n'):
+            self._device.log_debug("line is {0}", line)
             m = ifre.match(line)
             if m:
                 status = False
@@ -125,4 +134,5 @@ class awp_ntp(Feature):
                 self._ntp[key] = {'polltime': m.group('polltime'),
                                   'status': status
                                   }
-        self._device.log_debug("ntp {0}".format(pformat(json.dumps(self._ntp))))
+        self._device.log_debug("ntp {0}", LazyArg(lambda: pformat(json.dumps(self._ntp))))
+        return self._ntp
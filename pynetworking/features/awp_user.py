@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
+from pynetworking.utils.lazy import LazyArg
 from pprint import pformat
 import re
 import json
@@ -13,6 +14,8 @@ class awp_user(Feature):
     """
     User account feature implementation for AWP
     """
+    config_only = False
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._user_config = {}
@@ -69,7 +72,7 @@ class awp_user(Feature):
         cmds['cmds'].append({'cmd': create_cmd, 'prompt': '\(config\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['user'])
         self.load_config()
 
     def delete(self, user_name):
@@ -88,7 +91,7 @@ class awp_user(Feature):
         cmds['cmds'].append({'cmd': delete_cmd, 'prompt': '\(config\)\#'})
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
 
-        self._device.cmd(cmds, cache=False, flush_cache=True)
+        self._device.cmd(cmds, cache=False, flush_cache=['user'])
         self.load_config()
 
     def update(self, user_name, **kwargs):
@@ -126,7 +129,7 @@ class awp_user(Feature):
 
         if run_cmd:
             cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-            self._device.cmd(cmds, cache=False, flush_cache=True)
+            self._device.cmd(cmds, cache=False, flush_cache=['user'])
             self.load_config()
 
     def items(self):
@@ -143,6 +146,7 @@ class awp_user(Feature):
             return self._user[username]
         raise KeyError('user {0} does not exist'.format(username))
 
+    @snapshot
     def _update_user(self):
         self._device.log_info("_update_user")
         self._user = OrderedDict()
@@ -179,4 +183,4 @@ class awp_user(Feature):
                                    }
                 self._user[key] = dict(self._user[key].items() + self._user_config[key].items())
 
-        self._device.log_debug("User {0}".format(pformat(json.dumps(self._user))))
+        self._device.log_debug("User {0}", LazyArg(lambda: pformat(json.dumps(self._user))))
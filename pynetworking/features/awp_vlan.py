@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
-from pynetworking.Feature import Feature
+from pynetworking.Feature import Feature, snapshot
 from pynetworking.features.awp_vlan_config_lexer import VlanConfigLexer
 from pynetworking.features.awp_vlan_status_lexer import VlanStatusLexer
 from pynetworking.features.awp_vlan_config_interface_lexer import VlanInterfaceConfigLexer
+from pynetworking.utils.vlan_batch import VlanBatch
+from pynetworking.utils.vlan_set import VlanSet
+from pynetworking.utils.interface_index import index_interface_config
+from pynetworking.utils.lazy import LazyArg
+from contextlib import contextmanager
 from pprint import pformat
-import re
 import json
 
 
@@ -12,80 +16,130 @@ class awp_vlan(Feature):
     """
     Vlan feature implementation for AWP
     """
+    config_sections = ('vlan database', 'interface')
+
     def __init__(self, device, **kvargs):
         Feature.__init__(self, device, **kvargs)
         self._vlan_config = {}
+        self._vlan_config_ids = []
+        self._interface_config = {}
+        self._interface_index = {}
         self._vlan = {}
+        self._batch = None
+        self._status_lexer = VlanStatusLexer()
         self._device.log_debug("loading feature")
 
     def load_config(self, config):
         self._device.log_info("loading config")
         l = VlanConfigLexer()
         self._vlan_config = l.run(config)
+        self._vlan_config_ids = [(VlanSet(vlr), vlc) for vlr, vlc in self._vlan_config.items()]
         l = VlanInterfaceConfigLexer()
         self._interface_config = l.run(config)
+        self._interface_index = index_interface_config(self._interface_config)
 
     def create(self, vlan_id, **kwargs):
         self._device.log_info("create {0} {1}".format(vlan_id, pformat(kwargs)))
         self._update_vlan()
+        vlan_ids = VlanSet(vlan_id)
+        if len(vlan_ids) != 1:
+            kwargs.pop('name', None)
+        if 'state' in kwargs and kwargs['state'] != 'enable' and kwargs['state'] != 'disable':
+            raise ValueError("{0} is and invalid vlan state".format(kwargs['state']))
+
+        if self._batch is not None:
+            self._batch.create([i for i in vlan_ids if kwargs or str(i) not in self._vlan or i in self._batch.deleted], **kwargs)
+            return
+
         cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                          {'cmd': 'conf t', 'prompt': '\(config\)\#'},
                          {'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'},
                          ]}
-        vlan_cmd = 'vlan {0}'.format(vlan_id)
-
-        if len(self._get_vlan_ids(vlan_id)) == 1:
-            if 'name' in kwargs:
-                if ' ' in kwargs['name']:
-                    vlan_cmd += ' name "{0}"'.format(kwargs['name'])
-                else:
-                    vlan_cmd += " name {0}".format(kwargs['name'])
-        if 'state' in kwargs:
-            if kwargs['state'] == 'enable' or kwargs['state'] == 'disable':
-                vlan_cmd += " state {0}".format(kwargs['state'])
-            else:
-                raise ValueError("{0} is and invalid vlan state".format(kwargs['state']))
-
-        cmds['cmds'].append({'cmd': vlan_cmd, 'prompt': '\(config-vlan\)\#'})
-        if 'mtu' in kwargs:
-            cmds['cmds'].append({'cmd': "vlan {0} mtu {1}".format(vlan_id, int(kwargs['mtu'])), 'prompt': '\(config-vlan\)\#'})
+        cmds['cmds'] += self._get_create_cmds(vlan_id, kwargs)
         cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
 
     def delete(self, vlan_id):
         self._device.log_info("delete {0}".format(vlan_id))
         self._update_vlan()
-        self._get_vlan_ids(vlan_id)
+        vlan_ids = VlanSet(vlan_id)
+
+        if self._batch is not None:
+            self._batch.delete(vlan_ids, VlanSet(self._vlan.keys()))
+            return
+
         cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                          {'cmd': 'conf t', 'prompt': '\(config\)\#'},
                          {'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'},
                          {'cmd': 'no vlan {0}'.format(vlan_id), 'prompt': '\(config-vlan\)\#'},
                          {'cmd': chr(26), 'prompt': '\#'},
                          ]}
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
 
     def update(self, vlan_id, **kwargs):
         self._device.log_info("update {0} {1}".format(vlan_id, pformat(kwargs)))
         self._update_vlan()
-        vlan_ids = self._get_vlan_ids(vlan_id)
-        existing_vlan_ids = []
-        for i in self._vlan_config.keys():
-            existing_vlan_ids += self._get_vlan_ids(i)
-
-        non_existing_ids = [i for i in vlan_ids if i not in existing_vlan_ids]
+        vlan_ids = VlanSet(vlan_id)
+        non_existing_ids = [i for i in vlan_ids - VlanSet(self._vlan_config.keys()) if not (self._batch is not None and self._batch.exists(i))]
 
         if len(non_existing_ids) == 0:
             self.create(vlan_id, **kwargs)
         else:
             raise KeyError('{0} vlans do not exist'.format(non_existing_ids))
 
+    @contextmanager
+    def batch(self):
+        """
+        Accumulate the changes made inside the block and send them in a single configuration session
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = VlanBatch()
+        try:
+            # the state of the vlans is read once for the whole block
+            with self._device.snapshot():
+                self._update_vlan()
+                yield self._batch
+            batch = self._batch
+        finally:
+            self._batch = None
+        if len(batch) == 0:
+            return
+
+        self._device.log_info("batch {0} vlans created, {1} vlans deleted, {2} interfaces changed".format(
+                              len(batch.created), len(batch.deleted), len(batch.interfaces)))
+        cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
+                         {'cmd': 'conf t', 'prompt': '\(config\)\#'},
+                         ]}
+        if batch.created:
+            cmds['cmds'].append({'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'})
+            # vlans with a name are created one by one, the others by range
+            # existing vlans are grouped apart, they do not need to be created
+            key = lambda vid, o: (vid if 'name' in o else None, str(vid) in self._vlan, tuple(sorted(o.items())))
+            for opts, vlan_id in batch.create_groups(key):
+                cmds['cmds'] += self._get_create_cmds(vlan_id, dict(opts[2]), existing=opts[1])
+            cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        for ifn in batch.interfaces:
+            cmds['cmds'].append({'cmd': 'interface port{0}'.format(ifn), 'prompt': '\(config-if\)\#'})
+            for c in batch.interface_cmds(ifn):
+                cmds['cmds'].append({'cmd': c, 'prompt': '\(config-if\)\#'})
+            cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        if batch.deleted:
+            cmds['cmds'].append({'cmd': 'vlan database', 'prompt': '\(config-vlan\)\#'})
+            cmds['cmds'].append({'cmd': 'no vlan {0}'.format(VlanSet(batch.deleted)), 'prompt': '\(config-vlan\)\#'})
+            cmds['cmds'].append({'cmd': 'exit', 'prompt': '\(config\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
+
     def add_interface(self, vid, ifn, tagged=False):
         self._device.log_info("add_interface {0} ifn={1} tagged={2}".format(vid, ifn, tagged))
         self._update_vlan()
         vid = str(vid)
-        if vid not in self._vlan:
+        if vid not in self._vlan and not (self._batch is not None and self._batch.exists(vid)):
             raise ValueError('{0} is not a valid vlan id'.format(vid))
 
         ifi = self._get_interface_config(ifn)
@@ -95,66 +149,66 @@ class awp_vlan(Feature):
         if 'switchport mode' not in ifi:
             raise ValueError('{0} interface does not support vlan'.format(ifn))
 
-        cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
-                         {'cmd': 'conf t', 'prompt': '\(config\)\#'},
-                         {'cmd': 'interface port{0}'.format(ifn), 'prompt': '\(config-if\)\#'},
-                         ]}
+        mode = ifi['switchport mode']
+        if self._batch is not None:
+            mode = self._batch.modes.get(ifn, mode)
 
-        if ifi['switchport mode'] == 'access' and tagged is False:
-            cmds['cmds'].append({'cmd': 'switchport access vlan {0}'.format(vid), 'prompt': '\(config-if\)\#'})
-        elif ifi['switchport mode'] == 'access' and tagged is True:
+        if mode == 'access' and tagged is False:
+            if_cmds = [('switchport access vlan {0}', vid)]
+        elif mode == 'access' and tagged is True:
             # should copy access vlan to native
-            cmds['cmds'].append({'cmd': 'switchport mode trunk', 'prompt': '\(config-if\)\#'})
-            cmds['cmds'].append({'cmd': 'switchport trunk allowed vlan add {0}'.format(vid), 'prompt': '\(config-if\)\#'})
-        elif ifi['switchport mode'] == 'trunk' and tagged is False:
-            cmds['cmds'].append({'cmd': 'switchport trunk native vlan {0}'.format(vid), 'prompt': '\(config-if\)\#'})
-        elif ifi['switchport mode'] == 'trunk' and tagged is True:
-            cmds['cmds'].append({'cmd': 'switchport trunk allowed vlan add {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('switchport mode trunk', None), ('switchport trunk allowed vlan add {0}', vid)]
+        elif mode == 'trunk' and tagged is False:
+            if_cmds = [('switchport trunk native vlan {0}', vid)]
+        elif mode == 'trunk' and tagged is True:
+            if_cmds = [('switchport trunk allowed vlan add {0}', vid)]
         else:
             raise ValueError('interface {0} cannot be added to vlan {1}'.format(ifn, vid))
 
-        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        if self._batch is not None:
+            if tagged is True:
+                self._batch.modes[ifn] = 'trunk'
+            self._batch.add_member(vid, ifn, tagged)
+        self._interface_cmds(ifn, if_cmds)
 
     def delete_interface(self, vid, ifn):
         self._device.log_info("delete_interface {0} ifn={1}".format(vid, ifn))
         self._update_vlan()
         vid = str(vid)
-        if vid not in self._vlan:
+        if vid not in self._vlan and not (self._batch is not None and self._batch.exists(vid)):
             raise ValueError('{0} is not a valid vlan id'.format(vid))
 
         ifi = self._get_interface_config(ifn)
         if not ifi:
             raise ValueError('{0} is not a valid interface'.format(ifn))
 
-        if 'tagged' in self._vlan[vid] and ifn in self._vlan[vid]['tagged']:
+        vli = self._vlan.get(vid, {})
+        tagged = None
+        if 'tagged' in vli and ifn in vli['tagged']:
             tagged = True
-        else:
-            if 'untagged' in self._vlan[vid] and ifn in self._vlan[vid]['untagged']:
-                tagged = False
-            else:
-                raise ValueError('interface {0} does not belong to vlan {1}'.format(ifn, vid))
+        elif 'untagged' in vli and ifn in vli['untagged']:
+            tagged = False
+        if self._batch is not None:
+            tagged = self._batch.remove_member(vid, ifn, tagged)
+        if tagged is None:
+            raise ValueError('interface {0} does not belong to vlan {1}'.format(ifn, vid))
 
-        cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
-                         {'cmd': 'conf t', 'prompt': '\(config\)\#'},
-                         {'cmd': 'interface port{0}'.format(ifn), 'prompt': '\(config-if\)\#'},
-                         ]}
+        mode = ifi['switchport mode']
+        if self._batch is not None:
+            mode = self._batch.modes.get(ifn, mode)
 
-        if ifi['switchport mode'] == 'access':
+        if mode == 'access':
             # this actually move port back to vlan 1
             # VLAN id is implicit, being untagged
-            cmds['cmds'].append({'cmd': 'no switchport access vlan', 'prompt': '\(config-if\)\#'})
-        elif ifi['switchport mode'] == 'trunk' and tagged is False:
-            cmds['cmds'].append({'cmd': 'switchport trunk native vlan none', 'prompt': '\(config-if\)\#'})
-        elif ifi['switchport mode'] == 'trunk' and tagged is True:
-            cmds['cmds'].append({'cmd': 'switchport trunk allowed vlan remove {0}'.format(vid), 'prompt': '\(config-if\)\#'})
+            if_cmds = [('no switchport access vlan', None)]
+        elif mode == 'trunk' and tagged is False:
+            if_cmds = [('switchport trunk native vlan none', None)]
+        elif mode == 'trunk' and tagged is True:
+            if_cmds = [('switchport trunk allowed vlan remove {0}', vid)]
         else:
             raise ValueError('interface {0} cannot be deleted from vlan {1}'.format(ifn, vid))
 
-        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
-        self._device.cmd(cmds, cache=False, flush_cache=True)
-        self._device.load_system()
+        self._interface_cmds(ifn, if_cmds)
 
     def items(self):
         self._update_vlan()
@@ -182,36 +236,53 @@ class awp_vlan(Feature):
             yield vlan
 
     def _get_vlan_ids(self, vlan_id):
-        vlan_id = str(vlan_id)
-        m = re.match('^\d+(,\d+)*$', vlan_id)
-        if m:
-            return map(int, vlan_id.split(','))
-        m = re.search('^(?P<start>\d+)\-(?P<end>\d+)$', vlan_id)
-        if m:
-            return range(int(m.group('start')), int(m.group('end')) + 1)
-        raise ValueError('{0} is not a valid vlan id, range or list'.format(vlan_id))
+        return list(VlanSet(vlan_id))
 
+    @snapshot
     def _update_vlan(self):
         self._device.log_info("_update_vlan")
-        l = VlanStatusLexer()
         vlan_cfg = self._device.cmd("show vlan all")
-        vlan = l.run(vlan_cfg)
+        vlan = self._status_lexer.run(vlan_cfg)
         for vln, vli in vlan.items():
-            for vlr, vlc in self._vlan_config.items():
-                if int(vln) in self._get_vlan_ids(vlr):
+            for vlr, vlc in self._vlan_config_ids:
+                if vln in vlr:
                     vlan[vln] = dict(vlan[vln].items() + vlc.items())
         self._vlan = vlan
-        self._device.log_debug(pformat(json.dumps(self._vlan)))
+        self._device.log_debug("{0}", LazyArg(lambda: pformat(json.dumps(self._vlan))))
 
     def _get_interface_config(self, ifn):
-        ret = {}
-        for ifr, ifi in self._interface_config.items():
-            m = re.match('^(?P<prefix>\d+\.\d+\.)(?P<start_no>\d+)\-\d+\.\d+\.(?P<end_no>\d+)$', ifr)
-            if m:
-                ifr = ['{0}{1}'.format(m.group('prefix'), n) for n in range(int(m.group('start_no')), 1 + int(m.group('end_no')))]
+        return self._interface_index.get(ifn, {})
+
+    def _get_create_cmds(self, vlan_id, kwargs, existing=False):
+        vlan_cmd = 'vlan {0}'.format(vlan_id)
+        if 'name' in kwargs:
+            if ' ' in kwargs['name']:
+                vlan_cmd += ' name "{0}"'.format(kwargs['name'])
             else:
-                ifr = [ifr]
+                vlan_cmd += " name {0}".format(kwargs['name'])
+        if 'state' in kwargs:
+            vlan_cmd += " state {0}".format(kwargs['state'])
+
+        cmds = []
+        # a plain vlan command on existing vlans changes nothing
+        if not existing or 'name' in kwargs or 'state' in kwargs:
+            cmds.append({'cmd': vlan_cmd, 'prompt': '\(config-vlan\)\#'})
+        if 'mtu' in kwargs:
+            cmds.append({'cmd': "vlan {0} mtu {1}".format(vlan_id, int(kwargs['mtu'])), 'prompt': '\(config-vlan\)\#'})
+        return cmds
+
+    def _interface_cmds(self, ifn, if_cmds):
+        if self._batch is not None:
+            for template, vid in if_cmds:
+                self._batch.add_interface_cmd(ifn, template, vid)
+            return
 
-            if ifn in ifr:
-                ret = dict(ret.items() + ifi.items())
-        return ret
+        cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
+                         {'cmd': 'conf t', 'prompt': '\(config\)\#'},
+                         {'cmd': 'interface port{0}'.format(ifn), 'prompt': '\(config-if\)\#'},
+                         ]}
+        for template, vid in if_cmds:
+            cmds['cmds'].append({'cmd': template.format(vid), 'prompt': '\(config-if\)\#'})
+        cmds['cmds'].append({'cmd': chr(26), 'prompt': '\#'})
+        self._device.cmd(cmds, cache=False, flush_cache=['vlan'])
+        self._device.load_system(['vlan'])
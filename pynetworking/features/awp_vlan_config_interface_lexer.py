@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import re
-import ply.lex as lex
+from pynetworking.utils.lexer import Lexer
 
 
-class VlanInterfaceConfigLexer(object):
+class VlanInterfaceConfigLexer(Lexer):
     states = (
         ('ifport', 'exclusive'),
         ('ifportrange', 'exclusive'),
@@ -65,14 +65,11 @@ class VlanInterfaceConfigLexer(object):
         print "Illegal character '%s'" % t.value[0]
         t.lexer.skip(1)
 
-    def __init__(self):
-        self.lexer = lex.lex(object=self, debug=0)
-
     def run(self, data):
-        self.lexer.input(data)
+        self.reset(data)
         result = {}
         for tok in self.lexer:
-            if tok.value[0] in result.keys():
+            if tok.value[0] in result:
                 result[tok.value[0]][tok.type.replace('_', ' ')] = tok.value[1]
             else:
                 result[tok.value[0]] = {tok.type.replace('_', ' '): tok.value[1]}
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import re
-import ply.lex as lex
+from pynetworking.utils.lexer import Lexer
 
 
-class VlanConfigLexer(object):
+class VlanConfigLexer(Lexer):
     states = (
         ('vlandb', 'exclusive'),
         ('vlanid', 'exclusive'),
@@ -88,14 +88,11 @@ class VlanConfigLexer(object):
     def t_ANY_error(self, t):  # pragma: no cover
         t.lexer.skip(1)
 
-    def __init__(self):
-        self.lexer = lex.lex(object=self)
-
     def run(self, data):
-        self.lexer.input(data)
+        self.reset(data)
         result = {}
         for tok in self.lexer:
-            if tok.value[0] in result.keys():
+            if tok.value[0] in result:
                 result[tok.value[0]][tok.type] = tok.value[1]
             else:
                 result[tok.value[0]] = {tok.type: tok.value[1]}
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import re
-import ply.lex as lex
+from pynetworking.utils.lexer import Lexer
 
 
 try:
@@ -9,7 +9,7 @@ except ImportError:  # pragma: no cover
     from ordereddict import OrderedDict
 
 
-class VlanStatusLexer(object):
+class VlanStatusLexer(Lexer):
     tokens = (
         'VLAN',
         'INTERFACE',
@@ -38,14 +38,17 @@ class VlanStatusLexer(object):
 
     t_ANY_ignore = ' \t'
 
+    # runs of characters that cannot begin a token, skipped in one step instead
+    # of one character at a time by the error rule
+    def t_ANY_SKIP(self, t):
+        r'[^\s\dp]+'
+        pass
+
     def t_ANY_error(self, t):  # pragma: no cover
         t.lexer.skip(1)
 
-    def __init__(self):
-        self.lexer = lex.lex(object=self, debug=0)
-
     def run(self, data):
-        self.lexer.input(data)
+        self.reset(data)
         result = OrderedDict()
         for tok in self.lexer:
             if tok.type == 'VLAN':
@@ -11,6 +11,9 @@ class ats_system(object):
     """
     System for ATS
     """
+    # sections of the running configuration that can be shown on their own
+    partial_config = ()
+
     def __init__(self, device):
         self._device = device
         self._old_boot_bank = 0
@@ -22,7 +25,7 @@ class ats_system(object):
         config = ''
         for line in self._device.cmd('show running-config').replace('\r', '').split('\n'):
             config += line + '\n'
-        self._device.log_debug('got device configuration \n{0}'.format(config))
+        self._device.log_debug('got device configuration \n{0}', config)
         return config
 
     def get_startup_config(self):
@@ -30,7 +33,7 @@ class ats_system(object):
         config = ''
         for line in self._device.cmd('show startup-config').replace('\r', '').split('\n'):
             config += line + '\n'
-        self._device.log_debug('got device configuration \n{0}'.format(config))
+        self._device.log_debug('got device configuration \n{0}', config)
         return config
 
     def save_config(self):
@@ -53,7 +56,8 @@ class ats_system(object):
         self._device.log_info('ping')
         self._device.cmd('show version', use_cache=False)
 
-    def update_firmware(self, filename, protocol='http', server='', port=69, dontwait=True):
+    def update_firmware(self, filename, protocol='http', server='', port=69, dontwait=True, tftp_service=None,
+                        options=None):
         # Port and dontwait parameters are used only to get emulation working.
         # They are ignored by a normal PN user.
         self._device.log_info("firmware upgrade with {0}".format(filename))
@@ -65,7 +69,8 @@ class ats_system(object):
 
         self._update_bank_data()
         boot_cmd = 'boot system image-{0}'.format(self._get_stand_by_bank())
-        self._device.file.create(name='image', protocol=protocol, filename=filename, server=server, port=port)
+        self._device.file.create(name='image', protocol=protocol, filename=filename, server=server, port=port,
+                                 tftp_service=tftp_service, options=options)
         cmds = {'cmds': [{'cmd': boot_cmd, 'prompt': '\#'},
                          {'cmd': 'reload', 'prompt': ''},
                          {'cmd': 'y', 'prompt': '', 'dontwait': dontwait}
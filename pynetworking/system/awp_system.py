@@ -10,20 +10,26 @@ class awp_system(object):
     """
     System for AWP
     """
+    # sections of the running configuration that can be shown on their own
+    partial_config = ('interface', 'vlan database')
+
     def __init__(self, device):
         self._device = device
 
-    def get_config(self):
+    def get_config(self, section=None):
         self._device.log_info('getting device configuration')
         config = ''
+        show_cmd = 'show running-config'
+        if section is not None:
+            show_cmd += ' ' + section
         cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
-                         {'cmd': 'show running-config', 'prompt': '\#'},
+                         {'cmd': show_cmd, 'prompt': '\#'},
                          ]}
         for line in self._device.cmd(cmds).replace('\r', '').split('\n'):
             config += line + '\n'
             if line.startswith("end"):
                 break
-        self._device.log_debug('got device configuration \n{0}'.format(config))
+        self._device.log_debug('got device configuration \n{0}', config)
         return config
 
     def get_startup_config(self):
@@ -36,7 +42,7 @@ class awp_system(object):
             config += line + '\n'
             if line.startswith("end"):
                 break
-        self._device.log_debug('got device startup configuration \n{0}'.format(config))
+        self._device.log_debug('got device startup configuration \n{0}', config)
         return config
 
     def save_config(self):
@@ -48,7 +54,7 @@ class awp_system(object):
         self._device.cmd(cmds, cache=False, flush_cache=True)
         self._device.load_system()
 
-    def update_firmware(self, filename, protocol='http', dontwait=True):
+    def update_firmware(self, filename, protocol='http', dontwait=True, file_server=None):
         self._device.log_info("firmware upgrade with {0}".format(filename))
 
         devfilename = filename.split('/')[-1]
@@ -69,7 +75,7 @@ class awp_system(object):
             else:
                 self._device.log_info('licensed software running')
 
-        self._device.file.create(name=devfilename, filename=filename)
+        self._device.file.create(name=devfilename, filename=filename, file_server=file_server)
         boot_cmd = 'boot system {0}'.format(devfilename)
         cmds = {'cmds': [{'cmd': 'enable', 'prompt': '\#'},
                          {'cmd': 'conf t', 'prompt': '\(config\)\#'},
@@ -4,8 +4,36 @@ try:
     from hashlib import md5
 except ImportError:  # pragma: no cover
     from md5 import new as md5
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover
+    from ordereddict import OrderedDict
 from time import time
 import json
+import re
+
+
+# (pattern, timeout) pairs, the timeout of the first pattern found in the
+# commands of an entry is used instead of the default one
+DEFAULT_POLICIES = [(r'show\s+version', 3600),
+                    (r'show\s+system', 300),
+                    (r'show\s+(mac|bridge)\s+address-table', 5),
+                    ]
+
+# (pattern, domains) pairs, an entry depends on the state domains of all the
+# patterns found in its commands. Entries not matching any pattern (e.g. the
+# running configuration) depend on every domain.
+DEFAULT_DOMAINS = [(r'show\s+vlan', ('vlan', 'interface')),
+                   (r'show\s+interfaces?', ('interface', 'vlan')),
+                   (r'show\s+(mac|bridge)\s+address-table', ('mac', 'vlan', 'interface')),
+                   (r'show\s+s?ntp', ('ntp', 'clock')),
+                   (r'show\s+clock', ('clock', 'ntp')),
+                   (r'show\s+license', ('license',)),
+                   (r'show\s+(version|system)', ('system',)),
+                   (r'show\s+boot', ('system', 'file')),
+                   (r'^dir', ('file',)),
+                   ]
+ALL_DOMAINS = '*'
 
 
 class CacheMissException(Exception):
@@ -13,28 +41,119 @@ class CacheMissException(Exception):
 
 
 class Cache(object):
-    def __init__(self, enable=True, default_timeout=30):
-        self.cache = {}
+    def __init__(self, enable=True, default_timeout=30, max_entries=1024, max_bytes=16777216, policies=None,
+                 domains=None):
+        self.cache = OrderedDict()
         self.default_timeout = default_timeout
         self.enable = enable
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        if policies is None:
+            policies = DEFAULT_POLICIES
+        self.policies = [(re.compile(pattern), timeout) for pattern, timeout in policies]
+        if domains is None:
+            domains = DEFAULT_DOMAINS
+        self.domains = [(re.compile(pattern), frozenset(tags)) for pattern, tags in domains]
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._next_expire = 0
 
     def get(self, cmd):
         if self.enable:
             k = md5(json.dumps(cmd)).hexdigest()
             if k in self.cache:
-                if self.cache[k][0] > time():
-                    return self.cache[k][1]
-                else:
-                    self.cache.pop(k)
+                entry = self.cache.pop(k)
+                if entry[0] > time():
+                    self.cache[k] = entry
+                    self.hits += 1
+                    return entry[1]
+                self.size -= entry[2]
+                self.expirations += 1
 
+        self.misses += 1
         raise CacheMissException()
 
-    def set(self, cmd, value, timeout=None):
+    def set(self, cmd, value, timeout=None, domains=None):
         if not timeout:
-            timeout = self.default_timeout
+            timeout = self.get_timeout(cmd)
+        if domains is None:
+            domains = self.get_domains(cmd)
 
         k = md5(json.dumps(cmd)).hexdigest()
-        self.cache[k] = (time() + timeout, value)
+        if k in self.cache:
+            self.size -= self.cache.pop(k)[2]
+        self._expire()
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        self.cache[k] = (time() + timeout, value, size, frozenset(domains))
+        self.size += size
+        while len(self.cache) > self.max_entries or self.size > self.max_bytes:
+            self.size -= self.cache.popitem(last=False)[1][2]
+            self.evictions += 1
+
+    def get_timeout(self, cmd):
+        cmds = '\n'.join(self._get_cmds(cmd))
+        for pattern, timeout in self.policies:
+            if pattern.search(cmds):
+                return timeout
+        return self.default_timeout
+
+    def get_domains(self, cmd):
+        ret = set()
+        for c in self._get_cmds(cmd):
+            for pattern, domains in self.domains:
+                if pattern.search(c):
+                    ret |= domains
+        if not ret:
+            ret.add(ALL_DOMAINS)
+        return ret
 
     def flush(self):
-        self.cache = {}
+        self.cache = OrderedDict()
+        self.size = 0
+
+    def invalidate(self, domains):
+        domains = set(domains)
+        if not domains or ALL_DOMAINS in domains:
+            self.flush()
+            return
+        domains.add(ALL_DOMAINS)
+        for k, entry in self.cache.items():
+            if entry[3] & domains:
+                del self.cache[k]
+                self.size -= entry[2]
+                self.invalidations += 1
+
+    def stats(self):
+        self._expire(force=True)
+        return {'entries': len(self.cache),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                }
+
+    def _get_cmds(self, cmd):
+        if isinstance(cmd, dict):
+            cmd = cmd.get('cmds', [])
+        return [c['cmd'] for c in cmd if 'cmd' in c]
+
+    def _expire(self, force=False):
+        # drop expired entries at most once a second, so that commands that are
+        # never read again do not stay in memory until they are evicted
+        now = time()
+        if not force and now < self._next_expire:
+            return
+        self._next_expire = now + 1
+        for k, entry in self.cache.items():
+            if entry[0] <= now:
+                del self.cache[k]
+                self.size -= entry[2]
+                self.expirations += 1
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+
+# headers of the configuration blocks whose lines may not be indented
+BLOCKS = ('interface', 'vlan database', 'router', 'line', 'ip dhcp pool', 'policy-map', 'class-map')
+
+
+class ConfigTree(object):
+    """
+    Running configuration split in a single pass into top level commands and blocks, indexed by first word
+    """
+    def __init__(self, config):
+        self._entries = []
+        self._headers = {}
+        self._lines = {}
+        block = False
+        for line in config.replace('\r', '').split('\n'):
+            stripped = line.strip()
+            if not stripped or stripped == 'end':
+                continue
+            if stripped.startswith('!') or stripped == 'exit':
+                # the terminators stay with the entry before them, the lexers
+                # of the features rely on them to detect the end of a block
+                if self._entries:
+                    self._entries[-1][2].append(line)
+                block = False
+                continue
+            if self._entries and not self._entries[-1][2] and (line[0] in ' \t' or (block and not self._is_block(stripped))):
+                self._lines.setdefault(stripped.split()[0], []).append((len(self._entries) - 1, len(self._entries[-1][1]), line))
+                self._entries[-1][1].append(line)
+                continue
+            block = self._is_block(stripped)
+            self._headers.setdefault(stripped.split()[0], []).append(len(self._entries))
+            self._entries.append([line, [], []])
+
+    def get_text(self, names):
+        # the blocks and commands starting with any of the names, in the order
+        # they have in the configuration and with their original terminators
+        entries = set()
+        lines = []
+        for name in names:
+            first = name.split()[0]
+            entries.update([i for i in self._headers.get(first, []) if self._match(self._entries[i][0], name)])
+            lines += [(i, j, l) for i, j, l in self._lines.get(first, []) if self._match(l, name)]
+
+        out = []
+        for i in sorted(entries):
+            header, body, end = self._entries[i]
+            out.append((i, -1, [header] + body + end))
+        for i, j, line in set(lines):
+            if i not in entries:
+                out.append((i, j, [line]))
+        out.sort()
+        return ''.join(['\n'.join(e[2]) + '\n' for e in out])
+
+    def _is_block(self, line):
+        return any(self._match(line, b) for b in BLOCKS)
+
+    def _match(self, line, name):
+        line = line.strip()
+        return line == name or line.startswith(name + ' ')
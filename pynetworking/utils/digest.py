@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+
+def file_sha256(path, chunk_size=1048576):
+    """
+    Hex sha256 of a local file, read in chunks
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def text_sha256(text):
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return hashlib.sha256(text).hexdigest()
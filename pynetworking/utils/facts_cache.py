@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import gzip
+import json
+from tempfile import NamedTemporaryFile
+from time import time
+
+
+class FactsCache(object):
+    """
+    Facts and running configuration of each host, stored as a compressed json file per host
+    """
+    def __init__(self, directory, ttl=0, tolerance=120):
+        self._directory = directory
+        self._ttl = ttl
+        self._tolerance = tolerance
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def load(self, host):
+        try:
+            with gzip.open(self._get_path(host), 'rb') as f:
+                return json.loads(f.read())
+        except (IOError, ValueError):
+            return None
+
+    def save(self, host, facts, probe, config):
+        snapshot = {'facts': facts, 'probe': probe, 'config': config, 'saved': time()}
+        # write and rename, so that a concurrent reader never sees a partial file
+        with NamedTemporaryFile(dir=self._directory, delete=False) as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode='wb') as f:
+                f.write(json.dumps(snapshot))
+        os.rename(tmp.name, self._get_path(host))
+
+    def is_valid(self, snapshot, probe):
+        if not probe or sorted(snapshot['probe'].keys()) != sorted(probe.keys()):
+            return False
+        for k, v in probe.items():
+            if k == 'boot_time':
+                if abs(snapshot['probe'][k] - v) > self._tolerance:
+                    return False
+            elif snapshot['probe'][k] != v:
+                return False
+        return True
+
+    def is_fresh(self, snapshot):
+        return time() - snapshot['saved'] < self._ttl
+
+    def _get_path(self, host):
+        return os.path.join(self._directory, re.sub('[^\w\.\-]', '_', host) + '.json.gz')
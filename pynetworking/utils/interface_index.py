@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import re
+
+
+def expand_interface_range(ifr):
+    """
+    Interfaces named by a configuration range, e.g. '1.0.1-1.0.3' -> ['1.0.1', '1.0.2', '1.0.3']
+    """
+    m = re.match('^(?P<prefix>\d+\.\d+\.)(?P<start_no>\d+)\-\d+\.\d+\.(?P<end_no>\d+)$', ifr)
+    if m:
+        return ['{0}{1}'.format(m.group('prefix'), n) for n in range(int(m.group('start_no')), 1 + int(m.group('end_no')))]
+    return [ifr]
+
+
+def index_interface_config(config):
+    """
+    Map each interface to the merged configuration of the ranges it belongs to, built once so that the features
+    look an interface up in constant time
+    """
+    index = {}
+    for ifr, ifc in config.items():
+        for ifn in expand_interface_range(str(ifr)):
+            index[ifn] = dict(index.get(ifn, {}).items() + ifc.items())
+    return index
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+
+class LazyArg(object):
+    """
+    Argument of the Device log methods computed by func only when the message is emitted
+    """
+    def __init__(self, func):
+        self._func = func
+
+    def __str__(self):
+        return str(self._func())
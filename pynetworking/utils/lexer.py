@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import ply.lex as lex
+
+
+class Lexer(object):
+    """
+    Base class of the PLY lexers, the tables are built once per class and cloned for each instance
+    """
+    def __init__(self, debug=0):
+        self._debug = debug
+        cls = type(self)
+        if debug:
+            self.lexer = lex.lex(object=self, debug=debug)
+        else:
+            if '_master' not in cls.__dict__:
+                cls._master = lex.lex(object=self)
+            self.lexer = cls._master.clone(self)
+        self.lexer.lexstatestack = []
+
+    def reset(self, data):
+        # clones share the state stack of the master, each scan starts afresh
+        self.lexer.begin('INITIAL')
+        self.lexer.lexstatestack = []
+        self.lexer.lineno = 1
+        self.lexer.input(data)
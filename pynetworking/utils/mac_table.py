@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import re
+from array import array
+from functools import partial
+from itertools import compress, count, imap, izip
+from operator import and_, eq
+
+
+# 48 bit mac addresses fit an unsigned long on LP64 platforms, elsewhere a
+# double keeps them exact as its mantissa has 53 bits
+MAC_TYPECODE = 'L' if array('L').itemsize >= 8 else 'd'
+
+
+def parse_mac(mac):
+    """
+    Integer value of a mac address written with or without dots, colons or dashes
+    """
+    if isinstance(mac, (int, long)):
+        return mac
+    digits = re.sub('[\.:\-]', '', str(mac))
+    if not re.match('^[0-9a-fA-F]{12}$', digits):
+        raise ValueError('{0} is not a valid MAC address'.format(mac))
+    return int(digits, 16)
+
+
+def mac_to_int(mac):
+    return int(mac.replace('.', ''), 16)
+
+
+def int_to_mac(value):
+    mac = '{0:012x}'.format(int(value))
+    return mac[0:4] + '.' + mac[4:8] + '.' + mac[8:12]
+
+
+class MacTable(object):
+    """
+    Mac address table stored by columns: mac addresses as integers, vlans as short integers and interfaces,
+    actions and types as indexes in a table of the distinct values.
+
+    It behaves like the dictionary of the entries keyed by dotted mac address previously used by the mac features.
+    """
+    FIELDS = ('interface', 'action', 'type')
+
+    def __init__(self, entries=()):
+        self._macs = array(MAC_TYPECODE)
+        self._vlans = array('H')
+        self._columns = dict([(f, array('H')) for f in self.FIELDS])
+        self._values = dict([(f, []) for f in self.FIELDS])
+        self._codes = dict([(f, {}) for f in self.FIELDS])
+        self._rows = {}
+        self._column_list = [self._columns[f] for f in self.FIELDS]
+        self._code_maps = [self._codes[f] for f in self.FIELDS]
+        for entry in entries:
+            self.append(*entry)
+
+    def append(self, mac, vlan, interface, action, type):
+        if not isinstance(mac, (int, long)):
+            mac = int(mac.replace('.', ''), 16)
+        values = (interface, action, type)
+        codes = [c[v] if v in c else self._intern(f, v) for f, c, v in zip(self.FIELDS, self._code_maps, values)]
+        row = self._rows.get(mac)
+        if row is not None:
+            # a mac already listed keeps its position and takes the new values
+            self._vlans[row] = int(vlan)
+            for col, c in zip(self._column_list, codes):
+                col[row] = c
+            return
+        self._rows[mac] = len(self._macs)
+        self._macs.append(mac)
+        self._vlans.append(int(vlan))
+        for col, c in zip(self._column_list, codes):
+            col.append(c)
+
+    def filter(self, vlan=None, interface=None, action=None, type=None):
+        # one boolean selector per condition, computed over the whole column
+        selectors = []
+        if vlan is not None:
+            selectors.append(map(partial(eq, int(vlan)), self._vlans))
+        for f, v in zip(self.FIELDS, (interface, action, type)):
+            if v is not None:
+                # compare the small integer codes rather than the strings
+                code = self._codes[f].get(v, -1)
+                selectors.append(map(partial(eq, code), self._columns[f]))
+        if not selectors:
+            selected = [True] * len(self._macs)
+        else:
+            selected = reduce(lambda a, b: map(and_, a, b), selectors)
+        return self._select(selected)
+
+    def _select(self, selected):
+        ret = MacTable()
+        ret._macs = array(MAC_TYPECODE, compress(self._macs, selected))
+        ret._vlans = array('H', compress(self._vlans, selected))
+        for f in self.FIELDS:
+            ret._columns[f] = array('H', compress(self._columns[f], selected))
+            ret._values[f] = list(self._values[f])
+            ret._codes[f] = dict(self._codes[f])
+        ret._rows = dict(izip(imap(int, ret._macs), count()))
+        ret._column_list = [ret._columns[f] for f in self.FIELDS]
+        ret._code_maps = [ret._codes[f] for f in self.FIELDS]
+        return ret
+
+    def rows(self):
+        # (mac, vlan, interface, action, type) with mac and vlan as integers
+        for r in xrange(len(self._macs)):
+            yield (int(self._macs[r]), self._vlans[r]) + tuple([self._values[f][self._columns[f][r]] for f in self.FIELDS])
+
+    def keys(self):
+        return [int_to_mac(m) for m in self._macs]
+
+    def values(self):
+        return [self._entry(r) for r in xrange(len(self._macs))]
+
+    def items(self):
+        return [(int_to_mac(self._macs[r]), self._entry(r)) for r in xrange(len(self._macs))]
+
+    def __iter__(self):
+        for m in self._macs:
+            yield int_to_mac(m)
+
+    def __len__(self):
+        return len(self._macs)
+
+    def __contains__(self, mac):
+        try:
+            return mac_to_int(mac) in self._rows
+        except (AttributeError, ValueError):
+            return False
+
+    def __getitem__(self, mac):
+        try:
+            return self._entry(self._rows[mac_to_int(mac)])
+        except (AttributeError, ValueError):
+            raise KeyError(mac)
+
+    def _entry(self, row):
+        entry = {'vlan': str(self._vlans[row])}
+        for f in self.FIELDS:
+            entry[f] = self._values[f][self._columns[f][row]]
+        return entry
+
+    def _intern(self, field, value):
+        codes = self._codes[field]
+        if value not in codes:
+            codes[value] = len(self._values[field])
+            self._values[field].append(value)
+        return codes[value]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover
+    from ordereddict import OrderedDict
+from pynetworking.utils.vlan_set import VlanSet
+
+
+class VlanBatch(object):
+    """
+    Vlan changes accumulated by the vlan features and sent to the device in a single configuration session
+    """
+    def __init__(self):
+        # vlan id -> creation options
+        self.created = OrderedDict()
+        self.deleted = []
+        # interface -> list of [command template, VlanSet]
+        self.interfaces = OrderedDict()
+        # switchport mode of the interfaces changed by the batch
+        self.modes = {}
+        # (vlan id, interface) -> tagged for the memberships added by the
+        # batch, None for the ones removed
+        self.members = {}
+
+    def __len__(self):
+        return len(self.created) + len(self.deleted) + len(self.interfaces)
+
+    def create(self, vlan_ids, **kwargs):
+        for vid in vlan_ids:
+            if vid in self.deleted:
+                self.deleted.remove(vid)
+            self.created.setdefault(vid, {}).update(kwargs)
+
+    def delete(self, vlan_ids, existing=None):
+        # deleting a vlan created by the same batch just drops the creation
+        for vid in vlan_ids:
+            if vid in self.created:
+                del self.created[vid]
+            if (existing is None or vid in existing) and vid not in self.deleted:
+                self.deleted.append(vid)
+
+    def exists(self, vid):
+        return int(vid) in self.created
+
+    def add_member(self, vid, ifn, tagged):
+        self.members[(str(vid), ifn)] = tagged
+
+    def remove_member(self, vid, ifn, tagged):
+        # return whether the interface belongs to the vlan as tagged, False if
+        # untagged and None if not at all, given tagged as the device state
+        key = (str(vid), ifn)
+        if key in self.members:
+            tagged = self.members[key]
+        self.members[key] = None
+        return tagged
+
+    def add_interface_cmd(self, ifn, template, vid=None):
+        ops = self.interfaces.setdefault(ifn, [])
+        if vid is not None and ops and ops[-1][0] == template and ' allowed ' in template:
+            # consecutive trunk changes are merged in a single range command
+            ops[-1][1].add(vid)
+        else:
+            ops.append([template, VlanSet(vid)])
+
+    def create_groups(self, key):
+        # the created vlans grouped by the value returned by key(vid, options),
+        # so that vlans sharing the same options are created by a range command
+        groups = OrderedDict()
+        for vid, opts in self.created.items():
+            groups.setdefault(key(vid, opts), []).append(vid)
+        return [(k, str(VlanSet(v))) for k, v in groups.items()]
+
+    def interface_cmds(self, ifn):
+        return [t.format(ids) if ids else t for t, ids in self.interfaces[ifn]]
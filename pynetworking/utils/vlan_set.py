@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import re
+from bisect import bisect_left, bisect_right
+
+
+class VlanSet(object):
+    """
+    Set of vlan ids stored as sorted, non overlapping intervals.
+
+    It is built from a vlan id, a string in the device range syntax (e.g. '10-20,30') or an iterable of them,
+    and converted back to the range syntax by str().
+    """
+    def __init__(self, vlan_ids=None):
+        self._starts = []
+        self._ends = []
+        if vlan_ids is None:
+            return
+        if isinstance(vlan_ids, VlanSet):
+            self._starts = list(vlan_ids._starts)
+            self._ends = list(vlan_ids._ends)
+            return
+        if isinstance(vlan_ids, (int, long, basestring)):
+            vlan_ids = [vlan_ids]
+        intervals = []
+        for v in vlan_ids:
+            if isinstance(v, VlanSet):
+                intervals += v.intervals()
+            elif isinstance(v, basestring):
+                intervals += self._parse(v)
+            else:
+                intervals.append((int(v), int(v)))
+        self._set(intervals)
+
+    def intervals(self):
+        return zip(self._starts, self._ends)
+
+    def add(self, vid):
+        vid = int(vid)
+        if vid in self:
+            return
+        i = bisect_left(self._starts, vid)
+        if i > 0 and self._ends[i - 1] == vid - 1:
+            self._ends[i - 1] = vid
+            if i < len(self._starts) and self._starts[i] == vid + 1:
+                self._ends[i - 1] = self._ends[i]
+                del self._starts[i]
+                del self._ends[i]
+        elif i < len(self._starts) and self._starts[i] == vid + 1:
+            self._starts[i] = vid
+        else:
+            self._starts.insert(i, vid)
+            self._ends.insert(i, vid)
+
+    def union(self, other):
+        return VlanSet([self, VlanSet(other)])
+
+    def difference(self, other):
+        other = VlanSet(other)
+        intervals = []
+        j = 0
+        for start, end in self.intervals():
+            while j < len(other._starts) and other._ends[j] < start:
+                j += 1
+            k = j
+            while start <= end and k < len(other._starts) and other._starts[k] <= end:
+                if other._starts[k] > start:
+                    intervals.append((start, other._starts[k] - 1))
+                start = max(start, other._ends[k] + 1)
+                k += 1
+            if start <= end:
+                intervals.append((start, end))
+        ret = VlanSet()
+        ret._set(intervals)
+        return ret
+
+    __or__ = union
+    __sub__ = difference
+
+    def __contains__(self, vid):
+        try:
+            vid = int(vid)
+        except (TypeError, ValueError):
+            return False
+        i = bisect_right(self._starts, vid) - 1
+        return i >= 0 and vid <= self._ends[i]
+
+    def __iter__(self):
+        for start, end in self.intervals():
+            for vid in xrange(start, end + 1):
+                yield vid
+
+    def __len__(self):
+        return sum([e - s + 1 for s, e in self.intervals()])
+
+    def __eq__(self, other):
+        return isinstance(other, VlanSet) and self.intervals() == other.intervals()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return ','.join([str(s) if s == e else '{0}-{1}'.format(s, e) for s, e in self.intervals()])
+
+    def __repr__(self):
+        return "VlanSet('{0}')".format(self)
+
+    def _set(self, intervals):
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(intervals):
+            if self._ends and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def _parse(self, text):
+        intervals = []
+        for r in text.split(','):
+            m = re.match('^\s*(?P<start>\d+)\s*(\-\s*(?P<end>\d+)\s*)?$', r)
+            if not m or (m.group('end') and int(m.group('start')) > int(m.group('end'))):
+                raise ValueError('{0} is not a valid vlan id, range or list'.format(text))
+            intervals.append((int(m.group('start')), int(m.group('end') or m.group('start'))))
+        return intervals
@@ -159,7 +159,7 @@ setup(name='py-networking',
                         'pyasn1',
                         'pyzmq>=14.0.0',
                         'ordereddict',
-                        'TFTPy',
+                        'TFTPy>=0.8.0',
                         'pytz',
                         'pycrypto',
                         'ecdsa'
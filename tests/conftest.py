@@ -303,6 +303,20 @@ def pytest_addoption(parser):
     parser.addoption("--log", default='notset', action="store", help="show log messages")
     parser.addoption("--dut-host", default='127.0.0.1', action="store", help="dut hostname or address")
     parser.addoption("--mock", default='notset', action="store", help="type y or yes to use mock")
+    parser.addoption("--benchmark", default=False, action="store_true", help="run the benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: performance measurement, run only with --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, use --benchmark to run it")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture(scope="module")
@@ -0,0 +1,329 @@
+import re
+import os
+import sys
+import json
+import pytest
+import urllib2
+import threading
+import zmq
+import inspect
+import logging
+import ply.lex as lex
+from mock import MagicMock, patch
+from pynetworking.Device import Device
+from pynetworking.Proxy import _get_reply
+from pynetworking.features.awp_vlan_status_lexer import VlanStatusLexer
+from pynetworking.features.awp_interface_status_lexer import InterfaceStatusLexer
+from pynetworking.features.awp_mac import awp_mac
+from pynetworking.features.awp_file import Server, HTTPHandler
+from pynetworking.utils.mac_table import MacTable
+from pynetworking.Locator import MacLocator
+from time import time
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover
+    from ordereddict import OrderedDict
+
+pytestmark = pytest.mark.benchmark
+
+
+def setup_dut(dut):
+    dut.reset()
+    dut.add_cmd({'cmd': 'show version', 'state': -1, 'action': 'PRINT', 'args': ["""
+AlliedWare Plus (TM) 5.4.2 09/25/13 12:57:26
+
+Build name : x600-5.4.2-3.14.rel
+Build date : Wed Sep 25 12:57:26 NZST 2013
+Build type : RELEASE
+    """]})
+
+
+def _bench(name, func, loops):
+    start = time()
+    for i in range(loops):
+        func()
+    elapsed = time() - start
+    print "{0:40} {1:6} loops {2:10.3f} ms/loop".format(name, loops, elapsed * 1000 / loops)
+    return elapsed / loops
+
+
+def test_proxy_channel(dut, log_level, use_mock):
+    setup_dut(dut)
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    ping = {'cmds': [{'cmd': '_ping', 'prompt': ''}]}
+
+    def per_call_channel():
+        # the channel setup done for every command before the persistent channel
+        context = zmq.Context()
+        skt = context.socket(zmq.REQ)
+        skt.setsockopt(zmq.LINGER, 1000)
+        skt.connect(d._proxy_url)
+        skt.send_string(json.dumps(ping), zmq.NOBLOCK)
+        poller = zmq.Poller()
+        poller.register(skt, zmq.POLLIN)
+        assert len(poller.poll(12000)) == 1
+        assert json.loads(skt.recv(zmq.NOBLOCK))['output'] == 'pong'
+        skt.close()
+        context.term()
+
+    def persistent_channel():
+        d._open_channel()
+        d._proxy_skt.send_string(json.dumps(ping), zmq.NOBLOCK)
+        assert len(d._proxy_poller.poll(12000)) == 1
+        assert json.loads(d._proxy_skt.recv(zmq.NOBLOCK))['output'] == 'pong'
+
+    before = _bench('ping with per call channel', per_call_channel, 200)
+    after = _bench('ping with persistent channel', persistent_channel, 200)
+    print "per command overhead saved {0:.3f} ms".format((before - after) * 1000)
+    d.close()
+    assert d._proxy_skt is None
+    assert d._proxy_ctx is None
+
+
+class FakeChannel(object):
+    def __init__(self, data):
+        self._data = data
+        self._pos = 0
+
+    def recv(self, size):
+        ret = self._data[self._pos:self._pos + size]
+        self._pos += size
+        return ret
+
+
+def _synthetic_output(size):
+    lines = []
+    length = 0
+    while length < size:
+        lines.append('interface port1.0.{0}\n switchport\n switchport mode access\n description "uplink {0}"\n!\n'.format(len(lines)))
+        length += len(lines[-1])
+    return 'show running-config\n' + ''.join(lines) + 'end\nawplus#'
+
+
+def test_get_reply():
+    device = MagicMock()
+
+    def whole_buffer_search(chan, prompt):
+        # the reply collection done before the incremental prompt matching
+        prompt = '[\n\r]\w*' + prompt
+        buff = ''
+        while True:
+            buff += chan.recv(999)
+            if re.search(prompt, buff):
+                break
+        return '\n'.join(buff.split('\n')[1:-1])
+
+    for size in (1, 4, 16):
+        data = _synthetic_output(size * 1048576)
+        expected = '\n'.join(data.split('\n')[1:-1])
+        if size == 1:
+            _bench('whole buffer search {0} MB'.format(size), lambda: whole_buffer_search(FakeChannel(data), '\#'), 1)
+        elapsed = _bench('incremental search {0} MB'.format(size), lambda: _get_reply(device, FakeChannel(data), '\#'), 3)
+        print "{0:40} {1:10.1f} MB/s".format('incremental search throughput', size / elapsed)
+        assert _get_reply(device, FakeChannel(data), '\#') == expected
+
+
+def _vlan_outputs(count):
+    config = ['!', 'vlan database']
+    status = ['VLAN ID  Name            Type    State   Member ports',
+              '                                         (u)-Untagged, (t)-Tagged',
+              '======= ================ ======= ======= ====================================']
+    for vid in range(2, count + 2):
+        config.append('vlan {0} name vlan{0} state enable'.format(vid))
+        status.append('{0:<8} {1:<15} STATIC  ACTIVE  port1.0.{2}(u) port1.0.{3}(t)'.format(vid, 'vlan{0}'.format(vid), vid % 48 + 1, (vid + 1) % 48 + 1))
+    config += ['!', 'end']
+    return '\n'.join(config), '\n'.join(status)
+
+
+def test_logging_off(dut, use_mock):
+    setup_dut(dut)
+    config, status = _vlan_outputs(200)
+    dut.add_cmd({'cmd': 'show running-config', 'state': -1, 'action': 'PRINT', 'args': [config]})
+    dut.add_cmd({'cmd': 'show vlan all', 'state': -1, 'action': 'PRINT', 'args': [status]})
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level='NOTSET', mock=use_mock)
+    d.open()
+
+    def inspecting_logger(self, level, msg, args):
+        # the frame inspection done for every message before the level check
+        (frame, filename, lineno, function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[2]
+        if args:
+            msg = msg.format(*args)
+        msg = '{0:30} [{1:3}] {2}'.format(filename.split('pynetworking/')[1], lineno, msg)
+        if self._log_level != 0:
+            logging.getLogger(self._host).log(level, msg)
+
+    items = lambda: len(d.vlan.items()) == 200
+    with patch.object(Device, '_logger', inspecting_logger):
+        before = _bench('vlan.items() inspecting frames', items, 20)
+    after = _bench('vlan.items() with logging off', items, 20)
+    print "logging overhead saved {0:.3f} ms".format((before - after) * 1000)
+    assert len(d.vlan.items()) == 200
+    d.close()
+
+
+def _interface_output(count):
+    template = """
+Interface {0}
+  Scope: both
+  Link is UP, administrative state is UP
+  Hardware is Ethernet, address is 0015.77ea.17e5
+  index 5001 metric 1 mru 1500
+  current duplex full, current speed 1000, current polarity mdix
+  configured duplex auto, configured speed auto, configured polarity auto
+  <UP,BROADCAST,RUNNING,MULTICAST>
+  SNMP link-status traps: Disabled
+    input packets 3082, bytes 327520, dropped 0, multicast packets 466
+    output packets 656, bytes 176318, multicast packets 252 broadcast packets 4
+  Time since last state change: 0 days 00:08:18
+"""
+    return ''.join([template.format('port{0}.0.{1}'.format(i / 50 + 1, i % 50 + 1)) for i in range(count)])
+
+
+def test_lexer_tables():
+    vlan_output = _vlan_outputs(4094)[1]
+    interface_output = _interface_output(400)
+
+    for cls, output, items in ((VlanStatusLexer, vlan_output, 4094), (InterfaceStatusLexer, interface_output, 400)):
+        def rebuild_tables():
+            # the table build done for every lexer before the per class tables
+            l = cls()
+            l.lexer = lex.lex(object=l)
+            return l
+
+        name = cls.__name__
+        before = _bench('{0} build tables'.format(name), rebuild_tables, 20)
+        after = _bench('{0} clone tables'.format(name), cls, 20)
+        print "{0:40} {1:10.3f} ms".format('construction time saved', (before - after) * 1000)
+        l = cls()
+        elapsed = _bench('{0} run'.format(name), lambda: l.run(output), 3)
+        print "{0:40} {1:10.1f} items/s".format('{0} throughput'.format(name), items / elapsed)
+        assert len(l.run(output)) == items
+        assert l.run(output) == cls().run(output)
+
+
+def _mac_output(count):
+    lines = ['VLAN port             mac            fwd']
+    for i in range(count):
+        mac = '{0:012x}'.format(0x001577000000 + i)
+        lines.append('{0:<4} port1.0.{1:<4} {2}.{3}.{4}   forward   dynamic'.format(i % 4094 + 1, i % 50 + 1, mac[0:4], mac[4:8], mac[8:12]))
+    return '\n'.join(lines)
+
+
+def test_mac_table():
+    output = _mac_output(32000)
+    mac = awp_mac(MagicMock())
+
+    def line_split():
+        # the parsing done before the streaming parser and the compact table
+        ret = OrderedDict()
+        ifre = re.compile('(?P<vlan>\d+)\s+(?P<interface>[^\s]+)\s+(?P<mac>[^\s]+)\s+(?P<action>[^\s]+)\s+(?P<type>[^\s]+)')
+        for line in output.split('\n'):
+            m = ifre.match(line)
+            if m:
+                ret[m.group('mac')] = {'vlan': m.group('vlan'), 'interface': m.group('interface'),
+                                       'action': m.group('action'), 'type': m.group('type')}
+        return ret
+
+    _bench('mac line split', line_split, 3)
+    _bench('mac compact table', lambda: MacTable(mac._parse_mac(output)), 3)
+    table = MacTable(mac._parse_mac(output))
+    entries = line_split()
+    assert table.items() == entries.items()
+    before = sys.getsizeof(entries) + sum([sys.getsizeof(k) + sys.getsizeof(v) for k, v in entries.items()])
+    after = sum([sys.getsizeof(c) for c in [table._macs, table._vlans] + table._column_list]) + sys.getsizeof(table._rows)
+    print "{0:40} {1:10} KB -> {2} KB".format('mac table memory', before / 1024, after / 1024)
+    assert after < before
+    _bench('mac filter by vlan', lambda: table.filter(vlan=10), 3)
+    assert len(table.filter(vlan=10, interface='port1.0.10')) == len([e for e in table.values() if e['vlan'] == '10' and e['interface'] == 'port1.0.10'])
+
+
+def test_mac_locator():
+    locator = MacLocator(None)
+    start = time()
+    for host in range(4):
+        table = MacTable([(0x001577000000 + i, i % 4094 + 1, 'port1.0.{0}'.format(i % 50 + 1), 'forward', 'dynamic')
+                          for i in range(host * 50000, host * 50000 + 100000)])
+        locator._update('10.0.0.{0}'.format(host), table, time())
+    print "{0:40} {1:10.3f} s".format('mac locator index 400k entries', time() - start)
+    assert len(locator) == 250000
+    elapsed = _bench('mac locator locate', lambda: locator.locate('0015.7700.c350'), 1000)
+    assert len(locator.locate('0015.7700.c350')) == 2
+    assert elapsed < 0.001
+
+
+def _rss():
+    # resident set size of the process in KB
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+def test_http_file_server(tmpdir):
+    if not os.path.exists('/proc/self/status'):
+        pytest.skip("needs /proc to read the resident set size")
+    size = 32 * 1048576
+    clients = 8
+    filename = str(tmpdir.join('image.rel'))
+    with open(filename, 'wb') as f:
+        for i in range(size / 1048576):
+            f.write(os.urandom(1048576))
+
+    class ReadAllHandler(HTTPHandler):
+        # the handler before the chunked transfer
+        def do_GET(self):
+            with open(os.path.abspath(self.server.filename), 'rb') as f:
+                self.send_response(200)
+                self.send_header('Content-type', 'application/octet-string')
+                self.end_headers()
+                self.wfile.write(f.read())
+
+    def serve(handler):
+        server = Server(("", 0), handler, MagicMock(), filename)
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        url = 'http://127.0.0.1:{0}/{1}'.format(server.server_address[1], filename)
+        received = []
+
+        def client():
+            response = urllib2.urlopen(url)
+            count = 0
+            while True:
+                chunk = response.read(65536)
+                if not chunk:
+                    break
+                count += len(chunk)
+            received.append(count)
+
+        baseline = _rss()
+        peak = [baseline]
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                peak[0] = max(peak[0], _rss())
+                done.wait(0.01)
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        start = time()
+        threads = [threading.Thread(target=client) for i in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time() - start
+        done.set()
+        sampler.join()
+        server.shutdown()
+        server.server_close()
+        assert received == [size] * clients
+        return elapsed, peak[0] - baseline
+
+    chunked_time, chunked_rss = serve(HTTPHandler)
+    whole_time, whole_rss = serve(ReadAllHandler)
+    for name, elapsed, rss in [('http whole file', whole_time, whole_rss), ('http chunked', chunked_time, chunked_rss)]:
+        print "{0:40} {1:3} clients {2:8.1f} MB/s {3:8} KB peak rss".format(name, clients, size * clients / elapsed / 1048576, rss)
+    assert chunked_rss < whole_rss
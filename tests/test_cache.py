@@ -43,3 +43,82 @@ def test_cache3():
     c.set(cmds2, cmd_output2)
     assert cmd_output1 == c.get(cmds1)
     assert cmd_output2 == c.get(cmds2)
+
+
+def test_lru():
+    c = Cache(max_entries=2)
+    cmds = [{'cmds': [{'cmd': 'show vlan {0}'.format(i), 'prompt': '\#'}]} for i in range(3)]
+    c.set(cmds[0], 'output 0')
+    c.set(cmds[1], 'output 1')
+    assert c.get(cmds[0]) == 'output 0'
+    c.set(cmds[2], 'output 2')
+    assert c.get(cmds[0]) == 'output 0'
+    assert c.get(cmds[2]) == 'output 2'
+    with pytest.raises(CacheMissException):
+        c.get(cmds[1])
+    stats = c.stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+
+
+def test_max_bytes():
+    c = Cache(max_bytes=10)
+    cmds1 = {'cmds': [{'cmd': 'show vlan', 'prompt': '\#'}]}
+    cmds2 = {'cmds': [{'cmd': 'show interface', 'prompt': '\#'}]}
+    c.set(cmds1, '123456')
+    c.set(cmds2, '123456')
+    assert c.stats()['bytes'] == 6
+    with pytest.raises(CacheMissException):
+        c.get(cmds1)
+    assert c.get(cmds2) == '123456'
+    c.set(cmds1, '12345678901')
+    with pytest.raises(CacheMissException):
+        c.get(cmds1)
+    c.set(cmds2, '1234')
+    assert c.stats()['bytes'] == 4
+    c.flush()
+    assert c.stats()['bytes'] == 0
+
+
+def test_policies():
+    c = Cache(default_timeout=30, policies=[(r'show\s+version', 3600), (r'show\s+mac', 1)])
+    version = {'cmds': [{'cmd': 'terminal length 0', 'prompt': '\#'}, {'cmd': 'show version', 'prompt': '\#'}]}
+    mac = {'cmds': [{'cmd': 'show mac address-table', 'prompt': '\#'}]}
+    vlan = {'cmds': [{'cmd': 'show vlan', 'prompt': '\#'}]}
+    assert c.get_timeout(version) == 3600
+    assert c.get_timeout(mac['cmds']) == 1
+    assert c.get_timeout(vlan) == 30
+    c.set(mac, 'mac output')
+    c.set(vlan, 'vlan output')
+    sleep(1.5)
+    assert c.stats() == {'entries': 1, 'bytes': 11, 'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 1, 'invalidations': 0}
+    assert c.get(vlan) == 'vlan output'
+
+
+def test_invalidate():
+    c = Cache()
+    version = {'cmds': [{'cmd': 'terminal length 0', 'prompt': '\#'}, {'cmd': 'show version', 'prompt': '\#'}]}
+    vlan = {'cmds': [{'cmd': 'show vlan all', 'prompt': '\#'}]}
+    mac = {'cmds': [{'cmd': 'show mac address-table', 'prompt': '\#'}]}
+    config = {'cmds': [{'cmd': 'show running-config', 'prompt': '\#'}]}
+    assert c.get_domains(version) == set(['system'])
+    assert c.get_domains(mac) == set(['mac', 'vlan', 'interface'])
+    assert c.get_domains(config) == set(['*'])
+    for cmds in (version, vlan, mac, config):
+        c.set(cmds, 'output')
+    c.invalidate(['mac'])
+    assert c.get(version) == 'output'
+    assert c.get(vlan) == 'output'
+    for cmds in (mac, config):
+        with pytest.raises(CacheMissException):
+            c.get(cmds)
+    c.set(mac, 'output', domains=['mac'])
+    c.invalidate(['vlan'])
+    assert c.get(mac) == 'output'
+    with pytest.raises(CacheMissException):
+        c.get(vlan)
+    assert c.stats()['invalidations'] == 3
+    c.invalidate(['*'])
+    assert c.stats()['entries'] == 0
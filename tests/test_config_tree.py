@@ -0,0 +1,59 @@
+from pynetworking.utils.config_tree import ConfigTree
+
+
+def test_awp_sections():
+    config = """!
+hostname awplus
+!
+interface port1.0.1-1.0.50
+ switchport
+ switchport mode access
+!
+interface vlan 1
+ip address 10.17.39.253 255.255.255.0
+exit
+!
+mac address-table static 0000.cd1d.7eb0 forward interface port1.0.4 vlan 1
+vlan database
+ vlan 10 name admin state enable
+!
+ntp peer ntp.inrim.it
+!
+end
+"""
+    t = ConfigTree(config)
+    assert t.get_text(['interface']) == """interface port1.0.1-1.0.50
+ switchport
+ switchport mode access
+!
+interface vlan 1
+ip address 10.17.39.253 255.255.255.0
+exit
+!
+"""
+    assert t.get_text(['vlan database']) == 'vlan database\n vlan 10 name admin state enable\n!\n'
+    assert t.get_text(['mac address-table']) == 'mac address-table static 0000.cd1d.7eb0 forward interface port1.0.4 vlan 1\n'
+    assert t.get_text(['ntp', 'hostname']) == 'hostname awplus\n!\nntp peer ntp.inrim.it\n!\n'
+    assert t.get_text(['router']) == ''
+
+
+def test_ats_sections():
+    config = """interface range ethernet 1/e(1-2)
+switchport mode trunk
+exit
+interface ethernet 1/e3
+description test
+exit
+interface vlan 1
+bridge address 00:00:cd:24:04:8b ethernet 1/e1
+exit
+vlan database
+vlan 10,20
+exit
+sntp server 83.64.124.251
+"""
+    t = ConfigTree(config)
+    assert t.get_text(['interface vlan']) == 'interface vlan 1\nbridge address 00:00:cd:24:04:8b ethernet 1/e1\nexit\n'
+    assert t.get_text(['vlan database', 'sntp']) == 'vlan database\nvlan 10,20\nexit\nsntp server 83.64.124.251\n'
+    assert t.get_text(['interface']).count('exit') == 3
+    assert t.get_text(['bridge address']) == 'bridge address 00:00:cd:24:04:8b ethernet 1/e1\n'
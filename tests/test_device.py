@@ -1,9 +1,15 @@
 import pytest
 import os
 import socket
+from pynetworking import Fleet
 from pynetworking.Device import Device, DeviceException
+from pynetworking.Proxy import SharedProxy
+from pynetworking.utils.facts_cache import FactsCache
+from mock import patch
+from multiprocessing import Process
 from time import sleep
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, mkdtemp
+from shutil import rmtree
 
 
 def setup_dut(dut):
@@ -150,6 +156,25 @@ def test_facts(dut, log_level, use_mock):
     d.close()
 
 
+def test_cache_stats(dut, log_level, use_mock):
+    setup_dut(dut)
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    stats = d.cmd({'cmds': [{'cmd': '__cache_stats', 'prompt': ''}]})
+    d.cmd('show version')
+    d.cmd('show version')
+    after = d.cmd({'cmds': [{'cmd': '__cache_stats', 'prompt': ''}]})
+    assert after['hits'] == stats['hits'] + 1
+    assert after['misses'] == stats['misses'] + 1
+    assert after['entries'] == stats['entries'] + 1
+    d.cmd('show version', use_cache=False, flush_cache=['mac'])
+    d.cmd('show version')
+    assert d.cmd({'cmds': [{'cmd': '__cache_stats', 'prompt': ''}]})['hits'] == after['hits'] + 1
+    d.cmd({'cmds': [{'cmd': '__flush_cache', 'prompt': ''}]})
+    assert d.cmd({'cmds': [{'cmd': '__cache_stats', 'prompt': ''}]})['entries'] == 0
+    d.close()
+
+
 def test_config(dut, log_level, use_mock):
     if dut.mode != 'emulated':
         pytest.skip("only on emulated")
@@ -209,6 +234,28 @@ end
     d.close()
 
 
+def test_lazy_features(dut, log_level, use_mock):
+    setup_dut(dut)
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    assert 'vlan' not in d._features
+    assert d.vlan is d._features['vlan']
+    with pytest.raises(AttributeError):
+        d.dhcp
+    # a feature whose configuration cannot be loaded is not registered
+    with patch('pynetworking.features.awp_interface.awp_interface.load_config', side_effect=ValueError('bad config')):
+        with pytest.raises(ValueError):
+            d.interface
+    assert 'interface' not in d._features
+    assert d.interface is d._features['interface']
+    d.close()
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open(features=['vlan'])
+    assert d._features.keys() == ['vlan']
+    d.close()
+
+
 def test_system(dut, log_level, use_mock):
     if dut.mode != 'emulated':
         pytest.skip("only on emulated")
@@ -627,6 +674,76 @@ Build type : RELEASE
     clean_test_firmware_upgrade(dut, release_file)
 
 
+def test_facts_cache(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    cache_dir = mkdtemp()
+    setup_dut(dut)
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, facts_cache=cache_dir)
+    d.open()
+    assert d.facts['version'] == '5.4.2'
+    d.close()
+    assert os.path.exists(os.path.join(cache_dir, '{0}.json.gz'.format(dut.host)))
+    snapshot = FactsCache(cache_dir).load(dut.host)
+    assert FactsCache(cache_dir).is_fresh(snapshot) is False
+    assert FactsCache(cache_dir, ttl=3600).is_fresh(snapshot) is True
+
+    dut.reset()
+    dut.add_cmd({'cmd': 'show version', 'state': -1, 'action': 'PRINT', 'args': ["""
+AlliedWare Plus (TM) 5.4.4 09/25/13 12:57:26
+    """]})
+    dut.add_cmd({'cmd': 'show system', 'state': -1, 'action': 'PRINT', 'args': ["""
+Uptime             : 0 days 00:07:31
+Current software   : x600-5.4.2-3.14.rel
+"""]})
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, facts_cache=cache_dir)
+    d.open()
+    assert d.facts['version'] == '5.4.2'
+    d.close()
+
+    dut.reset()
+    dut.add_cmd({'cmd': 'show version', 'state': -1, 'action': 'PRINT', 'args': ["""
+AlliedWare Plus (TM) 5.4.4 09/25/13 12:57:26
+    """]})
+    dut.add_cmd({'cmd': 'show system', 'state': -1, 'action': 'PRINT', 'args': ["""
+Uptime             : 0 days 00:00:12
+Current software   : x600-5.4.4-1.1.rel
+"""]})
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, facts_cache=cache_dir)
+    d.open()
+    assert d.facts['version'] == '5.4.4'
+    d.close()
+    rmtree(cache_dir)
+
+
+def test_shared_proxy(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    setup_dut(dut)
+    url = 'ipc://{0}'.format(NamedTemporaryFile().name)
+    proxy = Process(target=SharedProxy, args=(url, log_level))
+    proxy.start()
+    try:
+        f = Fleet(['127.0.0.1', 'localhost'], port=dut.port, protocol=dut.protocol, log_level=log_level, proxy_url=url)
+        for r in f.run('facts'):
+            assert r.error is None
+            assert r.output['build_name'] == 'x600-5.4.2-3.14.rel'
+        for r in f.run('ping'):
+            assert r.output is True
+        assert f['localhost']._proxy is None
+        assert f['localhost']._proxy_session is True
+        f.close()
+
+        d = Device(host=dut.host, port=2323, protocol=dut.protocol, log_level=log_level, proxy_url=url)
+        with pytest.raises(DeviceException) as excinfo:
+            d.open()
+        assert str(excinfo.value).startswith("cannot connect to") is True
+        d.close()
+    finally:
+        proxy.terminate()
+        proxy.join()
+
+
 def test_ping2(dut, log_level, use_mock):
     setup_dut(dut)
     d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
@@ -1,7 +1,11 @@
 import pytest
 import os
 import socket
+import urllib2
+import threading
+from mock import MagicMock, patch
 from pynetworking.Device import Device
+from pynetworking.features.awp_file import Server, HTTPHandler
 
 
 def setup_dut(dut):
@@ -639,3 +643,106 @@ def test_remove_files(dut, log_level, use_mock):
 
 def test_clean(dut, log_level, use_mock):
     os.remove('test_file_0.cfg')
+
+
+def test_sync(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    content_1 = "!\nhostname sync-1\n!\nend\n"
+    content_2 = "!\nhostname sync-2\n!\nend\n"
+    content_3 = "!\nhostname sync-3\n!\nservice ssh\n!\nend\n"
+    dir_line = "      {0} -rw- Jun 16 2014 15:15:{1:02}  test_sync.cfg\n"
+    dir_0 = ["""
+      588 -rw- Apr 10 2014 08:10:02  default.cfg
+"""]
+    dir_1 = [dir_0[0] + dir_line.format(len(content_1), 1)]
+    dir_2 = [dir_0[0] + dir_line.format(len(content_2), 2)]
+    dir_3 = [dir_0[0] + dir_line.format(len(content_3), 3)]
+    setup_dut(dut)
+    for state, output in enumerate([dir_0, dir_1, dir_2, dir_3]):
+        dut.add_cmd({'cmd': 'dir', 'state': state, 'action': 'PRINT', 'args': output})
+    for state in range(3):
+        dut.add_cmd({'cmd': 'copy http://', 'state': state, 'action': 'SET_STATE', 'args': [state + 1]})
+    dut.add_cmd({'cmd': 'show file test_sync.cfg', 'state': 1, 'action': 'PRINT', 'args': [content_1]})
+    dut.add_cmd({'cmd': 'show file test_sync.cfg', 'state': 2, 'action': 'PRINT', 'args': [content_2]})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    with pytest.raises(KeyError) as excinfo:
+        d.file.sync('test_sync.cfg', text=content_1, filename='default.cfg')
+    assert 'cannot have both host file name and host string not empty' in excinfo.value
+    assert d.file.sync('test_sync.cfg', text=content_1) is True
+    assert 'test_sync.cfg' in d.file.keys()
+
+    read_back = lambda cmd: [a for a in cmd.call_args_list if a[0][0] == 'show file test_sync.cfg']
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        # the digest recorded by the copy is trusted while the file is unchanged on the device
+        assert d.file.sync('test_sync.cfg', text=content_1) is False
+        assert len(read_back(cmd)) == 0
+        d.file._digests.clear()
+        assert d.file.sync('test_sync.cfg', text=content_1) is False
+        assert len(read_back(cmd)) == 1
+    # same size, different content
+    assert d.file.sync('test_sync.cfg', text=content_2) is True
+    assert d.file['test_sync.cfg']['size'] == str(len(content_2))
+    # different size, nothing is read back
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        assert d.file.sync('test_sync.cfg', text=content_3) is True
+        assert len(read_back(cmd)) == 0
+    # the copy fails on the device
+    with pytest.raises(KeyError) as excinfo:
+        d.file.sync('test_sync.cfg', text=content_1)
+    assert 'file test_sync.cfg has not been copied entirely' in excinfo.value
+    d.close()
+
+
+def test_http_server_range(tmpdir):
+    content = ''.join([chr(i % 256) for i in range(200000)])
+    filename = str(tmpdir.join('image.rel'))
+    with open(filename, 'wb') as f:
+        f.write(content)
+    server = Server(("", 0), HTTPHandler, MagicMock(), filename)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    url = 'http://127.0.0.1:{0}/{1}'.format(server.server_address[1], filename)
+
+    def get(byte_range=None):
+        request = urllib2.Request(url)
+        if byte_range is not None:
+            request.add_header('Range', byte_range)
+        try:
+            response = urllib2.urlopen(request)
+        except urllib2.HTTPError, e:
+            return e.code, e.info(), ''
+        return response.getcode(), response.info(), response.read()
+
+    try:
+        code, headers, body = get()
+        assert code == 200
+        assert headers['Content-Length'] == '200000'
+        assert headers['Accept-Ranges'] == 'bytes'
+        assert body == content
+        code, headers, body = get('bytes=70000-')
+        assert code == 206
+        assert headers['Content-Range'] == 'bytes 70000-199999/200000'
+        assert body == content[70000:]
+        code, headers, body = get('bytes=10-19')
+        assert code == 206
+        assert headers['Content-Length'] == '10'
+        assert body == content[10:20]
+        code, headers, body = get('bytes=-100')
+        assert code == 206
+        assert body == content[-100:]
+        code, headers, body = get('bytes=199990-300000')
+        assert code == 206
+        assert body == content[199990:]
+        code, headers, body = get('bytes=0-9,20-29')
+        assert code == 200
+        assert body == content
+        code, headers, body = get('bytes=200000-')
+        assert code == 416
+        assert headers['Content-Range'] == 'bytes */200000'
+    finally:
+        server.shutdown()
+        server.server_close()
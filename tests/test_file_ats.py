@@ -4,8 +4,11 @@ import socket
 import tftpy
 import threading
 import getpass
+from mock import patch
 
 from pynetworking.Device import Device
+from pynetworking.TftpService import TftpService
+from pynetworking.utils.digest import text_sha256
 
 
 def tftp_make_dir(tftp_client_dir, tftp_server_dir):
@@ -608,3 +611,108 @@ def test_clean(dut, log_level, use_mock):
     os.remove('tftp_server_dir/test_file_3.cfg')
     os.remove('tftp_server_dir/test_file_4.cfg')
     os.rmdir('tftp_server_dir')
+
+
+def test_sync(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    host_text_1 = """
+hostname sync_1
+ip ssh server
+"""
+    host_text_2 = """
+hostname sync_2
+ip ssh server
+"""
+    dir_line = "test_sync.cfg           rw       131072      {0}     20-Jun-2014 11:54:0{1}\n"
+    dir_0 = ["""
+Directory of flash:
+
+     File Name      Permission Flash Size Data Size        Modified
+------------------- ---------- ---------- --------- -----------------------
+starts                  rw       524288      982     01-Oct-2006 01:12:44
+"""]
+    dir_1 = [dir_0[0] + dir_line.format(len(host_text_1), 1)]
+    dir_2 = [dir_0[0] + dir_line.format(len(host_text_2), 2)]
+    setup_dut(dut)
+    local_tftp_server = socket.gethostbyname(socket.getfqdn())
+    copy_cmd = 'copy tftp://{0}/test_sync.cfg test_sync.cfg'.format(local_tftp_server)
+    dut.add_cmd({'cmd': 'dir', 'state': 0, 'action': 'PRINT', 'args': dir_0})
+    dut.add_cmd({'cmd': copy_cmd, 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+    dut.add_cmd({'cmd': 'dir', 'state': 1, 'action': 'PRINT', 'args': dir_1})
+    dut.add_cmd({'cmd': copy_cmd, 'state': 1, 'action': 'SET_STATE', 'args': [2]})
+    dut.add_cmd({'cmd': 'dir', 'state': 2, 'action': 'PRINT', 'args': dir_2})
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    assert d.file.sync('test_sync.cfg', port=dut.tftp_port, text=host_text_1) is True
+
+    read_back = lambda cmd: [a for a in cmd.call_args_list if type(a[0][0]) is dict and
+                             a[0][0]['cmds'][-1]['cmd'].startswith('copy test_sync.cfg tftp://')]
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        assert d.file.sync('test_sync.cfg', port=dut.tftp_port, text=host_text_1) is False
+        assert len(read_back(cmd)) == 0
+        d.file._digests.clear()
+        assert d.file.sync('test_sync.cfg', port=dut.tftp_port, text=host_text_1) is False
+        assert len(read_back(cmd)) == 1
+    assert d.file.sync('test_sync.cfg', port=dut.tftp_port, text=host_text_2) is True
+    assert d.file['test_sync.cfg']['content'] == host_text_2
+    d.close()
+    for path in ('./tftp_client_dir/test_sync.cfg', './tftp_server_dir/test_sync.cfg'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_tftp_service(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    host_text = ''.join(['interface ethernet g{0}\ndescription port {0}\nexit\n'.format(i) for i in range(1, 100)])
+    dir_line = "test_service.cfg        rw       131072      {0}     20-Jun-2014 11:54:01\n".format(len(host_text))
+    dir_0 = ["""
+Directory of flash:
+
+     File Name      Permission Flash Size Data Size        Modified
+------------------- ---------- ---------- --------- -----------------------
+starts                  rw       524288      982     01-Oct-2006 01:12:44
+"""]
+    dir_1 = [dir_0[0] + dir_line]
+    setup_dut(dut)
+    # the emulated device reads and writes the files of the TFTP server directory
+    service = TftpService(root='./tftp_server_dir', port=0)
+    published = '{0}-test_service.cfg'.format(text_sha256(host_text)[0:16])
+    copy_cmd = 'copy {0} test_service.cfg'.format(service.url(published))
+    dut.add_cmd({'cmd': 'dir', 'state': 0, 'action': 'PRINT', 'args': dir_0})
+    dut.add_cmd({'cmd': copy_cmd, 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+    dut.add_cmd({'cmd': 'dir', 'state': 1, 'action': 'PRINT', 'args': dir_1})
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    try:
+        with patch('tftpy.TftpClient') as client:
+            d.file.create('test_service.cfg', protocol='tftp', text=host_text, tftp_service=service)
+            assert client.call_count == 0
+        assert 'test_service.cfg' in d.file.keys()
+
+        content = d.file.read('test_service.cfg', tftp_service=service)
+        assert content.read() == host_text
+        content.close()
+        lines = list(d.file.read('test_service.cfg', tftp_service=service))
+        assert len(lines) == 99 * 3
+        assert [f for f in os.listdir('./tftp_server_dir') if f.startswith('test_service.cfg-')] == []
+
+        # without the service the file is read through the TFTP server with a larger block size
+        d.file._tftp_port = dut.tftp_port
+        with patch('tftpy.TftpClient', wraps=tftpy.TftpClient) as client:
+            content = d.file.read('test_service.cfg', options={'blksize': 1428})
+            assert content.read() == host_text
+            assert client.call_args[0][2] == {'blksize': 1428}
+        assert d.file['test_service.cfg']['content'] == host_text
+
+        with pytest.raises(KeyError) as excinfo:
+            d.file.read('missing.cfg')
+        assert 'file missing.cfg does not exist' in excinfo.value
+    finally:
+        d.close()
+        service.close()
+        for path in ('./tftp_client_dir/test_service.cfg', './tftp_server_dir/test_service.cfg', 'test_service.cfg',
+                     './tftp_server_dir/' + published):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,57 @@
+import os
+import urllib2
+import hashlib
+import pytest
+from pynetworking import FileServer
+
+
+def test_publish(tmpdir):
+    content = ''.join([chr(i % 256) for i in range(300000)])
+    filename = str(tmpdir.join('x210-5.4.3-2.7.rel'))
+    with open(filename, 'wb') as f:
+        f.write(content)
+    digest = hashlib.sha256(content).hexdigest()
+
+    server = FileServer(host_address='127.0.0.1')
+    try:
+        with pytest.raises(KeyError) as excinfo:
+            server.publish(str(tmpdir.join('missing.rel')))
+        assert 'not available' in str(excinfo.value)
+
+        url = server.publish(filename)
+        assert url == 'http://127.0.0.1:{0}/{1}/x210-5.4.3-2.7.rel'.format(server.port, digest)
+        assert server.publish(filename) == url
+        assert urllib2.urlopen(url).read() == content
+        progress = server.progress('127.0.0.1')
+        assert progress['file'] == 'x210-5.4.3-2.7.rel'
+        assert progress['sha256'] == digest
+        assert progress['sent'] == progress['size'] == 300000
+        assert progress['done'] is True
+        assert server.progress().keys() == ['127.0.0.1']
+
+        request = urllib2.Request(url)
+        request.add_header('Range', 'bytes=100000-')
+        assert urllib2.urlopen(request).read() == content[100000:]
+
+        with pytest.raises(urllib2.HTTPError) as excinfo:
+            urllib2.urlopen('http://127.0.0.1:{0}/{1}/other.rel'.format(server.port, '0' * 64))
+        assert excinfo.value.code == 404
+
+        # a changed file gets a new url and the old one is no longer served
+        with open(filename, 'ab') as f:
+            f.write('x')
+        os.utime(filename, (1, 1))
+        new_url = server.publish(filename)
+        assert new_url != url
+        assert urllib2.urlopen(new_url).read() == content + 'x'
+        with pytest.raises(urllib2.HTTPError) as excinfo:
+            urllib2.urlopen(url)
+        assert excinfo.value.code == 404
+
+        # and neither is a removed one
+        os.remove(filename)
+        with pytest.raises(urllib2.HTTPError) as excinfo:
+            urllib2.urlopen(new_url)
+        assert excinfo.value.code == 404
+    finally:
+        server.close()
@@ -0,0 +1,194 @@
+import os
+import sys
+import shutil
+import pytest
+from pynetworking import Fleet, FileServer, TftpService
+from pynetworking.Device import DeviceException
+from mock import patch
+from threading import Event
+from time import sleep, time
+
+
+def setup_dut(dut):
+    dut.reset()
+    dut.add_cmd({'cmd': 'show version', 'state': -1, 'action': 'PRINT', 'args': ["""
+AlliedWare Plus (TM) 5.4.2 09/25/13 12:57:26
+
+Build name : x600-5.4.2-3.14.rel
+Build date : Wed Sep 25 12:57:26 NZST 2013
+Build type : RELEASE
+    """]})
+
+
+def test_run(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    setup_dut(dut)
+    inventory = ['127.0.0.1', 'localhost', {'host': '127.0.0.2', 'port': 2323}]
+    f = Fleet(inventory, concurrency=2, port=dut.port, protocol=dut.protocol, log_level=log_level)
+    assert len(f) == 3
+    assert f.hosts == ['127.0.0.1', 'localhost', '127.0.0.2']
+    assert f['localhost'].host == 'localhost'
+
+    results = dict((r.host, r) for r in f.run('facts'))
+    assert sorted(results.keys()) == sorted(f.hosts)
+    for host in ('127.0.0.1', 'localhost'):
+        assert results[host].error is None
+        assert results[host].output['version'] == '5.4.2'
+    assert isinstance(results['127.0.0.2'].error, DeviceException)
+    assert str(results['127.0.0.2'].error).startswith("cannot connect to")
+
+    results = dict((r.host, r.output) for r in f.run('ping()'))
+    assert results['127.0.0.1'] is True
+    assert results['localhost'] is True
+
+    results = dict((r.host, r.output) for r in f.run(lambda dev, cmd: dev.cmd(cmd), 'show version'))
+    assert 'x600-5.4.2-3.14.rel' in results['127.0.0.1']
+
+    results = dict((r.host, r.error) for r in f.run(lambda dev: sleep(5 if dev.host == '127.0.0.1' else 0), timeout=1))
+    assert str(results['127.0.0.1']) == 'timeout after 1 seconds'
+    assert results['localhost'] is None
+    results = dict((r.host, r.error) for r in f.run('ping()'))
+    assert str(results['127.0.0.1']) == 'host 127.0.0.1 is still running a previous query'
+    assert f.wait() is True
+    results = dict((r.host, r.output) for r in f.run('ping()'))
+    assert results['127.0.0.1'] is True
+    f.close()
+
+    with pytest.raises(ValueError) as excinfo:
+        Fleet(['127.0.0.1', '127.0.0.1'])
+    assert str(excinfo.value) == 'host 127.0.0.1 is already in the inventory'
+    with pytest.raises(ValueError) as excinfo:
+        Fleet(['127.0.0.1'], concurrency=0)
+    assert str(excinfo.value) == 'concurrency must be at least 1'
+    with pytest.raises(KeyError) as excinfo:
+        f['10.0.0.1']
+    assert 'host 10.0.0.1 is not in the inventory' in excinfo.value
+
+
+def test_update_firmware(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_0 = ["""
+Boot configuration
+----------------------------------------------------------------
+Current software   : x210-5.4.3-2.6.rel
+Current boot image : flash:/x210-5.4.3-2.6.rel
+Backup  boot image : flash:/x210-5.4.3-2.6.rel
+Default boot config: flash:/default.cfg
+Current boot config: flash:/my.cfg (file exists)
+Backup  boot config: flash:/backup.cfg (file not found)
+"""]
+    release_file = 'x210-5.4.3-2.7.rel'
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show boot', 'state': -1, 'action': 'PRINT', 'args': output_0})
+    with open(release_file, 'w') as f:
+        f.write('1' * 100000)
+
+    f = Fleet(['127.0.0.1', 'localhost'], concurrency=2, port=dut.port, protocol=dut.protocol, log_level=log_level)
+    file_server = FileServer()
+    try:
+        results = f.update_firmware(release_file, concurrency=1, file_server=file_server, dontwait=False)
+        assert sorted([r.host for r in results]) == ['127.0.0.1', 'localhost']
+        assert [r.error for r in results] == [None, None]
+        progress = file_server.progress().values()
+        assert len(progress) >= 1
+        assert progress[0]['file'] == release_file
+        assert progress[0]['sent'] == 100000
+        assert progress[0]['done'] is True
+
+        results = f.update_firmware('x210-5.4.3-2.6.rel')
+        assert ['cannot overwrite running firmware' in str(r.error) for r in results] == [True, True]
+        with pytest.raises(ValueError) as excinfo:
+            f.update_firmware(release_file, concurrency=0)
+        assert str(excinfo.value) == 'concurrency must be at least 1'
+    finally:
+        file_server.close()
+        f.close()
+        os.remove(release_file)
+
+
+def test_update_firmware_ats(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_0 = ["""
+Unit  Image  Filename   Version    Date                    Status
+----  -----  ---------  ---------  ---------------------   -----------
+1     1      image-1    3.0.0.44   02-Oct-2011  13:29:54   Not active
+1     2      image-2    3.0.0.44   02-Oct-2011  13:29:54   Active*
+"""]
+    output_1 = ["""
+Unit  Image  Filename   Version    Date                    Status
+----  -----  ---------  ---------  ---------------------   -----------
+1     1      image-1    3.0.0.45   02-Oct-2011  13:31:37   Not active*
+1     2      image-2    3.0.0.44   02-Oct-2011  13:29:54   Active
+"""]
+    release_file = 'ats-3.0.0.45.ros'
+    dut.reset()
+    dut.prompt = '#'
+    dut.add_cmd({'cmd': 'show version', 'state': -1, 'action': 'PRINT', 'args': ["""
+        Unit             SW version         Boot version         HW version
+------------------- ------------------- ------------------- -------------------
+         1               3.0.0.44            1.0.1.07            00.01.00
+    """]})
+    dut.add_cmd({'cmd': 'show bootvar', 'state': 0, 'action': 'PRINT', 'args': output_0})
+    dut.add_cmd({'cmd': 'copy\s+tftp://.+\s+image', 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+    dut.add_cmd({'cmd': 'show bootvar', 'state': 1, 'action': 'PRINT', 'args': output_1})
+    with open(release_file, 'w') as f:
+        f.write('1' * 1000)
+    for directory in ('./tftp_client_dir', './tftp_server_dir'):
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+
+    # the emulated device reads the image from the TFTP server directory
+    service = TftpService(root='./tftp_server_dir', port=0)
+    f = Fleet(['127.0.0.1'], port=dut.port, protocol=dut.protocol, log_level=log_level)
+    try:
+        results = f.update_firmware(release_file, tftp_service=service, protocol='http', dontwait=False)
+        assert [r.error for r in results] == [None]
+        assert open('./tftp_client_dir/image').read() == '1' * 1000
+        assert f['127.0.0.1'].system._is_boot_bank_changed() is True
+    finally:
+        f.close()
+        service.close()
+        os.remove(release_file)
+        for directory in ('./tftp_client_dir', './tftp_server_dir'):
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_update_firmware_timeout():
+    f = Fleet(['10.0.0.1'])
+    closed = []
+
+    def run_host(host, func):
+        sleep(2)
+        closed.append(server.close.called)
+
+    # pynetworking.Fleet is the class, exported by the package
+    with patch.object(sys.modules['pynetworking.Fleet'], 'FileServer') as server_class:
+        server = server_class.return_value
+        with patch.object(f, '_run_host', side_effect=run_host):
+            results = f.update_firmware('x210-5.4.3-2.7.rel', timeout=0.5)
+    assert 'timeout after 0.5 seconds' in str(results[0].error)
+    # the server is closed only once the worker has returned
+    assert closed == [False]
+    server.close.assert_called_once_with()
+
+
+def test_close_timeout():
+    f = Fleet(['10.0.0.1'])
+    release = Event()
+    with patch.object(f, '_run_host', side_effect=lambda host, func: release.wait()):
+        results = list(f.run('ping', timeout=0.2))
+    assert 'timeout after 0.2 seconds' in str(results[0].error)
+    f._opened.add('10.0.0.1')
+    with patch.object(f['10.0.0.1'], 'close') as close:
+        start = time()
+        results = f.close(timeout=0.5)
+        assert time() - start < 3
+        assert 'host 10.0.0.1 is still running a previous query' in str(results[0].error)
+        assert close.call_count == 0
+
+        release.set()
+        assert [r.error for r in f.close()] == [None]
+        assert close.call_count == 1
@@ -0,0 +1,18 @@
+from pynetworking.utils.interface_index import expand_interface_range, index_interface_config
+
+
+def test_expand_interface_range():
+    assert expand_interface_range('1.0.1-1.0.3') == ['1.0.1', '1.0.2', '1.0.3']
+    assert expand_interface_range('1.0.10') == ['1.0.10']
+    assert expand_interface_range('vlan1') == ['vlan1']
+
+
+def test_index_interface_config():
+    index = index_interface_config({'1.0.1-1.0.50': {'switchport mode': 'access'},
+                                    '1.0.10': {'description': 'uplink'},
+                                    'vlan1': {'description': 'default'}})
+    assert len(index) == 51
+    assert index['1.0.1'] == {'switchport mode': 'access'}
+    assert index['1.0.10'] == {'switchport mode': 'access', 'description': 'uplink'}
+    assert index['vlan1'] == {'description': 'default'}
+    assert '1.0.51' not in index
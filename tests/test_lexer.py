@@ -0,0 +1,39 @@
+import re
+import os
+import pytest
+from pynetworking.utils.lexer import Lexer
+from pynetworking.features.awp_vlan_status_lexer import VlanStatusLexer
+from pynetworking.features.awp_interface_status_lexer import InterfaceStatusLexer
+
+
+def _reference(cls):
+    # the same lexer without the SKIP rules, every unmatched character goes
+    # through the error rule
+    attrs = dict((k, v) for k, v in vars(cls).items() if not k.endswith('_SKIP') and k != '_master')
+    return type('Reference' + cls.__name__, (Lexer,), attrs)
+
+
+def _run(lexer, data):
+    try:
+        return lexer.run(data)
+    except Exception, e:
+        return type(e)
+
+
+def _fixtures(name):
+    with open(os.path.join(os.path.dirname(__file__), name)) as f:
+        return re.findall(r'"""(.*?)"""', f.read(), re.S)
+
+
+@pytest.mark.parametrize(('cls', 'fixtures'), [
+    (VlanStatusLexer, 'test_vlan.py'),
+    (InterfaceStatusLexer, 'test_interface.py'),
+])
+def test_skip_rules(cls, fixtures):
+    reference = _reference(cls)
+    data = _fixtures(fixtures)
+    data += [d.replace(' port', ' xport').replace('\nInterface', '\nxInterface').replace(' current', ' _current')
+             for d in data]
+    assert len(data) > 10
+    for d in data:
+        assert _run(cls(), d) == _run(reference(), d)
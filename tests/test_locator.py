@@ -0,0 +1,94 @@
+import pytest
+from os.path import join
+from pynetworking import Fleet, MacLocator
+from tempfile import mkdtemp
+from shutil import rmtree
+from pynetworking.utils.mac_table import MacTable
+
+
+def setup_dut(dut):
+    dut.reset()
+    dut.add_cmd({'cmd': 'show version', 'state': -1, 'action': 'PRINT', 'args': ["""
+AlliedWare Plus (TM) 5.4.2 09/25/13 12:57:26
+
+Build name : x600-5.4.2-3.14.rel
+Build date : Wed Sep 25 12:57:26 NZST 2013
+Build type : RELEASE
+    """]})
+
+
+def test_locate(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_0 = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+1    port1.0.1    0000.cd24.048b   forward   dynamic
+10   port1.0.2    00c0.ee82.fa41   forward   static
+"""]
+    output_1 = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+10   port1.0.3    00c0.ee82.fa41   forward   static
+10   port1.0.3    1803.73b5.06ea   forward   dynamic
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 0, 'action': 'PRINT', 'args': output_0})
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 1, 'action': 'PRINT', 'args': output_1})
+
+    directory = mkdtemp()
+    f = Fleet(['127.0.0.1', 'localhost'], port=dut.port, protocol=dut.protocol, log_level=log_level)
+    try:
+        locator = MacLocator(f, database=join(directory, 'macs.db'))
+        assert [r.error for r in locator.poll()] == [None, None]
+        assert len(locator) == 3
+        assert '00:00:cd:1d:7e:b0' in locator
+        assert 'not a mac' not in locator
+        locations = locator.locate('00-c0-ee-82-fa-41')
+        assert sorted([l.host for l in locations]) == ['127.0.0.1', 'localhost']
+        assert locations[0][:5] == ('00c0.ee82.fa41', locations[0].host, 'port1.0.2', 10, 'static')
+        assert locations[0].first_seen == locations[0].last_seen
+        assert locator.locate('1111.1111.1111') == []
+        assert sorted([l.mac for l in locator.by_oui('00:00:cd') if l.host == 'localhost']) == ['0000.cd1d.7eb0', '0000.cd24.048b']
+        assert [l.mac for l in locator.by_vlan(10)] == ['00c0.ee82.fa41', '00c0.ee82.fa41']
+        with pytest.raises(ValueError) as excinfo:
+            locator.locate('0000.cd1d')
+        assert '0000.cd1d is not a valid MAC address' in excinfo.value
+        first = locator.locate('0000.cd1d.7eb0')[0]
+
+        dut.state = 1
+        locator.poll(use_cache=False)
+        assert len(locator) == 3
+        assert '0000.cd24.048b' not in locator
+        moved = locator.locate('00c0.ee82.fa41')[0]
+        assert moved.interface == 'port1.0.3'
+        assert moved.first_seen == moved.last_seen
+        kept = locator.locate('0000.cd1d.7eb0')[0]
+        assert kept.first_seen == first.first_seen
+        assert kept.last_seen > first.last_seen
+        assert sorted(set([l.mac for l in locator.by_vlan(10)])) == ['00c0.ee82.fa41', '1803.73b5.06ea']
+        locator.close()
+
+        locator = MacLocator(f, database=join(directory, 'macs.db'))
+        assert len(locator) == 3
+        assert locator.locate('0000.cd1d.7eb0')[0] == kept
+        locator.close()
+    finally:
+        f.close()
+        rmtree(directory)
+
+
+def test_remove():
+    locator = MacLocator(None)
+    locator._update('sw1', MacTable([('0000.cd1d.7eb0', '1', 'port1.0.1', 'forward', 'dynamic'),
+                                     ('00c0.ee82.fa41', '10', 'port1.0.2', 'forward', 'static')]), 1.0)
+    locator._update('sw1', MacTable([('0000.cd1d.7eb0', '1', 'port1.0.3', 'forward', 'dynamic')]), 2.0)
+    assert len(locator) == 1
+    assert locator._vlans == {1: set([(0xcd1d7eb0, 'sw1')])}
+    assert locator._ouis == {0x0000cd: set([0xcd1d7eb0])}
+    assert locator._ports == {('sw1', 'port1.0.3'): 1}
+    locator._update('sw1', MacTable(), 3.0)
+    assert len(locator) == 0
+    assert locator._vlans == {}
+    assert locator._ouis == {}
+    assert locator._ports == {}
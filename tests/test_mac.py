@@ -1,5 +1,7 @@
 import pytest
 from pynetworking.Device import Device
+from time import time
+from mock import patch
 
 
 def setup_dut(dut):
@@ -298,3 +300,152 @@ VLAN port             mac            fwd
     d.mac.delete(sleep_time=dut.sleep_time)
     assert d.mac._check_static_entry_presence() is False
     d.close()
+
+
+def test_iter_entries_and_table(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+10   port1.0.2    4a4b.4c4d.4e4f   forward   static
+1    CPU          0015.77ea.17e5   forward   static
+10   port1.0.1    1803.73b5.06ea   forward   dynamic
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': -1, 'action': 'PRINT', 'args': output})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    entries = list(d.mac.iter_entries())
+    assert entries[1] == ('4a4b.4c4d.4e4f', {'vlan': '10', 'interface': 'port1.0.2', 'action': 'forward', 'type': 'static'})
+    assert entries == d.mac.items()
+    table = d.mac.table()
+    assert len(table) == 4
+    assert table.filter(vlan=10).keys() == ['4a4b.4c4d.4e4f', '1803.73b5.06ea']
+    assert table.filter(interface='port1.0.1', type='dynamic').keys() == ['0000.cd1d.7eb0', '1803.73b5.06ea']
+    assert d.mac._check_static_entry_presence() is True
+    d.close()
+
+
+def test_mac_formats(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.CD1D.7EB0   forward   dynamic
+10   port1.0.2    4a:4b:4c:4d:4e:4f   forward   static
+1    CPU          0015-77ea-17e5   forward   static
+10   port1.0.1    180373b506ea   forward   dynamic
+10   port1.0.3    invalid   forward   dynamic
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': -1, 'action': 'PRINT', 'args': output})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    with patch.object(d, 'log_warn') as log_warn:
+        assert d.mac.keys() == ['0000.cd1d.7eb0', '4a4b.4c4d.4e4f', '0015.77ea.17e5', '1803.73b5.06ea']
+    log_warn.assert_called_once_with("skipping mac address table entry '{0}'", '10   port1.0.3    invalid   forward   dynamic')
+    d.close()
+
+
+def test_convergence(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_0 = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+"""]
+    output_1 = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+1    port1.0.2    4a4b.4c4d.4e4f   forward   static
+"""]
+    setup_dut(dut)
+
+    mac_address = '4a4b.4c4d.4e4f'
+    ifc = 'port1.0.2'
+    create_cmd = 'mac address-table static ' + mac_address + ' forward interface ' + ifc + ' vlan 1'
+    delete_cmd = 'no mac address-table static ' + mac_address + ' forward interface ' + ifc + ' vlan 1'
+
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 0, 'action': 'PRINT', 'args': output_0})
+    dut.add_cmd({'cmd': create_cmd, 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 1, 'action': 'PRINT', 'args': output_1})
+    # the entry is never removed
+    dut.add_cmd({'cmd': delete_cmd, 'state': 1, 'action': 'SET_STATE', 'args': [1]})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    start = time()
+    assert d.mac.create(mac_address, ifc, sleep_time=30) is True
+    assert time() - start < 5
+    assert mac_address in d.mac.keys()
+    start = time()
+    assert d.mac.delete(mac_address, sleep_time=2) is False
+    assert 2 <= time() - start < 10
+    assert mac_address in d.mac.keys()
+    d.close()
+
+
+def test_create_delete_many(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_0 = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+"""]
+    output_1 = ["""
+VLAN port             mac            fwd
+1    port1.0.1    0000.cd1d.7eb0   forward   dynamic
+1    port1.0.2    4a4b.4c4d.4e01   forward   static
+10   port1.0.3    4a4b.4c4d.4e02   discard   static
+"""]
+    setup_dut(dut)
+
+    create_cmd = 'mac address-table static 4a4b.4c4d.4e02 discard interface port1.0.3 vlan 10'
+    delete_cmd = 'no mac address-table static 4a4b.4c4d.4e02 discard interface port1.0.3 vlan 10'
+
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 0, 'action': 'PRINT', 'args': output_0})
+    dut.add_cmd({'cmd': create_cmd, 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 1, 'action': 'PRINT', 'args': output_1})
+    dut.add_cmd({'cmd': delete_cmd, 'state': 1, 'action': 'SET_STATE', 'args': [2]})
+    dut.add_cmd({'cmd': 'show mac address-table', 'state': 2, 'action': 'PRINT', 'args': output_0})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.create_many([('4a4b.4c4d.4e01', 'port1.0.2'), ('0000.cd1d.7eb0', 'port1.0.2')])
+    assert 'MAC address 0000.cd1d.7eb0 is already existing' in excinfo.value
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.create_many([('4a4b.4c4d.4e01', 'port1.0.2'), ('1111;1111;1111', 'port1.0.2')])
+    assert 'MAC address 1111;1111;1111 is not valid' in excinfo.value
+
+    config_cmds = lambda cmd: [[c['cmd'] for c in a[0][0]['cmds'][len(d.system.shell_init()):]]
+                               for a in cmd.call_args_list if type(a[0][0]) is dict]
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        d.mac.create_many([('4a4b4c4d4e01', 'port1.0.2'),
+                           {'mac': '4a:4b:4c:4d:4e:02', 'interface': 'port1.0.3', 'forward': False, 'vlan': 10}],
+                          sleep_time=30)
+        assert config_cmds(cmd) == [['enable',
+                                     'conf t',
+                                     'mac address-table static 4a4b.4c4d.4e01 forward interface port1.0.2 vlan 1',
+                                     create_cmd,
+                                     chr(26)]]
+    assert d.mac['4a4b.4c4d.4e02'] == {'vlan': '10', 'interface': 'port1.0.3', 'action': 'discard', 'type': 'static'}
+
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.delete_many(['4a4b.4c4d.4e01', '1111.1111.1111'])
+    assert 'MAC address 1111.1111.1111 does not exist' in excinfo.value
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.delete_many(['4a4b.4c4d.4e01', '4a:4b:4c:4d:4e:01'])
+    assert 'MAC address 4a4b.4c4d.4e01 is listed more than once' in excinfo.value
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        d.mac.delete_many(['4a4b.4c4d.4e01', '4a4b.4c4d.4e02'], sleep_time=30)
+        assert config_cmds(cmd) == [['enable',
+                                     'conf t',
+                                     'no mac address-table static 4a4b.4c4d.4e01 forward interface port1.0.2 vlan 1',
+                                     delete_cmd,
+                                     chr(26)]]
+    assert d.mac._check_static_entry_presence() is False
+    d.close()
@@ -1,5 +1,6 @@
 import pytest
 from pynetworking.Device import Device
+from mock import patch
 
 
 def setup_dut(dut):
@@ -361,3 +362,78 @@ Aging time is 300 sec
     d.mac.delete()
     assert d.mac._check_static_entry_presence() is False
     d.close()
+
+
+def test_create_delete_many(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_0 = ["""
+Aging time is 300 sec
+
+  Vlan        Mac Address       Port     Type
+-------- --------------------- ------ ----------
+   1       00:00:cd:24:04:8b    1/e1   dynamic
+"""]
+    output_1 = ["""
+Aging time is 300 sec
+
+  Vlan        Mac Address       Port     Type
+-------- --------------------- ------ ----------
+   1       00:00:cd:24:04:8b    1/e1   dynamic
+   1       4a:4b:4c:4d:4e:01    1/e2   static
+   10      4a:4b:4c:4d:4e:02    1/e3   static
+   1       4a:4b:4c:4d:4e:03    1/e4   static
+"""]
+    setup_dut(dut)
+
+    dut.add_cmd({'cmd': 'show bridge address-table', 'state': 0, 'action': 'PRINT', 'args': output_0})
+    dut.add_cmd({'cmd': 'interface vlan', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config-if)#']})
+    dut.add_cmd({'cmd': 'bridge address 4a4b.4c4d.4e03 ethernet 1/e4 permanent', 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+    dut.add_cmd({'cmd': 'show bridge address-table', 'state': 1, 'action': 'PRINT', 'args': output_1})
+    dut.add_cmd({'cmd': 'no bridge address 4a4b.4c4d.4e03', 'state': 1, 'action': 'SET_STATE', 'args': [2]})
+    dut.add_cmd({'cmd': 'show bridge address-table', 'state': 2, 'action': 'PRINT', 'args': output_0})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.create_many([('4a4b.4c4d.4e01', '1/e2'), ('4a:4b:4c:4d:4e:01', '1/e3')])
+    assert 'MAC address 4a4b.4c4d.4e01 is listed more than once' in excinfo.value
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.create_many([('4a4b.4c4d.4e01', '1/e2'), ('0000.cd24.048b', '1/e3')])
+    assert 'MAC address 0000.cd24.048b is already existing' in excinfo.value
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.create_many([('4a4b.4c4d.4e01', '1/e2', False)])
+    assert 'Discard option not supported' in excinfo.value
+
+    config_cmds = lambda cmd: [[c['cmd'] for c in a[0][0]['cmds'][len(d.system.shell_init()):]]
+                               for a in cmd.call_args_list if type(a[0][0]) is dict]
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        assert d.mac.create_many([('4a4b.4c4d.4e01', '1/e2'),
+                                  {'mac': '4a4b.4c4d.4e02', 'interface': '1/e3', 'vlan': 10},
+                                  ('4a:4b:4c:4d:4e:03', '1/e4', True, 1)]) is True
+        assert config_cmds(cmd) == [['conf',
+                                     'interface vlan 1',
+                                     'bridge address 4a4b.4c4d.4e01 ethernet 1/e2 permanent',
+                                     'bridge address 4a4b.4c4d.4e03 ethernet 1/e4 permanent',
+                                     'interface vlan 10',
+                                     'bridge address 4a4b.4c4d.4e02 ethernet 1/e3 permanent',
+                                     chr(26)]]
+    assert d.mac['4a4b.4c4d.4e02'] == {'vlan': '10', 'interface': '1/e3', 'action': 'forward', 'type': 'static'}
+
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.delete_many(['4a4b.4c4d.4e01', '0000.cd24.048b'])
+    assert 'cannot remove a dynamic entry' in excinfo.value
+    with pytest.raises(KeyError) as excinfo:
+        d.mac.delete_many(['4a4b.4c4d.4e01', '4a:4b:4c:4d:4e:01'])
+    assert 'MAC address 4a4b.4c4d.4e01 is listed more than once' in excinfo.value
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        assert d.mac.delete_many(['4a4b.4c4d.4e01', '4a4b.4c4d.4e02', '4a4b.4c4d.4e03']) is True
+        assert config_cmds(cmd) == [['conf',
+                                     'interface vlan 1',
+                                     'no bridge address 4a4b.4c4d.4e01',
+                                     'no bridge address 4a4b.4c4d.4e03',
+                                     'interface vlan 10',
+                                     'no bridge address 4a4b.4c4d.4e02',
+                                     chr(26)]]
+    assert d.mac._check_static_entry_presence() is False
+    d.close()
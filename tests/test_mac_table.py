@@ -0,0 +1,49 @@
+import pytest
+from pynetworking.utils.mac_table import MacTable, mac_to_int, int_to_mac
+
+
+def test_conversion():
+    assert mac_to_int('0000.cd1d.7eb0') == 0xcd1d7eb0
+    assert int_to_mac(0xffffffffffff) == 'ffff.ffff.ffff'
+    assert int_to_mac(mac_to_int('1803.73b5.06ea')) == '1803.73b5.06ea'
+
+
+def test_table():
+    t = MacTable([('0000.cd1d.7eb0', '1', 'port1.0.1', 'forward', 'dynamic'),
+                  ('0a0b.0c0d.0e0f', '10', 'port1.0.4', 'discard', 'static'),
+                  ('00c0.ee82.fa41', '1', 'port1.0.1', 'forward', 'dynamic')])
+    assert len(t) == 3
+    assert t.keys() == ['0000.cd1d.7eb0', '0a0b.0c0d.0e0f', '00c0.ee82.fa41']
+    assert t['0a0b.0c0d.0e0f'] == {'vlan': '10', 'interface': 'port1.0.4', 'action': 'discard', 'type': 'static'}
+    assert '0000.cd1d.7eb0' in t
+    assert '1111.1111.1111' not in t
+    assert 'not a mac' not in t
+    with pytest.raises(KeyError):
+        t['1111.1111.1111']
+
+    t.append('0000.cd1d.7eb0', 20, 'port1.0.2', 'forward', 'static')
+    assert len(t) == 3
+    assert t.items()[0] == ('0000.cd1d.7eb0', {'vlan': '20', 'interface': 'port1.0.2', 'action': 'forward', 'type': 'static'})
+
+
+def test_filter():
+    t = MacTable([('0000.cd1d.7eb0', '1', 'port1.0.1', 'forward', 'dynamic'),
+                  ('0a0b.0c0d.0e0f', '10', 'port1.0.4', 'discard', 'static'),
+                  ('00c0.ee82.fa41', '1', 'port1.0.1', 'forward', 'static'),
+                  ('1803.73b5.06ea', '10', 'CPU', 'forward', 'static')])
+    assert t.filter(vlan=1).keys() == ['0000.cd1d.7eb0', '00c0.ee82.fa41']
+    assert t.filter(type='static', vlan='10').keys() == ['0a0b.0c0d.0e0f', '1803.73b5.06ea']
+    assert t.filter(interface='port1.0.1', type='static').keys() == ['00c0.ee82.fa41']
+    assert len(t.filter(interface='port1.0.9')) == 0
+    assert t.filter(action='discard')['0a0b.0c0d.0e0f']['interface'] == 'port1.0.4'
+    assert len(t.filter(action='unknown', vlan=1)) == 0
+    assert t.filter().keys() == t.keys()
+
+    f = t.filter(vlan=10)
+    f.append('0000.0000.0001', 10, 'port1.0.5', 'forward', 'dynamic')
+    f.append('1803.73b5.06ea', 10, 'port1.0.4', 'forward', 'static')
+    assert f.keys() == ['0a0b.0c0d.0e0f', '1803.73b5.06ea', '0000.0000.0001']
+    assert f['1803.73b5.06ea']['interface'] == 'port1.0.4'
+    assert f.filter(interface='port1.0.5').keys() == ['0000.0000.0001']
+    assert len(t) == 4
+    assert t['1803.73b5.06ea']['interface'] == 'CPU'
@@ -91,7 +91,7 @@ end
         d.ntp[bad_ntp_address]
     assert 'NTP server {0} is not present'.format(bad_ntp_address) in excinfo.value
     assert ntp1_address not in d.ntp.keys()
-    d.ntp.create(ntp1_address, sleep_time=dut.sleep_time)
+    assert d.ntp.create(ntp1_address, sleep_time=dut.sleep_time) is True
     assert ntp1_address in d.ntp.keys()
     with pytest.raises(KeyError) as excinfo:
         d.ntp.create(ntp1_address, sleep_time=dut.sleep_time)
@@ -107,7 +107,7 @@ end
     with pytest.raises(KeyError) as excinfo:
         d.ntp.delete(bad_ntp_address, sleep_time=dut.sleep_time)
     assert 'NTP server {0} is not present'.format(bad_ntp_address) in excinfo.value
-    d.ntp.delete(ntp2_address, sleep_time=dut.sleep_time)
+    assert d.ntp.delete(ntp2_address, sleep_time=dut.sleep_time) is True
     assert ntp2_address not in d.ntp.keys()
     d.ntp.delete(sleep_time=dut.sleep_time)
     assert ntp1_address not in d.ntp.keys()
@@ -0,0 +1,85 @@
+import os
+import socket
+import hashlib
+import threading
+import tftpy
+import pytest
+from StringIO import StringIO
+from pynetworking import TftpService
+
+
+def test_publish(tmpdir):
+    content = ''.join([chr(i % 256) for i in range(300000)])
+    filename = str(tmpdir.join('image.ros'))
+    with open(filename, 'wb') as f:
+        f.write(content)
+    digest = hashlib.sha256(content).hexdigest()
+
+    service = TftpService(address='127.0.0.1', port=0, host_address='127.0.0.1')
+    root = service.root
+    try:
+        with pytest.raises(KeyError) as excinfo:
+            service.publish(str(tmpdir.join('missing.ros')))
+        assert 'not available' in str(excinfo.value)
+
+        name = service.publish(filename)
+        assert name == '{0}-image.ros'.format(digest[0:16])
+        assert service.publish(filename) == name
+        assert service.url(name) == 'tftp://127.0.0.1:{0}/{1}'.format(service.port, name)
+        assert open(service.path(name), 'rb').read() == content
+        with pytest.raises(KeyError):
+            service.path('../image.ros')
+
+        # several devices at the same time, with the negotiated block size
+        outputs = [StringIO() for i in range(4)]
+
+        def download(output):
+            tftpy.TftpClient('127.0.0.1', service.port, {'blksize': 1428}).download(name, output)
+        threads = [threading.Thread(target=download, args=(output,)) for output in outputs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert [o.getvalue() == content for o in outputs] == [True] * 4
+
+        # a changed file gets a new name
+        with open(filename, 'wb') as f:
+            f.write(content[0:1000])
+        os.utime(filename, (1, 1))
+        new_name = service.publish(filename)
+        assert new_name != name
+        assert os.path.exists(service.path(name))
+    finally:
+        service.close()
+    assert not os.path.exists(root)
+
+
+def test_root(tmpdir):
+    service = TftpService(root=str(tmpdir), address='127.0.0.1', port=0)
+    tftpy.TftpClient('127.0.0.1', service.port).upload('startup-config', StringIO('hostname ats\n'))
+    assert service.open('startup-config').read() == 'hostname ats\n'
+    with pytest.raises(KeyError):
+        service.open('running-config')
+    service.close()
+    assert os.path.exists(str(tmpdir.join('startup-config')))
+
+
+def test_url():
+    service = TftpService(address='127.0.0.1', port=0, host_address='10.0.0.1')
+    service._start()
+    service._server.listenport = 69
+    assert service.url('image.ros') == 'tftp://10.0.0.1/image.ros'
+    service.close()
+
+
+def test_port_in_use(tmpdir):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    service = TftpService(root=str(tmpdir), address='127.0.0.1', port=sock.getsockname()[1])
+    try:
+        with pytest.raises(socket.error):
+            service.publish(__file__)
+        assert service._server is None
+    finally:
+        service.close()
+        sock.close()
@@ -1,4 +1,5 @@
 import pytest
+from mock import patch
 from pynetworking.Device import Device
 
 
@@ -1275,3 +1276,212 @@ VLAN ID  Name            Type    State   Member ports
     assert '1.0.18' in d.vlan[1]['untagged']
     assert '1.0.18' not in d.vlan[10]['tagged']
     d.close()
+
+
+def test_reload_config_sections(dut, log_level, use_mock):
+    if dut.mode != 'emulated':
+        pytest.skip("only on emulated")
+    output_rc = ["""
+!
+interface port1.0.1-1.0.50
+switchport
+switchport mode access
+!
+vlan database
+vlan 10 name admin state enable
+!
+end
+"""]
+    output_vd_0 = ["""
+vlan database
+vlan 10 name admin state enable
+!
+"""]
+    output_vd_1 = ["""
+vlan database
+vlan 10 name admin state enable
+vlan 20 name test state enable
+!
+"""]
+    output_if = ["""
+interface port1.0.1-1.0.50
+switchport
+switchport mode access
+!
+"""]
+    output_va = ["""
+VLAN ID  Name            Type    State   Member ports
+                                         (u)-Untagged, (t)-Tagged
+======= ================ ======= ======= ====================================
+1       default          STATIC  ACTIVE  port1.0.1(u) port1.0.2(u) port1.0.3(u)
+10      admin            STATIC  ACTIVE
+20      test             STATIC  ACTIVE
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show running-config vlan database', 'state': 0, 'action': 'PRINT', 'args': output_vd_0})
+    dut.add_cmd({'cmd': 'show running-config vlan database', 'state': 1, 'action': 'PRINT', 'args': output_vd_1})
+    dut.add_cmd({'cmd': 'show running-config interface', 'state': -1, 'action': 'PRINT', 'args': output_if})
+    dut.add_cmd({'cmd': 'show running-config', 'state': -1, 'action': 'PRINT', 'args': output_rc})
+    dut.add_cmd({'cmd': 'show vlan all', 'state': -1, 'action': 'PRINT', 'args': output_va})
+    dut.add_cmd({'cmd': 'vlan database', 'state': 0, 'action': 'SET_PROMPT', 'args': ['(config-vlan)#']})
+    dut.add_cmd({'cmd': 'vlan 20 name test', 'state': 0, 'action': 'SET_STATE', 'args': [1]})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    assert '20' not in d.vlan._vlan_config
+    with patch.object(d.interface, 'load_config') as interface_load_config:
+        d.vlan.create(20, name='test')
+    assert d.vlan['20']['name'] == 'test'
+    assert d.vlan._interface_config['1.0.1-1.0.50']['switchport mode'] == 'access'
+    assert not interface_load_config.called
+
+    d.load_system()
+    with patch.object(d.vlan, 'load_config') as vlan_load_config:
+        d.load_system()
+    assert not vlan_load_config.called
+    d.close()
+
+
+def test_snapshot(dut, log_level, use_mock):
+    output_rc = ["""
+!
+interface port1.0.1-1.0.50
+switchport
+switchport mode access
+!
+vlan database
+vlan 10 name admin state enable
+!
+end
+"""]
+    output_va = ["""
+VLAN ID  Name            Type    State   Member ports
+                                         (u)-Untagged, (t)-Tagged
+======= ================ ======= ======= ====================================
+1       default          STATIC  ACTIVE  port1.0.1(u) port1.0.2(u) port1.0.3(u)
+10      admin            STATIC  ACTIVE
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show running-config', 'state': -1, 'action': 'PRINT', 'args': output_rc})
+    dut.add_cmd({'cmd': 'show vlan all', 'state': -1, 'action': 'PRINT', 'args': output_va})
+    dut.add_cmd({'cmd': 'vlan database', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config-vlan)#']})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    show_vlan = lambda cmd: len([c for c in cmd.call_args_list if c[0][0] == 'show vlan all'])
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        for vid in d.vlan:
+            assert d.vlan[vid]['name'] in ('default', 'admin')
+        assert show_vlan(cmd) == 3
+
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.snapshot():
+            for vid in d.vlan:
+                assert d.vlan[vid]['name'] in ('default', 'admin')
+            assert show_vlan(cmd) == 1
+            d.vlan.update(10, name='admin')
+            assert d.vlan['10']['name'] == 'admin'
+            assert show_vlan(cmd) == 2
+        d.vlan.items()
+        assert show_vlan(cmd) == 3
+
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.snapshot(max_age=0):
+            d.vlan.items()
+            d.vlan.items()
+        assert show_vlan(cmd) == 2
+
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.snapshot():
+            d.vlan.items()
+            with d.snapshot():
+                d.vlan.update(10, name='admin')
+            reads = show_vlan(cmd)
+            d.vlan.items()
+            assert show_vlan(cmd) == reads + 1
+    d.close()
+
+
+def test_batch(dut, log_level, use_mock):
+    output_rc = ["""
+!
+interface port1.0.1-1.0.50
+switchport
+switchport mode access
+!
+vlan database
+vlan 10 name admin state enable
+vlan 20 name test state enable
+!
+end
+"""]
+    output_va = ["""
+VLAN ID  Name            Type    State   Member ports
+                                         (u)-Untagged, (t)-Tagged
+======= ================ ======= ======= ====================================
+1       default          STATIC  ACTIVE  port1.0.1(u) port1.0.2(u) port1.0.3(u)
+10      admin            STATIC  ACTIVE
+20      test             STATIC  ACTIVE
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show running-config', 'state': -1, 'action': 'PRINT', 'args': output_rc})
+    dut.add_cmd({'cmd': 'show vlan all', 'state': -1, 'action': 'PRINT', 'args': output_va})
+    dut.add_cmd({'cmd': 'vlan database', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config-vlan)#']})
+    dut.add_cmd({'cmd': 'interface port', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config-if)#']})
+    dut.add_cmd({'cmd': 'exit', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config)#']})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    config_cmds = lambda cmd: [[c['cmd'] for c in a[0][0]['cmds'][len(d.system.shell_init()):]]
+                               for a in cmd.call_args_list if type(a[0][0]) is dict and 'conf t' in [c['cmd'] for c in a[0][0]['cmds']]]
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.vlan.batch():
+            for vid in range(100, 200):
+                d.vlan.create(vid)
+            d.vlan.create(30, name='voice')
+            d.vlan.update(10, mtu=1500)
+            d.vlan.add_interface(30, '1.0.1')
+            for vid in range(100, 110):
+                d.vlan.add_interface(vid, '1.0.2', tagged=True)
+            d.vlan.delete('150-159')
+            d.vlan.delete(20)
+            with pytest.raises(ValueError):
+                d.vlan.add_interface(150, '1.0.3')
+            assert len(config_cmds(cmd)) == 0
+        sent = config_cmds(cmd)
+        assert len(sent) == 1
+        assert sent[0] == ['enable', 'conf t',
+                          'vlan database',
+                          'vlan 100-149,160-199',
+                          'vlan 30 name voice',
+                          'vlan 10 mtu 1500',
+                          'exit',
+                          'interface port1.0.1', 'switchport access vlan 30', 'exit',
+                          'interface port1.0.2', 'switchport mode trunk',
+                          'switchport trunk allowed vlan add 100-109', 'exit',
+                          'vlan database', 'no vlan 20', 'exit',
+                          chr(26)]
+        assert len([c for c in cmd.call_args_list if c[0][0] == 'show vlan all']) == 1
+
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with pytest.raises(KeyError):
+            with d.vlan.batch():
+                d.vlan.create(40)
+                d.vlan.update(50, name='missing')
+        assert len(config_cmds(cmd)) == 0
+    assert d.vlan._batch is None
+
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.vlan.batch():
+            d.vlan.create(40)
+            d.vlan.add_interface(40, '1.0.4', tagged=True)
+            d.vlan.delete_interface(40, '1.0.4')
+            with pytest.raises(ValueError):
+                d.vlan.delete_interface(40, '1.0.4')
+        assert config_cmds(cmd) == [['enable', 'conf t',
+                                     'vlan database', 'vlan 40', 'exit',
+                                     'interface port1.0.4', 'switchport mode trunk',
+                                     'switchport trunk allowed vlan add 40',
+                                     'switchport trunk allowed vlan remove 40', 'exit',
+                                     chr(26)]]
+    d.close()
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import pytest
+from mock import patch
 from pynetworking.Device import Device
 
 
@@ -504,6 +505,7 @@ switchport trunk allowed vlan add 11
 exit
 interface range ethernet 1/e(18-19),1/g1
 switchport mode trunk
+switchport trunk allowed vlan add 20-29,40
 exit
 interface ethernet 1/e10
 switchport trunk allowed vlan add 10
@@ -524,6 +526,11 @@ ip ssh server
     assert d.vlan._interface_config['1.0.12']['switchport trunk allowed'] == ['10', '11']
     assert d.vlan._interface_config['1.0.18']['switchport mode'] == 'trunk'
     assert d.vlan._interface_config['1.0.19']['switchport mode'] == 'trunk'
+    assert d.vlan._interface_config['1.0.19']['switchport trunk allowed'] == '20-29,40'
+    assert '1' not in d.vlan._trunk_allowed['1.0.10']
+    assert '11' in d.vlan._trunk_allowed['1.0.12']
+    assert '25' in d.vlan._trunk_allowed['1.0.19']
+    assert '30' not in d.vlan._trunk_allowed['1.0.19']
     d.close()
 
 
@@ -915,3 +922,80 @@ def test_get_vlan_ids(dut, log_level, use_mock):
     with pytest.raises(ValueError) as excinfo:
         d.vlan._get_vlan_ids('not_valid_range')
     assert 'not_valid_range is not a valid vlan id, range or list' in excinfo.value
+
+
+def test_batch(dut, log_level, use_mock):
+    output_rc = ["""
+vlan database
+vlan 10,20
+exit
+interface vlan 1
+ip address 10.17.39.252 255.255.255.0
+name default_vlan
+exit
+hostname nac_dev
+ip ssh server
+"""]
+    output_vl = ["""
+
+Vlan       Name                   Ports                Type     Authorization
+---- ----------------- --------------------------- ------------ -------------
+ 1           1         1/e(1-48),1/g(1-4),          other       Required
+10           10                                      permanent   Required
+20           20                                      permanent   Required
+
+"""]
+    setup_dut(dut)
+    dut.add_cmd({'cmd': 'show running-config', 'state': -1, 'action': 'PRINT', 'args': output_rc})
+    dut.add_cmd({'cmd': 'show vlan', 'state': -1, 'action': 'PRINT', 'args': output_vl})
+    dut.add_cmd({'cmd': 'vlan database', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config-vlan)#']})
+    dut.add_cmd({'cmd': 'interface', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config-if)#']})
+    dut.add_cmd({'cmd': 'exit', 'state': -1, 'action': 'SET_PROMPT', 'args': ['(config)#']})
+
+    d = Device(host=dut.host, port=dut.port, protocol=dut.protocol, log_level=log_level, mock=use_mock)
+    d.open()
+    config_cmds = lambda cmd: [[c['cmd'] for c in a[0][0]['cmds'][len(d.system.shell_init()):]]
+                               for a in cmd.call_args_list if type(a[0][0]) is dict and 'conf' in [c['cmd'] for c in a[0][0]['cmds']]]
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.vlan.batch():
+            for vid in range(100, 200):
+                d.vlan.create(vid)
+            d.vlan.create(30, name='voice')
+            d.vlan.update(10, name='admin')
+            d.vlan.add_interface(30, '1.0.1')
+            for vid in range(100, 110):
+                d.vlan.add_interface(vid, '1.0.2', tagged=True)
+            d.vlan.delete('150-159')
+            d.vlan.delete(20)
+            assert len(config_cmds(cmd)) == 0
+        sent = config_cmds(cmd)
+        assert len(sent) == 1
+        assert sent[0] == ['conf',
+                           'vlan database', 'vlan 30,100-149,160-199', 'exit',
+                           'interface vlan 30', 'name voice', 'exit',
+                           'interface vlan 10', 'name admin', 'exit',
+                           'interface ethernet 1/e1', 'switchport access vlan 30', 'exit',
+                           'interface ethernet 1/e2', 'switchport mode trunk',
+                           'switchport trunk allowed vlan add 100-109', 'exit',
+                           'vlan database', 'no vlan 20', 'exit',
+                           chr(26)]
+
+    with patch.object(d, 'cmd', wraps=d.cmd) as cmd:
+        with d.vlan.batch():
+            d.vlan.create(40)
+            d.vlan.add_interface(40, '1.0.4', tagged=True)
+            d.vlan.delete_interface(40, '1.0.4')
+            with pytest.raises(ValueError):
+                d.vlan.delete_interface(40, '1.0.4')
+        assert config_cmds(cmd) == [['conf',
+                                     'vlan database', 'vlan 40', 'exit',
+                                     'interface ethernet 1/e4', 'switchport mode trunk',
+                                     'switchport trunk allowed vlan add 40',
+                                     'switchport trunk allowed vlan remove 40', 'exit',
+                                     chr(26)]]
+
+    d.vlan._interface_config['1.0.5'] = {'switchport mode': 'general'}
+    with pytest.raises(ValueError) as excinfo:
+        d.vlan.add_interface(10, '1.0.5')
+    assert str(excinfo.value) == 'interface 1.0.5 cannot be added to vlan 10'
+    d.close()
@@ -0,0 +1,54 @@
+import pytest
+from pynetworking.utils.vlan_set import VlanSet
+
+
+def test_parse():
+    assert list(VlanSet('10-15')) == [10, 11, 12, 13, 14, 15]
+    assert list(VlanSet('10-11,60,1000-1001')) == [10, 11, 60, 1000, 1001]
+    assert list(VlanSet(7)) == [7]
+    assert list(VlanSet(['30', 10, '11-12'])) == [10, 11, 12, 30]
+    assert len(VlanSet('1-4094')) == 4094
+    assert len(VlanSet()) == 0
+    for text in ('not_valid_range', '10-', '20-10', '10,,20'):
+        with pytest.raises(ValueError) as excinfo:
+            VlanSet(text)
+        assert '{0} is not a valid vlan id, range or list'.format(text) in excinfo.value
+
+
+def test_str():
+    assert str(VlanSet([1, 2, 3, 7, 9, 10])) == '1-3,7,9-10'
+    assert str(VlanSet('100-199,150-250,251')) == '100-251'
+    assert str(VlanSet()) == ''
+    assert VlanSet(str(VlanSet('5,1-3'))) == VlanSet('1-3,5')
+
+
+def test_membership():
+    s = VlanSet('10-20,100,4000-4094')
+    assert 10 in s
+    assert '15' in s
+    assert u'100' in s
+    assert 4094 in s
+    assert 9 not in s
+    assert 21 not in s
+    assert 101 not in s
+    assert 'vlan' not in s
+
+
+def test_union_difference():
+    assert VlanSet('1-10') | VlanSet('11-20,30') == VlanSet('1-20,30')
+    assert VlanSet('1-10').union([5, 50]) == VlanSet('1-10,50')
+    assert VlanSet('1-100') - VlanSet('10-19,50,90-200') == VlanSet('1-9,20-49,51-89')
+    assert VlanSet('10-20') - VlanSet('1-5,30') == VlanSet('10-20')
+    assert len(VlanSet('10-20').difference('1-4094')) == 0
+
+
+def test_add():
+    s = VlanSet()
+    for vid in (5, 7, 6, 1, 3, 2, 10):
+        s.add(vid)
+    assert str(s) == '1-3,5-7,10'
+    s.add(4)
+    assert str(s) == '1-7,10'
+    s.add('9')
+    s.add(10)
+    assert str(s) == '1-7,9-10'
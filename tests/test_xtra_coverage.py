@@ -1,5 +1,7 @@
 import pytest
 from pynetworking import Device
+from pynetworking.Proxy import _get_banner
+from pynetworking.utils.lazy import LazyArg
 from mock import MagicMock
 from mock import patch
 
@@ -252,7 +254,12 @@ def test_load_features(dut, log_level, use_mock):
 
         yaml_load_mocked.return_value = {'system': 'awp_system', 'features': {'dhcp': 'awp_dhcp'}}
         with pytest.raises(ImportError) as excinfo:
-            d.open()
+            d.open(features=['dhcp'])
+        assert str(excinfo.value) == 'No module named awp_dhcp'
+
+        d.open()
+        with pytest.raises(ImportError) as excinfo:
+            d.dhcp
         assert str(excinfo.value) == 'No module named awp_dhcp'
 
         yaml_load_mocked.return_value = None
@@ -264,6 +271,27 @@ def test_load_features(dut, log_level, use_mock):
         with pytest.raises(AttributeError) as excinfo:
             d.open()
         assert str(excinfo.value) == '\'Device\' object has no attribute \'system\''
+        d.close()
+
+
+def test_banner_closed_channel():
+    chan = MagicMock()
+    chan.recv.return_value = ''
+    assert _get_banner(MagicMock(), chan, r'Password:', timeout=60) == ''
+    assert chan.recv.call_count == 1
+
+
+def test_lazy_log_args():
+    d = Device(host='127.0.0.1', log_level='NOTSET')
+    arg = MagicMock()
+    d.log_debug("{0} {1}", arg, LazyArg(arg))
+    assert arg.called is False
+
+    d.log_level = 'DEBUG'
+    d.log_debug("{0}", arg)
+    assert arg.called is False
+    d.log_debug("{0}", LazyArg(arg))
+    assert arg.call_count == 1
 
 
 def test_timeout(dut, log_level, use_mock):